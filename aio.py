@@ -0,0 +1,114 @@
+# asyncio front end for file I/O. Reads, writes and parsing run on a shared, bounded thread pool, so the event loop
+# never blocks on a large PAK. The pool is created on first use.
+#
+# Usage:
+#     pak = await PAK.aopen("Metroid1.pak")
+#     await pak.with_resource_replaced(...).asave("Metroid1.pak")
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+__all__ = ("DEFAULT_IO_WORKERS", "set_io_workers", "run", "read_file", "write_file", "read_ranges")
+
+DEFAULT_IO_WORKERS = 8
+
+# os.open doesn't default to binary mode on Windows
+_READ_FLAGS = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+
+_io_workers = DEFAULT_IO_WORKERS
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=_io_workers, thread_name_prefix="pak-io")
+        return _executor
+
+
+def set_io_workers(workers: int) -> None:
+    # The next call creates a pool of this size; work already queued on the old pool still finishes
+    global _io_workers, _executor
+    with _executor_lock:
+        _io_workers = workers
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+async def run(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), function, *args)
+
+
+def _read_file(path) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _write_file(path, data: bytes) -> None:
+    # Written next to the target and moved into place, so a reader never sees a partial file
+    temporary_path = f"{os.fspath(path)}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+
+if hasattr(os, "pread"):
+    def _read_range(file_descriptor: int, offset: int, size: int) -> bytes:
+        return os.pread(file_descriptor, size, offset)
+else:
+    # Without pread (on Windows) each seek has to stay paired with its read
+    _seek_lock = threading.Lock()
+
+    def _read_range(file_descriptor: int, offset: int, size: int) -> bytes:
+        with _seek_lock:
+            os.lseek(file_descriptor, offset, os.SEEK_SET)
+            return os.read(file_descriptor, size)
+
+
+def _close_when_done(file_descriptor: int, futures) -> None:
+    # Closes the descriptor once every read is finished or cancelled, in whichever thread finishes the last one
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            os.close(file_descriptor)
+
+    if not futures:
+        os.close(file_descriptor)
+    for future in futures:
+        future.add_done_callback(done)
+
+
+async def read_file(path) -> bytes:
+    return await run(_read_file, path)
+
+
+async def write_file(path, data: bytes) -> None:
+    await run(_write_file, path, data)
+
+
+async def read_ranges(path, ranges) -> list:
+    # ranges is an iterable of (offset, size); the reads share one file descriptor and run concurrently. If a read
+    # fails or this is cancelled, the reads that haven't started are cancelled, and the descriptor stays open until
+    # the ones already running are done.
+    ranges = tuple(ranges)
+    file_descriptor = await run(os.open, path, _READ_FLAGS)
+    executor = _get_executor()
+    futures = []
+    try:
+        for offset, size in ranges:
+            futures.append(executor.submit(_read_range, file_descriptor, offset, size))
+        return list(await asyncio.gather(*(asyncio.wrap_future(future) for future in futures)))
+    finally:
+        for future in futures:
+            future.cancel()
+        _close_when_done(file_descriptor, futures)
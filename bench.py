@@ -0,0 +1,145 @@
+# Benchmarks for the parse, pack and edit hot paths, run against synthetic payloads from synth.py
+#
+# Usage: python bench.py [--scale N] [--repeat N] [--output results.json] [--compare previous.json]
+
+import argparse
+import dataclasses
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from hint import HINT
+from pak import PAK
+from strg import STRG
+from synth import SCALES, generate_STRG, generate_HINT, generate_ScanTree, generate_world_PAK
+from tree import ScanTree
+
+__all__ = ("BenchmarkResult", "run_benchmark", "run_benchmarks", "main")
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    bytes_processed: int
+    repeat: int
+    min_time: float
+    mean_time: float
+    peak_memory: int
+
+    @property
+    def throughput(self) -> float:
+        return self.bytes_processed / self.min_time if self.min_time else 0.0
+
+    @property
+    def operations_per_second(self) -> float:
+        return 1 / self.min_time if self.min_time else 0.0
+
+
+def run_benchmark(name: str, function, bytes_processed: int, repeat: int = 5) -> BenchmarkResult:
+    times = []
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+
+    # Tracing allocations slows everything down, so peak memory gets its own run
+    tracemalloc.start()
+    try:
+        function()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(name, bytes_processed, repeat, min(times), sum(times) / len(times), peak_memory)
+
+
+def _benchmark_cases(scale: int):
+    # Yields (name, function, bytes processed). The edits share structure with the value they're made to, so they
+    # only count the size of what they replace or add.
+    packed_STRG = generate_STRG(language_count=10, string_count=200 * scale)
+    strg = STRG.from_packed(packed_STRG)
+    string_table = strg.string_tables[0]
+    yield "STRG.from_packed", lambda: STRG.from_packed(packed_STRG), len(packed_STRG)
+    yield "STRG.packed", strg.packed, len(packed_STRG)
+    yield "STRG round trip", lambda: STRG.from_packed(packed_STRG).packed(), len(packed_STRG)
+    yield "StringTable.with_string_replaced", \
+        lambda: string_table.with_string_replaced(0, "Replaced"), string_table.packed_size
+    yield "STRG.with_string_table_replaced", \
+        lambda: strg.with_string_table_replaced(0, string_table), string_table.packed_size
+
+    packed_scan_tree = generate_ScanTree(object_count=500 * scale)
+    scan_tree = ScanTree.from_packed(packed_scan_tree)
+    yield "ScanTree.from_packed", lambda: ScanTree.from_packed(packed_scan_tree), len(packed_scan_tree)
+    yield "ScanTree.packed", scan_tree.packed, len(packed_scan_tree)
+    yield "ScanTree round trip", lambda: ScanTree.from_packed(packed_scan_tree).packed(), len(packed_scan_tree)
+    yield "ScanTree.with_object_replaced", \
+        lambda: scan_tree.with_object_replaced(0, scan_tree.objects[-1]), scan_tree.objects[-1].packed_size
+
+    packed_HINT = generate_HINT(hint_count=100 * scale)
+    hint = HINT.from_packed(packed_HINT)
+    yield "HINT.from_packed", lambda: HINT.from_packed(packed_HINT), len(packed_HINT)
+    yield "HINT.packed", hint.packed, len(packed_HINT)
+    yield "HINT round trip", lambda: HINT.from_packed(packed_HINT).packed(), len(packed_HINT)
+    hints_size = sum(replaced_hint.packed_size for replaced_hint in hint.hints)
+    yield "HINT.with_hints_replaced", lambda: hint.with_hints_replaced(reversed(hint.hints)), hints_size
+
+    packed_PAK = generate_world_PAK(SCALES["small"].scaled(scale))
+    pak = PAK.from_packed(packed_PAK)
+    yield "PAK.from_packed", lambda: PAK.from_packed(packed_PAK), len(packed_PAK)
+    yield "PAK.packed", pak.packed, len(packed_PAK)
+    yield "PAK round trip", lambda: PAK.from_packed(packed_PAK).packed(), len(packed_PAK)
+    yield "PAK.with_resource_replaced", \
+        lambda: pak.with_resource_replaced(2, pak.resources[2]), pak.resource_tables[2].size
+    yield "PAK.with_resource_appended", \
+        lambda: pak.with_resource_appended(0x3000, pak.resources[2]), pak.resource_tables[2].size
+
+
+def run_benchmarks(scale: int = 1, repeat: int = 5, names=None):
+    results = []
+    for name, function, bytes_processed in _benchmark_cases(scale):
+        if names is None or name in names:
+            results.append(run_benchmark(name, function, bytes_processed, repeat))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the parse, pack and edit hot paths")
+    parser.add_argument("--scale", type=int, default=1, help="multiplier for the synthetic payload sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results from a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scale, args.repeat)
+
+    previous_min_times = {}
+    if args.compare:
+        with open(args.compare) as compare_file:
+            previous_min_times = {result["name"]: result["min_time"] for result in json.load(compare_file)["results"]}
+
+    for result in results:
+        line = (
+            f"{result.name:<36} {result.min_time * 1000:10.3f} ms {result.operations_per_second:12,.0f} ops/s "
+            f"{result.throughput / 2**20:10.1f} MiB/s {result.peak_memory / 2**20:10.2f} MiB peak"
+        )
+        if result.name in previous_min_times:
+            line += f" {result.min_time / previous_min_times[result.name]:8.2f}x"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "scale": args.scale,
+                "repeat": args.repeat,
+                "results": [dataclasses.asdict(result) for result in results],
+            }, output_file, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
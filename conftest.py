@@ -0,0 +1 @@
+# The modules are imported from the top level of the repository, so tests run against the working tree.
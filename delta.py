@@ -0,0 +1,260 @@
+# PAK deltas: the target PAK's tables plus, for each target resource, either a reference to an unchanged source
+# resource or its new payload. Applying a delta streams the unchanged resources straight out of the source PAK, after
+# checking each one against the SHA-1 digest of the span the delta was made from.
+
+import dataclasses
+import enum
+import hashlib
+import io
+import struct
+
+from pak import NamedResourceTable, ResourceTable, PAKHeader, PAK, aligned_size, aligned_to_32_bytes
+from util import unpack_int, unpack_ascii, pack_int, pack_ascii
+
+__all__ = ("ResourceDeltaKind", "ResourceDelta", "PAKDelta")
+
+# Version 1 didn't record what the unchanged source spans held
+_DELTA_VERSION = 2
+
+
+class ResourceDeltaKind(enum.Enum):
+    ADDED = 0
+    CHANGED = 1
+    UNCHANGED = 2
+
+
+@dataclasses.dataclass(frozen=True)
+class ResourceDelta:
+    _struct = struct.Struct(">BI")
+
+    kind: ResourceDeltaKind
+    asset_ID: int
+    # The new payload for added and changed resources, and the digest of the source span for unchanged ones
+    data: bytes = dataclasses.field(default=None, repr=False)
+    source_digest: bytes = dataclasses.field(default=None, repr=False)
+
+    @classmethod
+    def from_packed(cls, packed: bytes, asset_ID: int):
+        kind_int, data_size = cls._struct.unpack(packed[:5])
+        kind = ResourceDeltaKind(kind_int)
+        if kind == ResourceDeltaKind.UNCHANGED:
+            return cls(kind, asset_ID, source_digest=bytes(packed[5:5+data_size]))
+        return cls(kind, asset_ID, bytes(packed[5:5+data_size]))
+
+    @property
+    def _stored(self) -> bytes:
+        return self.source_digest if self.kind == ResourceDeltaKind.UNCHANGED else self.data
+
+    @property
+    def packed_size(self) -> int:
+        return 5 + len(self._stored)
+
+    def packed(self) -> bytes:
+        return b"".join((self._struct.pack(self.kind.value, len(self._stored)), self._stored))
+
+
+@dataclasses.dataclass(frozen=True)
+class PAKDelta:
+    _struct = struct.Struct(">4sIHHII")
+
+    magic: str
+    version: int
+    major_version: int
+    minor_version: int
+    unused: int
+    named_resource_count: int
+    named_resource_tables: tuple = dataclasses.field(repr=False)
+    resource_count: int
+    resource_tables: tuple = dataclasses.field(repr=False)
+    removed_asset_count: int
+    removed_asset_IDs: tuple = dataclasses.field(repr=False)
+    resource_deltas: tuple = dataclasses.field(repr=False)
+
+    @classmethod
+    def from_PAKs(cls, source: PAK, target: PAK, source_packed: bytes):
+        # source is the PAK parsed from source_packed, the bytes the delta is applied to. Unchanged resources are
+        # copied from their source spans as they are, which needn't be the size they'd pack to, so the tables are laid
+        # out from what apply writes rather than from target.packed().
+        source_packed = memoryview(source_packed)
+        source_resources = {
+            resource_table.asset_ID: (resource_table, resource)
+            for resource_table, resource in zip(source.resource_tables, source.resources)
+        }
+
+        resource_deltas = []
+        payload_sizes = []
+        for resource_table, resource in zip(target.resource_tables, target.resources):
+            asset_ID = resource_table.asset_ID
+            source_resource_table, source_resource = source_resources.get(asset_ID, (None, None))
+            if source_resource_table is None:
+                resource_delta = ResourceDelta(ResourceDeltaKind.ADDED, asset_ID, resource.packed())
+            elif source_resource is resource or source_resource == resource:
+                offset, size = source_resource_table.offset, source_resource_table.size
+                source_digest = hashlib.sha1(source_packed[offset:offset+size]).digest()
+                resource_delta = ResourceDelta(ResourceDeltaKind.UNCHANGED, asset_ID, source_digest=source_digest)
+            else:
+                resource_delta = ResourceDelta(ResourceDeltaKind.CHANGED, asset_ID, resource.packed())
+            resource_deltas.append(resource_delta)
+            written_size = source_resource_table.size if resource_delta.data is None else len(resource_delta.data)
+            payload_sizes.append(aligned_size(written_size))
+
+        target = target.laid_out()
+        target = dataclasses.replace(
+            target,
+            resource_tables=target._laid_out_resource_tables(payload_sizes, range(len(payload_sizes))),
+        )
+
+        target_asset_IDs = {resource_table.asset_ID for resource_table in target.resource_tables}
+        removed_asset_IDs = tuple(
+            resource_table.asset_ID
+            for resource_table in source.resource_tables
+            if resource_table.asset_ID not in target_asset_IDs
+        )
+
+        return cls(
+            "PAKD",
+            _DELTA_VERSION,
+            target.major_version,
+            target.minor_version,
+            target.unused,
+            target.named_resource_count,
+            target.named_resource_tables,
+            target.resource_count,
+            target.resource_tables,
+            len(removed_asset_IDs),
+            removed_asset_IDs,
+            tuple(resource_deltas),
+        )
+
+    @classmethod
+    def from_packed(cls, packed: bytes):
+        packed = memoryview(packed)
+        magic, version, major_version, minor_version, unused, named_resource_count = cls._struct.unpack(packed[:20])
+        if magic != b"PAKD":
+            raise ValueError(f"Not a PAK delta: magic is {bytes(magic)!r}")
+        if version != _DELTA_VERSION:
+            raise ValueError(f"PAK delta version {version} isn't supported; only version {_DELTA_VERSION} is")
+
+        offset = 20
+        named_resource_tables = []
+        for i in range(named_resource_count):
+            table = NamedResourceTable.from_packed(packed[offset:])
+            named_resource_tables.append(table)
+            offset += 12 + table.name_length
+
+        resource_count = unpack_int(packed[offset:offset+4])
+        offset += 4
+        resource_tables = []
+        for i in range(resource_count):
+            resource_tables.append(ResourceTable.from_packed(packed[offset:offset+20]))
+            offset += 20
+
+        removed_asset_count = unpack_int(packed[offset:offset+4])
+        offset += 4
+        removed_asset_IDs = struct.unpack(f">{removed_asset_count}I", packed[offset:offset+4*removed_asset_count])
+        offset += 4*removed_asset_count
+
+        resource_deltas = []
+        for resource_table in resource_tables:
+            resource_delta = ResourceDelta.from_packed(packed[offset:], resource_table.asset_ID)
+            resource_deltas.append(resource_delta)
+            offset += resource_delta.packed_size
+
+        return cls(
+            unpack_ascii(magic),
+            version,
+            major_version,
+            minor_version,
+            unused,
+            named_resource_count,
+            tuple(named_resource_tables),
+            resource_count,
+            tuple(resource_tables),
+            removed_asset_count,
+            removed_asset_IDs,
+            tuple(resource_deltas),
+        )
+
+    @property
+    def packed_size(self) -> int:
+        return len(self.packed())
+
+    def packed(self) -> bytes:
+        return b"".join((
+            self._struct.pack(
+                pack_ascii(self.magic),
+                self.version,
+                self.major_version,
+                self.minor_version,
+                self.unused,
+                self.named_resource_count,
+            ),
+            *(named_resource_table.packed() for named_resource_table in self.named_resource_tables),
+            pack_int(self.resource_count),
+            *(resource_table.packed() for resource_table in self.resource_tables),
+            pack_int(self.removed_asset_count),
+            struct.pack(f">{self.removed_asset_count}I", *self.removed_asset_IDs),
+            *(resource_delta.packed() for resource_delta in self.resource_deltas),
+        ))
+
+    def _asset_IDs_of_kind(self, kind: ResourceDeltaKind) -> tuple:
+        return tuple(resource_delta.asset_ID for resource_delta in self.resource_deltas if resource_delta.kind == kind)
+
+    @property
+    def added_asset_IDs(self) -> tuple:
+        return self._asset_IDs_of_kind(ResourceDeltaKind.ADDED)
+
+    @property
+    def changed_asset_IDs(self) -> tuple:
+        return self._asset_IDs_of_kind(ResourceDeltaKind.CHANGED)
+
+    @property
+    def unchanged_asset_IDs(self) -> tuple:
+        return self._asset_IDs_of_kind(ResourceDeltaKind.UNCHANGED)
+
+    @property
+    def header(self) -> PAKHeader:
+        return PAKHeader(
+            self.major_version,
+            self.minor_version,
+            self.unused,
+            self.named_resource_count,
+            self.named_resource_tables,
+            self.resource_count,
+            self.resource_tables,
+        )
+
+    def apply(self, source: bytes, output) -> None:
+        source = memoryview(source)
+        source_resource_tables = {
+            resource_table.asset_ID: resource_table
+            for resource_table in PAKHeader.from_packed(source).resource_tables
+        }
+
+        # Every unchanged span is checked against the source the delta was made from before anything is written
+        source_spans = {}
+        for resource_table, resource_delta in zip(self.resource_tables, self.resource_deltas):
+            if resource_delta.kind == ResourceDeltaKind.UNCHANGED:
+                source_resource_table = source_resource_tables.get(resource_delta.asset_ID)
+                span = None
+                if source_resource_table is not None:
+                    offset, size = source_resource_table.offset, source_resource_table.size
+                    span = source[offset:offset+size]
+                if span is None or aligned_size(len(span)) != resource_table.size \
+                        or hashlib.sha1(span).digest() != resource_delta.source_digest:
+                    raise ValueError(f"Source resource 0x{resource_delta.asset_ID:08X} isn't the one the delta expects")
+                source_spans[resource_delta.asset_ID] = span
+
+        output.write(self.header.packed())
+        for resource_delta in self.resource_deltas:
+            if resource_delta.kind == ResourceDeltaKind.UNCHANGED:
+                span = source_spans[resource_delta.asset_ID]
+                output.write(span)
+                output.write(((32 - (len(span) % 32)) % 32) * b"\xff")
+            else:
+                output.write(aligned_to_32_bytes(resource_delta.data))
+
+    def applied(self, source: bytes) -> bytes:
+        output = io.BytesIO()
+        self.apply(source, output)
+        return output.getvalue()
@@ -28,7 +28,7 @@ class Dependency:
 class DGRP:
     asset_type = "DGRP"
 
-    dependency_count: int
+    dependency_count: int = dataclasses.field(compare=False)
     dependencies: tuple
 
     @classmethod
@@ -37,8 +37,12 @@ class DGRP:
         dependencies = tuple(Dependency.from_packed(packed[4 + 8*i : 4 + 8*(i+1)]) for i in range(dependency_count))
         return cls(dependency_count, dependencies)
 
+    @property
+    def packed_size(self) -> int:
+        return 4 + 8*len(self.dependencies)
+
     def packed(self) -> bytes:
         return b"".join((
-            pack_int(self.dependency_count),
+            pack_int(len(self.dependencies)),
             *(dependency.packed() for dependency in self.dependencies),
         ))
\ No newline at end of file
@@ -0,0 +1,306 @@
+# Fuzzing harness for the parsers. Each case is a synthetic payload, or a resource from a real PAK, either as is or
+# with a few random byte mutations. Parsing it must either succeed or fail cleanly, and a payload that parses must
+# pack to a canonical form that packs back to itself. Unmutated synthetic payloads must pack back to exactly the
+# same bytes. The compiled SCLY field decoders are checked against the reference decoders, and PAK.from_packed
+# against the streaming reader.
+#
+# Usage: python fuzz.py [--cases N] [--seed N] [--target NAME] [--pak PAK ...] [--failures DIRECTORY]
+
+import argparse
+import dataclasses
+import io
+import os
+import random
+import struct
+import sys
+import time
+
+from dgrp import DGRP
+from hint import HINT
+from pak import PAK, PAKHeader
+from scan import SCAN
+from scly_common import PropertyStruct, ScriptObject
+from scly_schema import reference_field_values
+from strg import STRG
+from synth import generate_STRG, generate_HINT, generate_DGRP, generate_SCAN, generate_ScanTree, generate_PAK, \
+    generate_world_PAK
+from tree import ScanTree
+
+__all__ = ("FuzzFailure", "FuzzResult", "run_fuzz", "main")
+
+# What a parser may raise for a malformed payload
+_REJECTED_EXCEPTIONS = (struct.error, ValueError, IndexError, KeyError, EOFError)
+
+_SEEDS_PER_TARGET = 16
+
+# Code points whose UTF-16 encoding has a zero byte, so two of them in a row can put a pair of zero bytes across a
+# code unit boundary
+_TRICKY_CHARACTERS = "AĀ䄀Ł＀ÿ\U00010000 &;"
+
+
+@dataclasses.dataclass(frozen=True)
+class FuzzFailure:
+    target: str
+    check: str
+    error: str
+    packed: bytes = dataclasses.field(repr=False)
+
+
+@dataclasses.dataclass
+class FuzzResult:
+    cases: int = 0
+    rejected: int = 0
+    failures: list = dataclasses.field(default_factory=list)
+    total_time: float = 0.0
+
+    @property
+    def cases_per_second(self) -> float:
+        return self.cases / self.total_time if self.total_time else 0.0
+
+
+def _random_string(rng: random.Random) -> str:
+    return "".join(rng.choice(_TRICKY_CHARACTERS) for i in range(rng.randrange(6)))
+
+
+def _STRG_seed(rng: random.Random) -> bytes:
+    strg = STRG.from_packed(generate_STRG(
+        language_count=rng.randrange(4),
+        string_count=rng.randrange(8),
+        words_per_string=rng.randrange(1, 4),
+        seed=rng.getrandbits(32),
+    ))
+    for index, string_table in enumerate(strg.string_tables):
+        for string_index in range(len(string_table.strings)):
+            if rng.random() < 0.5:
+                string_table = string_table.with_string_replaced(string_index, _random_string(rng))
+        strg = strg.with_string_table_replaced(index, string_table)
+    return strg.packed()
+
+
+def _random_property_ID(rng: random.Random) -> int:
+    # Mostly IDs no schema knows, which are opaque unless unlisted structs are detected
+    return rng.choice((rng.getrandbits(32), 0x255A4580, 0x5846524D, 0x15694EE1, 0xFFFFFFFF))
+
+
+def _packed_random_property(rng: random.Random, depth: int) -> bytes:
+    if depth > 0 and rng.random() < 0.4:
+        subproperties = [_packed_random_property(rng, depth - 1) for i in range(rng.randrange(1, 4))]
+        body = b"".join((struct.pack(">H", len(subproperties)), *subproperties))
+    else:
+        body = rng.randbytes(rng.choice((0, 1, 4, 8, 12, 36)))
+    return struct.pack(">IH", _random_property_ID(rng), len(body)) + body
+
+
+def _PropertyStruct_seed(rng: random.Random) -> bytes:
+    subproperties = [_packed_random_property(rng, 3) for i in range(rng.randrange(6))]
+    body = b"".join((struct.pack(">H", len(subproperties)), *subproperties))
+    return struct.pack(">IH", _random_property_ID(rng), len(body)) + body
+
+
+def _PropertyStruct_detecting_structs(packed: bytes) -> PropertyStruct:
+    PropertyStruct.detect_unlisted_structs = True
+    try:
+        return PropertyStruct.from_packed(packed)
+    finally:
+        PropertyStruct.detect_unlisted_structs = False
+
+
+def _PAK_seed(rng: random.Random) -> bytes:
+    choice = rng.randrange(3)
+    if choice == 0:
+        return generate_PAK(())
+    if choice == 1:
+        asset_ID = rng.getrandbits(32)
+        return generate_PAK((("TXTR", asset_ID, rng.randbytes(rng.randrange(64))),), (("TXTR", asset_ID, "Texture"),))
+    return generate_world_PAK("tiny", seed=rng.getrandbits(32))
+
+
+# Target name -> (parser, seed generator)
+_TARGETS = {
+    "PAK": (PAK.from_packed, _PAK_seed),
+    "STRG": (STRG.from_packed, _STRG_seed),
+    "HINT": (HINT.from_packed, lambda rng: generate_HINT(
+        rng.randrange(4), rng.randrange(3), seed=rng.getrandbits(32)
+    )),
+    "SCAN": (SCAN.from_packed, lambda rng: generate_SCAN(rng.randrange(4), seed=rng.getrandbits(32))),
+    "DGRP": (DGRP.from_packed, lambda rng: generate_DGRP(rng.randrange(6), seed=rng.getrandbits(32))),
+    "ScanTree": (ScanTree.from_packed, lambda rng: generate_ScanTree(rng.randrange(8), seed=rng.getrandbits(32))),
+    "PropertyStruct": (PropertyStruct.from_packed, _PropertyStruct_seed),
+    "DetectedPropertyStruct": (_PropertyStruct_detecting_structs, _PropertyStruct_seed),
+}
+
+# Resource types in a real PAK that are used as seeds for each target
+_PAK_SEED_TYPES = {"STRG": "STRG", "HINT": "HINT", "SCAN": "SCAN", "DGRP": "DGRP"}
+
+
+def _mutated(packed: bytes, rng: random.Random) -> bytes:
+    packed = bytearray(packed)
+    for i in range(rng.randrange(1, 4)):
+        position = rng.randrange(len(packed) + 1)
+        mutation = rng.randrange(6)
+        if mutation == 0 and position < len(packed):
+            packed[position] ^= 1 << rng.randrange(8)
+        elif mutation == 1 and position < len(packed):
+            packed[position] = rng.getrandbits(8)
+        elif mutation == 2:
+            # Counts, sizes and offsets are mostly 2 or 4 bytes
+            width = rng.choice((2, 4))
+            packed[position:position+width] = rng.choice((0, 1, 2**(8*width) - 1, rng.getrandbits(8*width))) \
+                .to_bytes(width, "big")
+        elif mutation == 3:
+            packed[position:position] = rng.randbytes(rng.randrange(1, 9))
+        elif mutation == 4:
+            del packed[position:position+rng.randrange(1, 9)]
+        else:
+            del packed[position:]
+    return bytes(packed)
+
+
+def _typed_objects(value):
+    stack = [value]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, PAK):
+            stack.extend(current.resources)
+        elif isinstance(current, ScanTree):
+            stack.extend(current.objects)
+        elif isinstance(current, SCAN):
+            stack.append(current.scannable_object_info)
+        elif isinstance(current, ScriptObject):
+            stack.append(current.base_property_struct)
+            if current._schema is not None:
+                yield current
+        elif isinstance(current, PropertyStruct):
+            stack.extend(current.subproperties)
+            if current._schema is not None:
+                yield current
+
+
+def _same_value(value, reference) -> bool:
+    # NaN isn't equal to itself, so decoded floats are compared by their representation as well
+    return value == reference or repr(value) == repr(reference)
+
+
+def _check_reference_decoders(parsed):
+    for typed_object in _typed_objects(parsed):
+        namespace = vars(sys.modules[type(typed_object).__module__])
+        reference_values = reference_field_values(typed_object, typed_object._schema, namespace)
+        for name, reference_value in reference_values.items():
+            if not _same_value(getattr(typed_object, name), reference_value):
+                return f"{type(typed_object).__name__}.{name} is {getattr(typed_object, name)!r}, " \
+                    f"the reference decoder gives {reference_value!r}"
+    return None
+
+
+def _check_streaming_reader(pak: PAK, packed: bytes):
+    # The tables and every resource have to match, reading from bytes and from a file
+    if PAKHeader.from_file(io.BytesIO(packed)) != pak.header:
+        return "PAKHeader.from_file disagrees with PAKHeader.from_packed"
+
+    for source in (packed, io.BytesIO(packed)):
+        streamed = tuple(PAK.iter_resources(source))
+        if len(streamed) != len(pak.resources):
+            return f"iter_resources yields {len(streamed)} resources, from_packed {len(pak.resources)}"
+        for resource_table, resource, (asset_ID, asset_type, streamed_resource) \
+                in zip(pak.resource_tables, pak.resources, streamed):
+            if (asset_ID, asset_type) != (resource_table.asset_ID, resource_table.asset_type) \
+                    or streamed_resource.packed() != resource.packed():
+                return f"iter_resources disagrees with from_packed for 0x{resource_table.asset_ID:08X}"
+    return None
+
+
+def _checked_case(target: str, parse, packed: bytes, canonical: bool, result: FuzzResult) -> None:
+    def fail(check, error):
+        result.failures.append(FuzzFailure(target, check, error, packed))
+
+    try:
+        parsed = parse(packed)
+    except _REJECTED_EXCEPTIONS:
+        result.rejected += 1
+        return
+    except Exception as e:
+        return fail("parse", f"{type(e).__name__}: {e}")
+
+    check = "repack"
+    try:
+        repacked = parsed.packed()
+        if len(repacked) != parsed.packed_size:
+            return fail(check, f"packed_size is {parsed.packed_size}, packed() is {len(repacked)} bytes")
+        if canonical and repacked != packed:
+            return fail(check, "packed() doesn't give back the original bytes")
+
+        check = "canonical form"
+        if parse(repacked).packed() != repacked:
+            return fail(check, "the repacked bytes don't pack back to themselves")
+
+        check = "reference decoders"
+        error = _check_reference_decoders(parsed)
+        if error is None and isinstance(parsed, PAK):
+            check = "streaming reader"
+            error = _check_streaming_reader(parsed, packed)
+        if error is not None:
+            return fail(check, error)
+    except Exception as e:
+        return fail(check, f"{type(e).__name__}: {e}")
+
+
+def run_fuzz(cases: int = 10000, seed: int = 0, targets=None, pak_paths=()) -> dict:
+    # Returns target name -> FuzzResult. Cases are spread evenly over the targets.
+    rng = random.Random(seed)
+    targets = tuple(_TARGETS) if targets is None else tuple(targets)
+
+    seeds = {}
+    for target in targets:
+        seeds[target] = [(_TARGETS[target][1](rng), True) for i in range(_SEEDS_PER_TARGET)]
+    for path in pak_paths:
+        asset_types = {asset_type: target for target, asset_type in _PAK_SEED_TYPES.items() if target in targets}
+        for asset_ID, asset_type, packed_resource in PAK.iter_resources(path, types=set(asset_types), decode=False):
+            # Real resources may carry alignment padding, so they're only checked for a canonical form
+            seeds[asset_types[asset_type]].append((packed_resource, False))
+
+    results = {target: FuzzResult() for target in targets}
+    for i in range(cases):
+        target = targets[i % len(targets)]
+        packed, canonical = rng.choice(seeds[target])
+        if rng.random() < 0.9:
+            packed, canonical = _mutated(packed, rng), False
+
+        result = results[target]
+        start_time = time.perf_counter()
+        _checked_case(target, _TARGETS[target][0], packed, canonical, result)
+        result.total_time += time.perf_counter() - start_time
+        result.cases += 1
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fuzz the parsers with mutated payloads")
+    parser.add_argument("--cases", type=int, default=10000, help="number of payloads to check")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, so a run can be repeated")
+    parser.add_argument("--target", action="append", dest="targets", choices=tuple(_TARGETS), help="only fuzz this")
+    parser.add_argument("--pak", action="append", dest="pak_paths", default=[], help="use this PAK's resources too")
+    parser.add_argument("--failures", help="directory to write the payloads of failed cases to")
+    args = parser.parse_args(argv)
+
+    results = run_fuzz(args.cases, args.seed, args.targets, args.pak_paths)
+
+    failures = []
+    for target, result in results.items():
+        print(
+            f"{target:<24} {result.cases:>8} cases {result.rejected:>8} rejected {len(result.failures):>6} failed "
+            f"{result.cases_per_second:>10.0f} cases/s"
+        )
+        failures.extend(result.failures)
+
+    for i, failure in enumerate(failures):
+        print(f"{failure.target} {failure.check}: {failure.error}")
+        if args.failures:
+            os.makedirs(args.failures, exist_ok=True)
+            with open(os.path.join(args.failures, f"{failure.target}_{i}.bin"), "wb") as failure_file:
+                failure_file.write(failure.packed)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 # Source: http://www.metroid2002.com/retromodding/wiki/HINT_(File_Format)
 
 import dataclasses
+import functools
 import struct
 
+from pvector import PersistentVector, persistent
 from util import unpack_null_terminated_ascii, pack_null_terminated_ascii
 
 __all__ = ("HintLocation", "Hint", "HINT")
@@ -43,31 +45,41 @@ class Hint:
     normal_time: float
     text_STRG_asset_ID: int
     page_count: int
-    location_count: int
+    location_count: int = dataclasses.field(compare=False)
     locations: tuple = dataclasses.field(repr=False)
 
     @classmethod
     def from_packed(cls, packed: bytes):
-        offset = packed.index(b"\x00") + 1
-        name = unpack_null_terminated_ascii(packed[:offset])
+        return cls._from_packed_at(packed, 0)[0]
+
+    @classmethod
+    def _from_packed_at(cls, packed: bytes, offset: int):
+        # Returns the hint starting at offset and the offset just past it, without copying the rest of the buffer
+        name_end = packed.index(b"\x00", offset) + 1
+        name = unpack_null_terminated_ascii(packed[offset:name_end])
 
         immediate_time, normal_time, text_STRG_asset_ID, \
-            page_count, location_count = cls._struct.unpack(packed[offset:offset+20])
-        offset += 20
+            page_count, location_count = cls._struct.unpack_from(packed, name_end)
+        locations_start = name_end + 20
+        locations_end = locations_start + 16*location_count
 
-        return cls(
+        hint = cls(
             name,
             immediate_time,
             normal_time,
             text_STRG_asset_ID,
             page_count,
             location_count,
-            tuple(HintLocation.from_packed(packed[offset + 16*i:offset + 16*(i+1)]) for i in range(location_count)),
+            tuple(
+                HintLocation(*location_fields)
+                for location_fields in HintLocation._struct.iter_unpack(packed[locations_start:locations_end])
+            ),
         )
+        return hint, locations_end
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return len(self.name) + 1 + 20 + 16*len(self.locations)
 
     def packed(self) -> bytes:
         return b"".join((
@@ -77,7 +89,7 @@ class Hint:
                 self.normal_time,
                 self.text_STRG_asset_ID,
                 self.page_count,
-                self.location_count,
+                len(self.locations),
             ),
             *(location.packed() for location in self.locations),
         ))
@@ -85,13 +97,18 @@ class Hint:
 
 @dataclasses.dataclass(frozen=True)
 class HINT:
+    asset_type = "HINT"
+
     _struct = struct.Struct(">III")
 
     magic: int
     version: int
-    hint_count: int
+    hint_count: int = dataclasses.field(compare=False)
     hints: tuple = dataclasses.field(repr=False)
 
+    def __post_init__(self):
+        object.__setattr__(self, "hints", persistent(self.hints))
+
     @classmethod
     def from_packed(cls, packed: bytes):
         magic, version, hint_count = cls._struct.unpack(packed[:12])
@@ -99,22 +116,62 @@ class HINT:
         offset = 12
         hints = []
         for i in range(hint_count):
-            hint = Hint.from_packed(packed[offset:])
+            hint, offset = Hint._from_packed_at(packed, offset)
             hints.append(hint)
-            offset += hint.packed_size
 
-        return cls(magic, version, hint_count, tuple(hints))
+        return cls(magic, version, hint_count, PersistentVector(hints))
+
+    @functools.cached_property
+    def _name_to_index_map(self) -> dict:
+        name_to_index_map = {}
+        for index, hint in enumerate(self.hints):
+            name_to_index_map[hint.name] = index
+        return name_to_index_map
+
+    @functools.cached_property
+    def _room_to_indices_map(self) -> dict:
+        room_to_indices_map = {}
+        for index, hint in enumerate(self.hints):
+            for room_MREA_asset_ID in dict.fromkeys(location.room_MREA_asset_ID for location in hint.locations):
+                room_to_indices_map.setdefault(room_MREA_asset_ID, []).append(index)
+        return {room_MREA_asset_ID: tuple(indices) for room_MREA_asset_ID, indices in room_to_indices_map.items()}
+
+    @functools.cached_property
+    def _world_to_indices_map(self) -> dict:
+        world_to_indices_map = {}
+        for index, hint in enumerate(self.hints):
+            for world_MLVL_asset_ID in dict.fromkeys(location.world_MLVL_asset_ID for location in hint.locations):
+                world_to_indices_map.setdefault(world_MLVL_asset_ID, []).append(index)
+        return {world_MLVL_asset_ID: tuple(indices) for world_MLVL_asset_ID, indices in world_to_indices_map.items()}
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return 4 + 4 + 4 + sum(hint.packed_size for hint in self.hints)
 
     def packed(self) -> bytes:
-        return b"".join(
-            self._struct.pack(self.magic, self.version, self.hint_count),
+        return b"".join((
+            self._struct.pack(self.magic, self.version, len(self.hints)),
             *(hint.packed() for hint in self.hints),
-        )
+        ))
 
     def with_hints_replaced(self, new_hints):
-        new_hints = tuple(new_hints)
-        return dataclasses.replace(self, hint_count=len(new_hints), hints=new_hints)
\ No newline at end of file
+        return dataclasses.replace(self, hints=PersistentVector(new_hints))
+
+    def get_hint_by_name(self, name: str) -> Hint:
+        return self.hints[self._name_to_index_map[name]]
+
+    def get_hints_for_room(self, room_MREA_asset_ID: int) -> tuple:
+        return tuple(self.hints[index] for index in self._room_to_indices_map.get(room_MREA_asset_ID, ()))
+
+    def get_hints_for_world(self, world_MLVL_asset_ID: int) -> tuple:
+        return tuple(self.hints[index] for index in self._world_to_indices_map.get(world_MLVL_asset_ID, ()))
+
+    def with_hint_replaced(self, index: int, new_hint: Hint):
+        return dataclasses.replace(self, hints=self.hints.set(index, new_hint))
+
+    def with_hints_updated(self, new_hints_by_name: dict):
+        # Replaces many hints, looked up by their current names, in one pass
+        new_hints = self.hints
+        for name, new_hint in new_hints_by_name.items():
+            new_hints = new_hints.set(self._name_to_index_map[name], new_hint)
+        return dataclasses.replace(self, hints=new_hints)
\ No newline at end of file
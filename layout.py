@@ -0,0 +1,113 @@
+# Reorders the resource payloads in a PAK so assets that are loaded together are stored next to each other. The load
+# groups come from the dependency lists of the DGRP and SCAN resources: each group is the resource itself followed
+# by the dependencies it lists that are in the same PAK. The resource tables keep their order; only the offsets
+# change.
+#
+# Usage: python layout.py input.pak output.pak
+
+import argparse
+import dataclasses
+import sys
+
+from pak import PAK
+
+__all__ = ("LayoutReport", "dependency_groups", "optimized_order", "seek_distance", "optimized_layout", "main")
+
+
+@dataclasses.dataclass(frozen=True)
+class LayoutReport:
+    group_count: int
+    seek_distance_before: int
+    seek_distance_after: int
+
+    def __str__(self) -> str:
+        return (
+            f"{self.group_count} load groups, seek distance "
+            f"{self.seek_distance_before:,} -> {self.seek_distance_after:,} bytes"
+        )
+
+
+def _listed_dependencies(resource_type: str, resource) -> tuple:
+    if resource_type == "DGRP":
+        return resource.dependencies
+    if resource_type == "SCAN":
+        return resource.dependencies.dependencies
+    return ()
+
+
+def dependency_groups(pak: PAK) -> tuple:
+    # Each group is a tuple of resource indices, in the order the game would read them
+    groups = []
+    for index, resource_table in enumerate(pak.resource_tables):
+        dependencies = _listed_dependencies(resource_table.asset_type, pak.resources[index])
+        group = [index]
+        for dependency in dependencies:
+            dependency_index = pak._asset_ID_to_index_map.get(dependency.asset_ID)
+            if dependency_index is not None and dependency_index not in group:
+                group.append(dependency_index)
+        if len(group) > 1:
+            groups.append(tuple(group))
+    return tuple(groups)
+
+
+def optimized_order(pak: PAK, groups=None) -> tuple:
+    # Greedy: groups are placed in table order, each resource where it's first needed, and resources that aren't in
+    # any group keep their relative order at the end
+    if groups is None:
+        groups = dependency_groups(pak)
+
+    placed = set()
+    order = []
+    for group in groups:
+        for index in group:
+            if index not in placed:
+                placed.add(index)
+                order.append(index)
+    order.extend(index for index in range(len(pak.resource_tables)) if index not in placed)
+    return tuple(order)
+
+
+def seek_distance(resource_tables, groups) -> int:
+    # Total distance the read head travels between consecutive reads within each group. Groups are loaded
+    # independently, so moving to a group's first resource isn't counted.
+    distance = 0
+    for group in groups:
+        position = None
+        for index in group:
+            resource_table = resource_tables[index]
+            if position is not None:
+                distance += abs(resource_table.offset - position)
+            position = resource_table.offset + resource_table.size
+    return distance
+
+
+def optimized_layout(pak: PAK):
+    # Returns the layout order to pass to PAK.packed() and a report comparing it with table order
+    groups = dependency_groups(pak)
+    order = optimized_order(pak, groups)
+    report = LayoutReport(
+        len(groups),
+        seek_distance(pak.laid_out().resource_tables, groups),
+        seek_distance(pak.laid_out(order).resource_tables, groups),
+    )
+    return order, report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Store the resources of a PAK in load order")
+    parser.add_argument("input", help="PAK to read")
+    parser.add_argument("output", help="path to write the reordered PAK to")
+    args = parser.parse_args(argv)
+
+    with open(args.input, "rb") as input_file:
+        pak = PAK.from_packed(input_file.read())
+    order, report = optimized_layout(pak)
+    with open(args.output, "wb") as output_file:
+        output_file.write(pak.packed(order=order))
+
+    print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
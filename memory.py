@@ -0,0 +1,204 @@
+# Memory accounting for decoded PAKs. Walks the object graph of each resource and attributes the deep size to the
+# resource's class and to every object type in it, next to the packed size from the resource table, so the cost of
+# the decoded representation can be tracked.
+#
+# Objects shared between resources are counted once, for the first resource that reaches them. What's left of the
+# PAK after its resources, the tables, indexes and the resource vector, is counted under "PAK".
+#
+# Usage: python memory.py PAK ... [--output report.json] [--compare previous.json]
+
+import argparse
+import collections
+import dataclasses
+import enum
+import json
+import sys
+import types
+
+from pak import PAK
+
+__all__ = ("MemoryEntry", "ResourceMemory", "deep_size", "MemoryReport", "main")
+
+_REPORT_VERSION = 1
+
+# Objects with nothing of their own below them
+_LEAF_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None))
+# Shared by everything that uses them, so not part of any resource
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, enum.Enum)
+
+
+@dataclasses.dataclass
+class MemoryEntry:
+    count: int = 0
+    packed_size: int = 0
+    memory_size: int = 0
+
+    @property
+    def overhead(self) -> float:
+        # Bytes of memory per packed byte
+        return self.memory_size / self.packed_size if self.packed_size else 0.0
+
+
+@dataclasses.dataclass(frozen=True)
+class ResourceMemory:
+    asset_ID: int
+    asset_type: str
+    class_name: str
+    packed_size: int
+    memory_size: int
+
+
+def _slot_names(object_type: type):
+    for base in object_type.__mro__:
+        slots = base.__dict__.get("__slots__", ())
+        yield from (slots,) if isinstance(slots, str) else slots
+
+
+def deep_size(object_, seen: set = None, type_sizes: dict = None) -> int:
+    # The sizes of object_ and everything it reaches that isn't in seen, which is updated. type_sizes, if given, is
+    # a defaultdict(MemoryEntry) that gets each object's own size under its type name.
+    if seen is None:
+        seen = set()
+
+    total_size = 0
+    stack = [object_]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+
+        size = sys.getsizeof(current)
+        total_size += size
+        if type_sizes is not None:
+            entry = type_sizes[type(current).__name__]
+            entry.count += 1
+            entry.memory_size += size
+
+        if isinstance(current, _LEAF_TYPES):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (tuple, list, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, memoryview):
+            stack.append(current.obj)
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for name in _slot_names(type(current)):
+                if hasattr(current, name):
+                    stack.append(getattr(current, name))
+    return total_size
+
+
+class MemoryReport:
+    def __init__(self):
+        self.resources = []
+        # Class name -> MemoryEntry, with "PAK" for the PAK's own tables and indexes
+        self.class_entries = collections.defaultdict(MemoryEntry)
+        # Object type name -> MemoryEntry without a packed size
+        self.type_entries = collections.defaultdict(MemoryEntry)
+
+    def add_PAK(self, pak: PAK) -> None:
+        seen = set()
+        for resource_table, resource in zip(pak.resource_tables, pak.resources):
+            memory_size = deep_size(resource, seen, self.type_entries)
+            class_name = type(resource).__name__
+            self.resources.append(ResourceMemory(
+                resource_table.asset_ID,
+                resource_table.asset_type,
+                class_name,
+                resource_table.size,
+                memory_size,
+            ))
+            entry = self.class_entries[class_name]
+            entry.count += 1
+            entry.packed_size += resource_table.size
+            entry.memory_size += memory_size
+
+        entry = self.class_entries["PAK"]
+        entry.count += 1
+        entry.packed_size += pak.packed_content_before_resources_size
+        entry.memory_size += deep_size(pak, seen, self.type_entries)
+
+    @classmethod
+    def from_PAK(cls, pak: PAK):
+        report = cls()
+        report.add_PAK(pak)
+        return report
+
+    @property
+    def total(self) -> MemoryEntry:
+        return MemoryEntry(
+            sum(entry.count for entry in self.class_entries.values()),
+            sum(entry.packed_size for entry in self.class_entries.values()),
+            sum(entry.memory_size for entry in self.class_entries.values()),
+        )
+
+    def report(self, previous: dict = None, type_count: int = 15) -> str:
+        # previous is the as_dict() of an earlier report; each class's overhead is compared with it
+        previous_overheads = {}
+        if previous is not None:
+            previous_overheads = {
+                class_name: entry["memory_size"] / entry["packed_size"]
+                for class_name, entry in previous["classes"].items()
+                if entry["packed_size"]
+            }
+
+        lines = [f"{'Class':<24} {'Count':>8} {'Packed (KiB)':>14} {'Memory (KiB)':>14} {'Overhead':>10}"]
+        entries = sorted(self.class_entries.items(), key=lambda item: -item[1].memory_size)
+        for class_name, entry in (*entries, ("Total", self.total)):
+            line = (
+                f"{class_name:<24} {entry.count:>8} {entry.packed_size / 1024:>14.1f} "
+                f"{entry.memory_size / 1024:>14.1f} {entry.overhead:>9.2f}x"
+            )
+            if previous_overheads.get(class_name):
+                line += f" {entry.overhead / previous_overheads[class_name]:8.2f}x previous"
+            lines.append(line)
+
+        lines.extend(("", f"{'Type':<24} {'Count':>8} {'Memory (KiB)':>14}"))
+        for type_name, entry in sorted(self.type_entries.items(), key=lambda item: -item[1].memory_size)[:type_count]:
+            lines.append(f"{type_name:<24} {entry.count:>8} {entry.memory_size / 1024:>14.1f}")
+        return "\n".join(lines)
+
+    def as_dict(self) -> dict:
+        return {
+            "version": _REPORT_VERSION,
+            "python": sys.version.split()[0],
+            "classes": {class_name: dataclasses.asdict(entry) for class_name, entry in self.class_entries.items()},
+            "types": {type_name: dataclasses.asdict(entry) for type_name, entry in self.type_entries.items()},
+            "resources": [dataclasses.asdict(resource) for resource in self.resources],
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w") as report_file:
+            json.dump(self.as_dict(), report_file, indent=4)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report how much memory decoded PAKs take, by asset class")
+    parser.add_argument("paths", nargs="+", metavar="PAK", help="PAKs to decode and measure")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="JSON report from a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    report = MemoryReport()
+    for path in args.paths:
+        with open(path, "rb") as pak_file:
+            report.add_PAK(PAK.from_packed(pak_file.read()))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as compare_file:
+            previous = json.load(compare_file)
+    print(report.report(previous))
+
+    if args.output:
+        report.write_json(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
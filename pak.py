@@ -1,17 +1,26 @@
 # Source: http://www.metroid2002.com/retromodding/wiki/PAK_(Metroid_Prime)
 
 import dataclasses
+import functools
+import hashlib
+import operator
+import os
 import struct
+import weakref
 
-from dgrp import DGRP
-from dumb import DUMB
-from hint import HINT
-from scan import SCAN
-from strg import STRG
-from tree import ScanTree
-from util import unpack_int, unpack_ascii, pack_int, pack_ascii
+import profiling
+from pvector import PersistentVector, persistent
+from util import unpack_int, unpack_ascii, pack_int, pack_ascii, LazyRegistry
 
-__all__ = ("NamedResourceTable", "ResourceTable", "UnimplementedResource", "PAK")
+__all__ = (
+    "NamedResourceTable",
+    "ResourceTable",
+    "UnimplementedResource",
+    "PAKHeader",
+    "RoundTripMismatch",
+    "RoundTripError",
+    "PAK",
+)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -20,7 +29,7 @@ class NamedResourceTable:
 
     asset_type: str
     asset_ID: int
-    name_length: int
+    name_length: int = dataclasses.field(compare=False)
     name: str
 
     @classmethod
@@ -35,11 +44,11 @@ class NamedResourceTable:
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return 12 + len(self.name)
 
     def packed(self) -> bytes:
         return b"".join((
-            self._struct.pack(pack_ascii(self.asset_type), self.asset_ID, self.name_length),
+            self._struct.pack(pack_ascii(self.asset_type), self.asset_ID, len(self.name)),
             pack_ascii(self.name),
         ))
 
@@ -51,8 +60,9 @@ class ResourceTable:
     compressed: bool
     asset_type: str
     asset_ID: int
-    size: int
-    offset: int
+    # Where the resource is stored is worked out when the PAK is packed, so it isn't part of the table's identity
+    size: int = dataclasses.field(compare=False)
+    offset: int = dataclasses.field(compare=False)
 
     @classmethod
     def from_packed(cls, packed: bytes):
@@ -61,7 +71,7 @@ class ResourceTable:
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return self._struct.size
 
     def packed(self) -> bytes:
         return self._struct.pack(
@@ -89,6 +99,135 @@ class UnimplementedResource:
         return self.data
 
 
+@dataclasses.dataclass(frozen=True)
+class PAKHeader:
+    _struct = struct.Struct(">HHII")
+
+    major_version: int
+    minor_version: int
+    unused: int
+    # The counts are as parsed; packing uses the lengths of the tables
+    named_resource_count: int = dataclasses.field(compare=False)
+    named_resource_tables: tuple = dataclasses.field(repr=False)
+    resource_count: int = dataclasses.field(compare=False)
+    resource_tables: tuple = dataclasses.field(repr=False)
+
+    @classmethod
+    def _from_reader(cls, read):
+        # read(offset, size) returns at least size bytes starting at offset
+        major_version, minor_version, unused, named_resource_count = cls._struct.unpack(read(0, 12)[:12])
+
+        offset = 12
+        named_resource_tables = []
+        for i in range(named_resource_count):
+            name_length = unpack_int(read(offset+8, 4)[:4])
+            table = NamedResourceTable.from_packed(read(offset, 12+name_length))
+            named_resource_tables.append(table)
+            offset += 12 + table.name_length
+
+        resource_count = unpack_int(read(offset, 4)[:4])
+        offset += 4
+        packed_resource_tables = read(offset, 20*resource_count)
+        resource_tables = tuple(
+            ResourceTable.from_packed(packed_resource_tables[20*i:20*(i+1)]) for i in range(resource_count)
+        )
+
+        return cls(
+            major_version,
+            minor_version,
+            unused,
+            named_resource_count,
+            tuple(named_resource_tables),
+            resource_count,
+            resource_tables,
+        )
+
+    @classmethod
+    def from_packed(cls, packed: bytes):
+        packed = memoryview(packed)
+        return cls._from_reader(lambda offset, size: packed[offset:offset+size])
+
+    @classmethod
+    def from_file(cls, file):
+        # Only reads the table region, which is a few KB even for the largest PAKs
+        start = file.tell()
+        buffer = bytearray()
+
+        def read(offset, size):
+            if offset + size > len(buffer):
+                file.seek(start + len(buffer))
+                buffer.extend(file.read(max(offset + size - len(buffer), 4096)))
+            return memoryview(buffer)[offset:offset+size]
+
+        return cls._from_reader(read)
+
+    @property
+    def packed_content_before_resources_size(self) -> int:
+        named_resource_tables_size = \
+            sum(named_resource_table.packed_size for named_resource_table in self.named_resource_tables)
+        return 2 + 2 + 4 + 4 + named_resource_tables_size + 4 + 20*len(self.resource_tables)
+
+    @property
+    def packed_padding_before_resources_size(self) -> int:
+        return (32 - (self.packed_content_before_resources_size % 32)) % 32
+
+    def packed(self) -> bytes:
+        return b"".join((
+            self._struct.pack(self.major_version, self.minor_version, self.unused, len(self.named_resource_tables)),
+            *(named_resource_table.packed() for named_resource_table in self.named_resource_tables),
+            pack_int(len(self.resource_tables)),
+            *(resource_table.packed() for resource_table in self.resource_tables),
+            b"\x00" * self.packed_padding_before_resources_size,
+        ))
+
+
+@dataclasses.dataclass(frozen=True)
+class RoundTripMismatch:
+    asset_ID: int
+    asset_class: str
+
+
+class RoundTripError(ValueError):
+    def __init__(self, mismatches):
+        self.mismatches = tuple(mismatches)
+        super().__init__("Resources don't pack back to their original bytes: " + ", ".join(
+            f"{mismatch.asset_class} 0x{mismatch.asset_ID:08X}" for mismatch in self.mismatches
+        ))
+
+
+def _usable_cpu_count() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _decode_shared_resources(shared_memory_name: str, jobs) -> list:
+    # Runs in a worker process. jobs is a list of (asset class, offset, size); each resource is copied out of the
+    # shared block so nothing returned refers to it.
+    from multiprocessing import shared_memory
+
+    shared_block = shared_memory.SharedMemory(shared_memory_name)
+    try:
+        return [
+            asset_class.from_packed(bytes(shared_block.buf[offset:offset+size]))
+            for asset_class, offset, size in jobs
+        ]
+    finally:
+        shared_block.close()
+
+
+def _set_asset_names(asset_to_names_map: dict, asset, names, name_to_index_map: dict) -> None:
+    # Sets an asset's names in a copy of a PAK's map, in the order of their tables
+    if names:
+        asset_to_names_map[asset] = tuple(sorted(names, key=name_to_index_map.__getitem__))
+    else:
+        asset_to_names_map.pop(asset, None)
+
+
+def aligned_size(size: int) -> int:
+    return (size + 31) // 32 * 32
+
+
 def aligned_to_32_bytes(bytes_to_align: bytes):
     padding = ((32 - (len(bytes_to_align) % 32)) % 32) * b"\xff"
     return bytes_to_align + padding
@@ -100,72 +239,265 @@ class PAK:
     major_version: int
     minor_version: int
     unused: int
-    named_resource_count: int
+    # The counts are as parsed; packing uses the lengths of the tables
+    named_resource_count: int = dataclasses.field(compare=False)
     named_resource_tables: tuple = dataclasses.field(repr=False)
-    resource_count: int
+    resource_count: int = dataclasses.field(compare=False)
     resource_tables: tuple = dataclasses.field(repr=False)
     resources: tuple = dataclasses.field(repr=False)
-
-    asset_classes = {
-        "DGRP": DGRP,
-        "DUMB": DUMB,
-        "HINT": HINT,
-        "SCAN": SCAN,
-        "STRG": STRG,
-    }
+    # Asset ID -> (weak reference to the resource as decoded, original span size, digest of the original span), when
+    # parsed with verify
+    verification_digests: dict = dataclasses.field(default=None, repr=False, compare=False)
 
     def __post_init__(self):
+        # The tables and resources are edited in place of being rebuilt, so they're kept in persistent vectors
+        object.__setattr__(self, "named_resource_tables", persistent(self.named_resource_tables))
+        object.__setattr__(self, "resource_tables", persistent(self.resource_tables))
+        object.__setattr__(self, "resources", persistent(self.resources))
+
+    # Each parser module is imported the first time an asset it handles is decoded, so tools that only read the
+    # tables don't pay for importing all of them
+    asset_classes = LazyRegistry({
+        "DGRP": "dgrp:DGRP",
+        "DUMB": "dumb:DUMB",
+        "HINT": "hint:HINT",
+        "SCAN": "scan:SCAN",
+        "STRG": "strg:STRG",
+    })
+    # Assets whose class depends on their ID rather than their type
+    asset_ID_classes = LazyRegistry({
+        0x95B61279: "tree:ScanTree",
+    })
+
+    # The indexes are built on first use rather than in __post_init__, so a chain of edits doesn't rebuild them for
+    # every intermediate PAK. Once built, the edits carry them forward, updating only the entries they change.
+    @functools.cached_property
+    def _asset_ID_to_index_map(self) -> dict:
+        # Tables from a shared store come with their index already built
+        shared_index = getattr(self.resource_tables, "asset_ID_to_index_map", None)
+        if shared_index is not None:
+            return shared_index
+
         asset_ID_to_index_map = {}
         for index, resource_table in enumerate(self.resource_tables):
             asset_ID_to_index_map[resource_table.asset_ID] = index
-        object.__setattr__(self, "_asset_ID_to_index_map", asset_ID_to_index_map)
+        return asset_ID_to_index_map
+
+    @functools.cached_property
+    def _name_to_index_map(self) -> dict:
+        name_to_index_map = {}
+        for index, named_resource_table in enumerate(self.named_resource_tables):
+            name_to_index_map[named_resource_table.name] = index
+        return name_to_index_map
+
+    @functools.cached_property
+    def _asset_to_names_map(self) -> dict:
+        asset_to_names_map = {}
+        for named_resource_table in self.named_resource_tables:
+            asset = (named_resource_table.asset_type, named_resource_table.asset_ID)
+            asset_to_names_map.setdefault(asset, []).append(named_resource_table.name)
+        return {asset: tuple(names) for asset, names in asset_to_names_map.items()}
+
+    def _replaced(self, name_to_index_map=None, asset_to_names_map=None, asset_ID_to_index_map=None, **changes):
+        # dataclasses.replace, with the given indexes set on the new PAK. The name indexes are kept when the named
+        # tables don't change.
+        new_pak = dataclasses.replace(self, **changes)
+        if "named_resource_tables" not in changes:
+            name_to_index_map = self.__dict__.get("_name_to_index_map")
+            asset_to_names_map = self.__dict__.get("_asset_to_names_map")
+        for name, index_map in (
+            ("_name_to_index_map", name_to_index_map),
+            ("_asset_to_names_map", asset_to_names_map),
+            ("_asset_ID_to_index_map", asset_ID_to_index_map),
+        ):
+            if index_map is not None:
+                new_pak.__dict__[name] = index_map
+        return new_pak
 
     @classmethod
-    def from_packed(cls, packed: bytes):
-        major_version, minor_version, unused, named_resource_count = cls._struct.unpack(packed[:12])
+    def read_tables(cls, source) -> PAKHeader:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as file:
+                return PAKHeader.from_file(file)
+        if hasattr(source, "read"):
+            return PAKHeader.from_file(source)
+        return PAKHeader.from_packed(source)
 
-        offset = 12
-        named_resource_tables = []
-        for i in range(named_resource_count):
-            table = NamedResourceTable.from_packed(packed[offset:])
-            named_resource_tables.append(table)
-            offset += 12 + table.name_length
+    @classmethod
+    def iter_resources(cls, source, types=None, decode: bool = True):
+        # Yields (asset ID, asset type, resource) one at a time, reading each resource only when it's reached, so
+        # memory use doesn't grow with the PAK. Resources whose type isn't in types are never read. With decode=False
+        # the packed bytes are yielded instead.
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as file:
+                yield from cls._iter_resources_from_file(file, types, decode)
+        elif hasattr(source, "read"):
+            yield from cls._iter_resources_from_file(source, types, decode)
+        else:
+            header = PAKHeader.from_packed(source)
+            yield from cls._iter_resources(header, lambda offset, size: source[offset:offset+size], types, decode)
 
-        resource_count = unpack_int(packed[offset:offset+4])
-        offset += 4
-        resource_tables = []
-        for i in range(resource_count):
-            resource_tables.append(ResourceTable.from_packed(packed[offset:offset+20]))
-            offset += 20
+    @classmethod
+    def _iter_resources_from_file(cls, file, types, decode: bool):
+        start = file.tell()
+        header = PAKHeader.from_file(file)
 
-        end_of_resource_tables_offset = offset
-        resources = []
-        for resource_table in resource_tables:
-            if resource_table.asset_ID == 0x95B61279:
-                asset_class = ScanTree
+        def read(offset, size):
+            file.seek(start + offset)
+            return file.read(size)
+
+        yield from cls._iter_resources(header, read, types, decode)
+
+    @classmethod
+    def _iter_resources(cls, header: PAKHeader, read, types, decode: bool):
+        profiler = profiling.active
+        for resource_table in header.resource_tables:
+            if types is not None and resource_table.asset_type not in types:
+                continue
+
+            packed_resource = read(resource_table.offset, resource_table.size)
+            if not decode:
+                resource = packed_resource
             else:
-                asset_class = cls.asset_classes.get(resource_table.asset_type, UnimplementedResource)
+                asset_class = cls._get_asset_class(resource_table)
+                if profiler is None:
+                    resource = asset_class.from_packed(packed_resource)
+                else:
+                    resource = profiler.call(
+                        asset_class, "from_packed", resource_table.size, asset_class.from_packed, packed_resource
+                    )
+            yield resource_table.asset_ID, resource_table.asset_type, resource
+
+    @classmethod
+    def _get_asset_class(cls, resource_table: ResourceTable):
+        if resource_table.asset_ID in cls.asset_ID_classes:
+            return cls.asset_ID_classes[resource_table.asset_ID]
+        return cls.asset_classes.get(resource_table.asset_type, UnimplementedResource)
+
+    @classmethod
+    def _decoded_resources_in_parallel(cls, packed: bytes, header: PAKHeader, workers: int) -> list:
+        # The PAK is copied once into shared memory instead of being pickled for every worker. Resources are split
+        # into contiguous batches of roughly equal size, several per worker so uneven batches even out. Unimplemented
+        # resources are only a slice, so they're made here rather than sent back and forth.
+        import concurrent.futures
+        from multiprocessing import shared_memory
+
+        resources = []
+        decoded_indices = []
+        jobs = []
+        for index, resource_table in enumerate(header.resource_tables):
+            asset_class = cls._get_asset_class(resource_table)
             offset, size = resource_table.offset, resource_table.size
-            resources.append(asset_class.from_packed(packed[offset:offset+size]))
+            if asset_class is UnimplementedResource:
+                resources.append(UnimplementedResource(packed[offset:offset+size]))
+            else:
+                resources.append(None)
+                decoded_indices.append(index)
+                jobs.append((asset_class, offset, size))
+
+        batch_size = max(sum(size for _, _, size in jobs) // (4 * workers), 1)
+        batches = [[]]
+        batch_bytes = 0
+        for job in jobs:
+            if batch_bytes >= batch_size:
+                batches.append([])
+                batch_bytes = 0
+            batches[-1].append(job)
+            batch_bytes += job[2]
+
+        shared_block = shared_memory.SharedMemory(create=True, size=max(len(packed), 1))
+        try:
+            shared_block.buf[:len(packed)] = packed
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                decoded_indices = iter(decoded_indices)
+                for batch_resources in executor.map(
+                    _decode_shared_resources,
+                    (shared_block.name for batch in batches),
+                    batches,
+                ):
+                    for resource in batch_resources:
+                        resources[next(decoded_indices)] = resource
+                return resources
+        finally:
+            shared_block.close()
+            shared_block.unlink()
+
+    @classmethod
+    def from_packed(cls, packed: bytes, verify: bool = False, workers: int = None):
+        # With workers, resources are decoded in up to that many processes, but no more than there are CPUs to run
+        # them: every decoded resource is unpickled here, which costs about a third of decoding it, so workers only
+        # pay off when they run alongside this process. The profiler hooks only run in this process, so they don't
+        # see decoding done by the workers.
+        header = PAKHeader.from_packed(packed)
+
+        profiler = profiling.active
+        verification_digests = {} if verify else None
+        if workers is not None:
+            workers = min(workers, _usable_cpu_count())
+        if workers is not None and workers > 1 and header.resource_count > 1:
+            resources = cls._decoded_resources_in_parallel(packed, header, workers)
+        else:
+            resources = []
+            for resource_table in header.resource_tables:
+                asset_class = cls._get_asset_class(resource_table)
+                offset, size = resource_table.offset, resource_table.size
+                if profiler is None:
+                    resources.append(asset_class.from_packed(packed[offset:offset+size]))
+                else:
+                    resources.append(profiler.call(
+                        asset_class, "from_packed", size, asset_class.from_packed, packed[offset:offset+size]
+                    ))
+
+        # Unimplemented resources hold their original bytes, so only decoded ones need checking
+        if verify:
+            for resource_table, resource in zip(header.resource_tables, resources):
+                if type(resource) is not UnimplementedResource:
+                    offset, size = resource_table.offset, resource_table.size
+                    verification_digests[resource_table.asset_ID] = \
+                        (weakref.ref(resource), size, hashlib.sha1(packed[offset:offset+size]).digest())
 
         return cls(
-            major_version,
-            minor_version,
-            unused,
-            named_resource_count,
-            tuple(named_resource_tables),
-            resource_count,
-            tuple(resource_tables),
-            tuple(resources),
+            header.major_version,
+            header.minor_version,
+            header.unused,
+            header.named_resource_count,
+            header.named_resource_tables,
+            header.resource_count,
+            header.resource_tables,
+            PersistentVector(resources),
+            verification_digests,
         )
 
+    # aio pulls in asyncio, which is slow to import, so the async methods import it when they're first used
+    @classmethod
+    async def aopen(cls, path):
+        import aio
+        packed = await aio.read_file(path)
+        return await aio.run(cls.from_packed, packed)
+
+    @classmethod
+    async def aread_packed_resources(cls, path, asset_IDs) -> dict:
+        # Reads only the tables and the requested resources, without parsing them
+        import aio
+        header = await aio.run(cls.read_tables, path)
+        resource_tables = {resource_table.asset_ID: resource_table for resource_table in header.resource_tables}
+        asset_IDs = tuple(asset_IDs)
+        packed_resources = await aio.read_ranges(path, (
+            (resource_tables[asset_ID].offset, resource_tables[asset_ID].size) for asset_ID in asset_IDs
+        ))
+        return dict(zip(asset_IDs, packed_resources))
+
+    async def asave(self, path, dedupe: bool = False) -> None:
+        import aio
+        packed = await aio.run(self.packed, dedupe)
+        await aio.write_file(path, packed)
+
     @property
     def packed_content_before_resources_size(self) -> int:
         named_resource_tables_size = \
             sum(named_resource_table.packed_size for named_resource_table in self.named_resource_tables)
-        resource_tables_size = sum(resource_table.packed_size for resource_table in self.resource_tables)
 
-        return 2 + 2 + 4 + 4 + named_resource_tables_size + 4 + resource_tables_size
+        return 2 + 2 + 4 + 4 + named_resource_tables_size + 4 + 20*len(self.resource_tables)
 
     @property
     def packed_padding_before_resources_size(self) -> int:
@@ -173,73 +505,282 @@ class PAK:
 
     @property
     def packed_size(self) -> int:
-        resources_size = sum(resource.packed_size for resource in self.resources)
+        resources_size = sum(aligned_size(resource.packed_size) for resource in self.resources)
         return self.packed_content_before_resources_size + self.packed_padding_before_resources_size + resources_size
 
-    def packed(self) -> bytes:
-        return b"".join((
-            self._struct.pack(self.major_version, self.minor_version, self.unused, self.named_resource_count),
-            *(named_resource_table.packed() for named_resource_table in self.named_resource_tables),
-            pack_int(self.resource_count),
-            *(resource_table.packed() for resource_table in self.resource_tables),
-            b"\x00" * self.packed_padding_before_resources_size,
-            *(aligned_to_32_bytes(resource.packed()) for resource in self.resources),
-        ))
+    @property
+    def header(self) -> PAKHeader:
+        return PAKHeader(
+            self.major_version,
+            self.minor_version,
+            self.unused,
+            self.named_resource_count,
+            self.named_resource_tables,
+            self.resource_count,
+            self.resource_tables,
+        )
+
+    def _packed_resources(self):
+        profiler = profiling.active
+        if profiler is None:
+            pack = operator.methodcaller("packed")
+        else:
+            def pack(resource):
+                return profiler.call(type(resource), "packed", None, resource.packed)
+
+        # Lazily decoded resources give the stored bytes of the ones that were never replaced, without decoding them,
+        # and only pack the edited ones
+        packed_items = getattr(self.resources, "packed_items", None)
+        if packed_items is not None:
+            return packed_items(pack)
+        return list(map(pack, self.resources))
+
+    def _round_trip_mismatches(self, packed_resources=None) -> tuple:
+        # Only resources that are still the objects decoded at parse time are checked; edited ones are expected to
+        # differ. The original span may include the 0xFF alignment padding.
+        if self.verification_digests is None:
+            raise ValueError("PAK wasn't parsed with verify=True")
+
+        mismatches = []
+        for asset_ID, (resource_ref, size, digest) in self.verification_digests.items():
+            # The decoded resources are only referenced weakly, so the ones that were replaced can be freed
+            resource = resource_ref()
+            index = self._asset_ID_to_index_map.get(asset_ID)
+            if resource is None or index is None or self.resources[index] is not resource:
+                continue
+
+            packed_resource = resource.packed() if packed_resources is None else packed_resources[index]
+            padding_size = size - len(packed_resource)
+            if 0 <= padding_size < 32:
+                packed_hash = hashlib.sha1(packed_resource)
+                packed_hash.update(b"\xff" * padding_size)
+                if packed_hash.digest() == digest:
+                    continue
+            mismatches.append(RoundTripMismatch(asset_ID, type(resource).__name__))
+
+        return tuple(mismatches)
+
+    def verify_round_trip(self) -> tuple:
+        return self._round_trip_mismatches()
+
+    def _laid_out_resource_tables(self, payload_sizes, payload_indices) -> tuple:
+        # Payloads are stored in order straight after the tables, and each table gets the offset and aligned size of
+        # the payload it's stored in, payload_indices[i] for resource i
+        payload_offsets = []
+        offset = self.packed_content_before_resources_size + self.packed_padding_before_resources_size
+        for payload_size in payload_sizes:
+            payload_offsets.append(offset)
+            offset += payload_size
+
+        return tuple(
+            ResourceTable(
+                resource_table.compressed,
+                resource_table.asset_type,
+                resource_table.asset_ID,
+                payload_sizes[payload_index],
+                payload_offsets[payload_index],
+            )
+            for resource_table, payload_index in zip(self.resource_tables, payload_indices)
+        )
+
+    def _payload_layout(self, order=None, digests=None):
+        # Returns the resource index -> payload index map and the resources whose payloads are stored, in the order
+        # they're stored. Payloads are stored in the given order of resource indices, table order by default, and
+        # resources with the same digest share the first copy.
+        resource_count = len(self.resource_tables)
+        if order is None:
+            order = range(resource_count)
+        elif sorted(order) != list(range(resource_count)):
+            raise ValueError("The layout order has to list every resource index exactly once")
+
+        payload_indices = [None] * resource_count
+        stored_indices = []
+        digest_to_index_map = {}
+        for index in order:
+            if digests is not None:
+                payload_index = digest_to_index_map.setdefault(digests[index], len(stored_indices))
+                if payload_index < len(stored_indices):
+                    payload_indices[index] = payload_index
+                    continue
+            payload_indices[index] = len(stored_indices)
+            stored_indices.append(index)
+        return payload_indices, stored_indices
+
+    def laid_out(self, order=None):
+        # The PAK with every count, size and offset set to what packed() writes
+        named_resource_tables = tuple(
+            dataclasses.replace(named_resource_table, name_length=len(named_resource_table.name))
+            for named_resource_table in self.named_resource_tables
+        )
+        payload_indices, stored_indices = self._payload_layout(order)
+        resource_tables = self._laid_out_resource_tables(
+            [aligned_size(self.resources[index].packed_size) for index in stored_indices],
+            payload_indices,
+        )
+        return dataclasses.replace(
+            self,
+            named_resource_count=len(named_resource_tables),
+            named_resource_tables=named_resource_tables,
+            resource_count=len(resource_tables),
+            resource_tables=resource_tables,
+        )
+
+    def packed(self, dedupe: bool = False, verify: bool = False, order=None) -> bytes:
+        # order lists resource indices in the order their payloads are stored; the tables stay in their own order
+        packed_resources = self._packed_resources()
+        if verify:
+            mismatches = self._round_trip_mismatches(packed_resources)
+            if mismatches:
+                raise RoundTripError(mismatches)
+
+        payloads = [aligned_to_32_bytes(packed_resource) for packed_resource in packed_resources]
+        digests = [hashlib.sha1(payload).digest() for payload in payloads] if dedupe else None
+        payload_indices, stored_indices = self._payload_layout(order, digests)
+        payloads = [payloads[index] for index in stored_indices]
+        resource_tables = self._laid_out_resource_tables([len(payload) for payload in payloads], payload_indices)
+
+        return b"".join((dataclasses.replace(self.header, resource_tables=resource_tables).packed(), *payloads))
+
+    def get_resource_index_by_asset_ID(self, asset_ID: int) -> int:
+        return self._asset_ID_to_index_map[asset_ID]
 
     def get_resource_by_asset_ID(self, asset_ID: int):
         return self.resources[self._asset_ID_to_index_map[asset_ID]]
 
-    def with_resource_inserted(self, index: int, asset_ID: int, new_resource):
-        if index == self.resource_count:
-            new_resource_table_offset = self.resource_tables[-1].offset + self.resource_tables[-1].size
+    def get_named_resource_table_by_name(self, name: str) -> NamedResourceTable:
+        return self.named_resource_tables[self._name_to_index_map[name]]
+
+    def get_resource_by_name(self, name: str):
+        return self.get_resource_by_asset_ID(self.get_named_resource_table_by_name(name).asset_ID)
+
+    def get_names_for_asset(self, asset_type: str, asset_ID: int) -> tuple:
+        return self._asset_to_names_map.get((asset_type, asset_ID), ())
+
+    def with_resource_named(self, asset_ID: int, name: str):
+        resource_table = self.resource_tables[self._asset_ID_to_index_map[asset_ID]]
+        new_named_resource_table = NamedResourceTable(resource_table.asset_type, asset_ID, len(name), name)
+        new_asset = (resource_table.asset_type, asset_ID)
+        asset_to_names_map = dict(self._asset_to_names_map)
+
+        index = self._name_to_index_map.get(name)
+        if index is None:
+            named_resource_tables = self.named_resource_tables.append(new_named_resource_table)
+            name_to_index_map = dict(self._name_to_index_map)
+            name_to_index_map[name] = len(self.named_resource_tables)
         else:
-            new_resource_table_offset = self.resource_tables[index].offset
+            # The name moves to the new asset, keeping its place in the table
+            named_resource_tables = self.named_resource_tables.set(index, new_named_resource_table)
+            name_to_index_map = self._name_to_index_map
+            old_named_resource_table = self.named_resource_tables[index]
+            old_asset = (old_named_resource_table.asset_type, old_named_resource_table.asset_ID)
+            old_names = [old_name for old_name in asset_to_names_map.get(old_asset, ()) if old_name != name]
+            _set_asset_names(asset_to_names_map, old_asset, old_names, name_to_index_map)
+
+        new_names = [*asset_to_names_map.get(new_asset, ()), name]
+        _set_asset_names(asset_to_names_map, new_asset, new_names, name_to_index_map)
+        return self._replaced(
+            name_to_index_map,
+            asset_to_names_map,
+            self.__dict__.get("_asset_ID_to_index_map"),
+            named_resource_tables=named_resource_tables,
+        )
+
+    def with_name_removed(self, name: str):
+        index = self._name_to_index_map[name]
+        removed_named_resource_table = self.named_resource_tables[index]
+
+        # Only the names stored after the removed one move
+        name_to_index_map = dict(self._name_to_index_map)
+        del name_to_index_map[name]
+        for later_index, later_named_resource_table in enumerate(self.named_resource_tables[index+1:], index + 1):
+            if name_to_index_map.get(later_named_resource_table.name) == later_index:
+                name_to_index_map[later_named_resource_table.name] = later_index - 1
+
+        asset_to_names_map = dict(self._asset_to_names_map)
+        asset = (removed_named_resource_table.asset_type, removed_named_resource_table.asset_ID)
+        names = [asset_name for asset_name in asset_to_names_map.get(asset, ()) if asset_name != name]
+        _set_asset_names(asset_to_names_map, asset, names, name_to_index_map)
+
+        return self._replaced(
+            name_to_index_map,
+            asset_to_names_map,
+            self.__dict__.get("_asset_ID_to_index_map"),
+            named_resource_tables=self.named_resource_tables.delete(index),
+        )
+
+    def with_resource_inserted(self, index: int, asset_ID: int, new_resource, name: str = None):
+        # Sizes and offsets are laid out when the PAK is packed, so the new table's are only placeholders
         new_resource_table = ResourceTable(
             False, # TODO: Support compressing resources
             new_resource.asset_type,
             asset_ID,
-            new_resource.packed_size,
-            new_resource_table_offset,
+            aligned_size(new_resource.packed_size),
+            0,
         )
-
-        new_resource_tables = [*self.resource_tables[:index], new_resource_table]
-        for resource_table in self.resource_tables[index:]:
-            new_resource_tables.append(
-                dataclasses.replace(resource_table, offset=resource_table.offset+new_resource.packed_size)
-            )
-
-        return dataclasses.replace(
-            self,
-            resource_count=self.resource_count+1,
-            resource_tables=tuple(new_resource_tables),
-            resources=(*self.resources[:index], new_resource, *self.resources[index:])
+        new_pak = self._replaced(
+            resource_tables=self.resource_tables.insert(index, new_resource_table),
+            resources=self.resources.insert(index, new_resource),
         )
+        if name is not None:
+            new_pak = new_pak.with_resource_named(asset_ID, name)
+        return new_pak
 
-    def with_resource_appended(self, asset_ID: int, new_resource):
-        return self.with_resource_inserted(self.resource_count, asset_ID, new_resource)
+    def with_resource_appended(self, asset_ID: int, new_resource, name: str = None):
+        return self.with_resource_inserted(len(self.resource_tables), asset_ID, new_resource, name)
 
     def with_resource_removed(self, index: int):
-        removed_resource = self.resources[index]
-        new_resource_tables = list(self.resource_tables[:index])
-        for resource_table in self.resource_tables[index+1:]:
-            new_resource_tables.append(
-                dataclasses.replace(resource_table, offset=resource_table.offset-removed_resource.packed_size)
-            )
-
-        return dataclasses.replace(
-            self,
-            resource_count=self.resource_count-1,
-            resource_tables=tuple(new_resource_tables),
-            resources=self.resources[:index] + self.resources[index+1:],
+        # Names for the removed asset go with it
+        removed_resource_table = self.resource_tables[index]
+        removed_asset = (removed_resource_table.asset_type, removed_resource_table.asset_ID)
+        new_pak = self
+        for name in dict.fromkeys(self._asset_to_names_map.get(removed_asset, ())):
+            new_pak = new_pak.with_name_removed(name)
+
+        return new_pak._replaced(
+            resource_tables=self.resource_tables.delete(index),
+            resources=self.resources.delete(index),
         )
 
     def with_resource_removed_by_asset_ID(self, asset_ID: int):
-        return self.with_resource_removed(self, self._asset_ID_to_index_map[asset_ID])
+        return self.with_resource_removed(self._asset_ID_to_index_map[asset_ID])
 
     def with_resource_replaced(self, index: int, new_resource):
-        asset_ID = self.resource_tables[index].asset_ID
-        return self.with_resource_removed(index).with_resource_inserted(index, asset_ID, new_resource)
+        old_resource_table = self.resource_tables[index]
+        new_resource_table = dataclasses.replace(
+            old_resource_table,
+            asset_type=new_resource.asset_type,
+            size=aligned_size(new_resource.packed_size),
+        )
+        # The asset IDs stay where they were
+        new_pak = self._replaced(
+            asset_ID_to_index_map=self.__dict__.get("_asset_ID_to_index_map"),
+            resource_tables=self.resource_tables.set(index, new_resource_table),
+            resources=self.resources.set(index, new_resource),
+        )
+
+        # Replacing a resource keeps its names
+        old_asset = (old_resource_table.asset_type, old_resource_table.asset_ID)
+        names = self._asset_to_names_map.get(old_asset, ()) if new_resource.asset_type != old_asset[0] else ()
+        if names:
+            named_resource_tables = self.named_resource_tables
+            for name in names:
+                name_index = self._name_to_index_map[name]
+                named_resource_tables = named_resource_tables.set(name_index, dataclasses.replace(
+                    named_resource_tables[name_index],
+                    asset_type=new_resource.asset_type,
+                ))
+
+            asset_to_names_map = dict(self._asset_to_names_map)
+            new_asset = (new_resource.asset_type, old_resource_table.asset_ID)
+            new_names = [*asset_to_names_map.pop(old_asset), *asset_to_names_map.get(new_asset, ())]
+            _set_asset_names(asset_to_names_map, new_asset, new_names, self._name_to_index_map)
+            new_pak = new_pak._replaced(
+                self._name_to_index_map,
+                asset_to_names_map,
+                new_pak.__dict__.get("_asset_ID_to_index_map"),
+                named_resource_tables=named_resource_tables,
+            )
+        return new_pak
 
     def with_resource_replaced_by_asset_ID(self, asset_ID: int, new_resource):
-        index = self._asset_ID_to_index_map[asset_ID]
-        return self.with_resource_removed(index).with_resource_inserted(index, asset_ID, new_resource)
\ No newline at end of file
+        return self.with_resource_replaced(self._asset_ID_to_index_map[asset_ID], new_resource)
\ No newline at end of file
@@ -0,0 +1,256 @@
+# Applies a JSON patch spec to a directory of PAKs. A cache in the output directory remembers the input and spec
+# hashes of every PAK it wrote, so later runs only rebuild the PAKs whose input or spec changed.
+#
+# Usage: python patcher.py spec.json input_directory output_directory [--workers N] [--force]
+#
+# Spec format, with resources referenced by name or by asset ID ("0x..."):
+#     {
+#         "paks": {
+#             "Metroid1.pak": {
+#                 "strings": [{"resource": "WorldStrings", "name": "EntryName", "language": "ENGL", "text": "..."},
+#                             {"resource": "0x12345678", "index": 3, "text": "..."}],
+#                 "scans": [{"resource": "0x12345678", "set": {"logbook_scale": 2.0}}],
+#                 "scan_tree": [{"instance_ID": "0x00100001", "set": {"editor_properties.name": "..."}}],
+#                 "hints": [{"resource": "Hints", "hint": "HintName", "set": {"normal_time": 30.0}}]
+#             }
+#         }
+#     }
+#
+# Strings without a language are replaced in every language. PAKs in the input directory without a spec are copied.
+
+import argparse
+import dataclasses
+import enum
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+from pipeline import run_pipeline
+from util import Vector
+
+__all__ = ("apply_patch_spec", "PatchCacheEntry", "PatchCache", "main")
+
+_SCAN_TREE_ASSET_ID = 0x95B61279
+_CACHE_FILE_NAME = ".patch_cache.json"
+_CACHE_VERSION = 1
+
+
+def _get_resource_index(pak, reference) -> int:
+    if isinstance(reference, str) and not reference.lower().startswith("0x"):
+        asset_ID = pak.get_named_resource_table_by_name(reference).asset_ID
+    else:
+        asset_ID = _parsed_int(reference)
+    return pak.get_resource_index_by_asset_ID(asset_ID)
+
+
+def _parsed_int(value) -> int:
+    return int(value, 0) if isinstance(value, str) else value
+
+
+def _converted_value(current_value, value):
+    # JSON only has numbers, strings and lists, so values take the type of the field they replace
+    if isinstance(current_value, enum.Enum):
+        return type(current_value)[value] if isinstance(value, str) else type(current_value)(value)
+    if isinstance(current_value, Vector):
+        return Vector(*value)
+    if isinstance(current_value, int) and not isinstance(current_value, bool):
+        return _parsed_int(value)
+    return value
+
+
+def _with_fields_set(typed_object, changes: dict):
+    for name, value in changes.items():
+        current_value = typed_object
+        for field_name in name.split("."):
+            current_value = getattr(current_value, field_name)
+        typed_object = typed_object.with_field(name, _converted_value(current_value, value))
+    return typed_object
+
+
+def _with_string_edit(strg, edit: dict):
+    if "name" in edit:
+        string_index = strg.name_table.get_string_index_for_name(edit["name"])
+    else:
+        string_index = edit["index"]
+
+    if "language" in edit:
+        language_IDs = (edit["language"],)
+    else:
+        language_IDs = tuple(language_table.language_ID for language_table in strg.language_tables)
+
+    for language_ID in language_IDs:
+        string_table = strg.get_string_table_by_language_ID(language_ID)
+        string_table = string_table.with_string_replaced(string_index, edit["text"])
+        strg = strg.with_string_table_replaced_by_language_ID(language_ID, string_table)
+    return strg
+
+
+def _with_scan_edit(scan, edit: dict):
+    return scan.with_scannable_object_info_replaced(_with_fields_set(scan.scannable_object_info, edit["set"]))
+
+
+def _with_hint_edit(hint_resource, edit: dict):
+    hint = hint_resource.get_hint_by_name(edit["hint"])
+    changes = {name: _converted_value(getattr(hint, name), value) for name, value in edit["set"].items()}
+    return hint_resource.with_hints_updated({edit["hint"]: dataclasses.replace(hint, **changes)})
+
+
+def _with_scan_tree_edit(scan_tree, edit: dict):
+    instance_ID = _parsed_int(edit["instance_ID"])
+    for index, object_ in enumerate(scan_tree.objects):
+        if object_.instance_ID == instance_ID:
+            return scan_tree.with_object_replaced(index, _with_fields_set(object_, edit["set"]))
+    raise KeyError(f"ScanTree has no object with instance ID 0x{instance_ID:08X}")
+
+
+def apply_patch_spec(pak, spec: dict):
+    # Edits to the same resource are applied to it in turn, and each edited resource is put back into the PAK once
+    edited_resources = {}
+
+    def edit_resource(index, edit_function, edit):
+        edited_resources[index] = edit_function(edited_resources.get(index, pak.resources[index]), edit)
+
+    for edit in spec.get("strings", ()):
+        edit_resource(_get_resource_index(pak, edit["resource"]), _with_string_edit, edit)
+    for edit in spec.get("scans", ()):
+        edit_resource(_get_resource_index(pak, edit["resource"]), _with_scan_edit, edit)
+    for edit in spec.get("scan_tree", ()):
+        edit_resource(pak.get_resource_index_by_asset_ID(_SCAN_TREE_ASSET_ID), _with_scan_tree_edit, edit)
+    for edit in spec.get("hints", ()):
+        edit_resource(_get_resource_index(pak, edit["resource"]), _with_hint_edit, edit)
+
+    for index, resource in sorted(edited_resources.items()):
+        pak = pak.with_resource_replaced(index, resource)
+    return pak
+
+
+@dataclasses.dataclass(frozen=True)
+class PatchCacheEntry:
+    input_size: int
+    input_mtime_ns: int
+    input_hash: str
+    spec_hash: str
+    output_size: int
+    output_mtime_ns: int
+
+
+class PatchCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path) as cache_file:
+                cache_data = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if cache_data.get("version") == _CACHE_VERSION:
+            self.entries = {name: PatchCacheEntry(**entry) for name, entry in cache_data["entries"].items()}
+
+    def input_hash(self, name: str, input_path: str) -> str:
+        # Hashing a large PAK takes a while, so a file with the same size and modification time isn't rehashed
+        input_stat = os.stat(input_path)
+        entry = self.entries.get(name)
+        if entry is not None and entry.input_size == input_stat.st_size \
+                and entry.input_mtime_ns == input_stat.st_mtime_ns:
+            return entry.input_hash
+        return _file_hash(input_path)
+
+    def is_up_to_date(self, name: str, input_hash: str, spec_hash: str, output_path: str) -> bool:
+        entry = self.entries.get(name)
+        if entry is None or (entry.input_hash, entry.spec_hash) != (input_hash, spec_hash):
+            return False
+        try:
+            output_stat = os.stat(output_path)
+        except OSError:
+            return False
+        return (entry.output_size, entry.output_mtime_ns) == (output_stat.st_size, output_stat.st_mtime_ns)
+
+    def update(self, name: str, input_path: str, input_hash: str, spec_hash: str, output_path: str) -> None:
+        input_stat, output_stat = os.stat(input_path), os.stat(output_path)
+        self.entries[name] = PatchCacheEntry(
+            input_stat.st_size,
+            input_stat.st_mtime_ns,
+            input_hash,
+            spec_hash,
+            output_stat.st_size,
+            output_stat.st_mtime_ns,
+        )
+
+    def save(self) -> None:
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as cache_file:
+            json.dump({
+                "version": _CACHE_VERSION,
+                "entries": {name: dataclasses.asdict(entry) for name, entry in self.entries.items()},
+            }, cache_file, indent=4)
+        os.replace(temporary_path, self.path)
+
+
+def _file_hash(path: str) -> str:
+    file_hash = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(2**20), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _spec_hash(pak_spec) -> str:
+    return hashlib.sha1(json.dumps(pak_spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply a patch spec to a directory of PAKs")
+    parser.add_argument("spec", help="JSON patch spec")
+    parser.add_argument("input_directory", help="directory with the original PAKs")
+    parser.add_argument("output_directory", help="directory for the patched PAKs and the patch cache")
+    parser.add_argument("--workers", type=int, help="processes used to patch PAKs in parallel")
+    parser.add_argument("--force", action="store_true", help="rebuild every PAK, ignoring the patch cache")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as spec_file:
+        pak_specs = json.load(spec_file).get("paks", {})
+
+    names = sorted(name for name in os.listdir(args.input_directory) if name.lower().endswith(".pak"))
+    missing_names = sorted(set(pak_specs) - set(names))
+    if missing_names:
+        parser.error(f"spec names PAKs that aren't in {args.input_directory}: {', '.join(missing_names)}")
+
+    os.makedirs(args.output_directory, exist_ok=True)
+    cache = PatchCache(os.path.join(args.output_directory, _CACHE_FILE_NAME))
+
+    hashes = {}
+    paths_to_patch, specs = [], {}
+    for name in names:
+        input_path = os.path.join(args.input_directory, name)
+        output_path = os.path.join(args.output_directory, name)
+        pak_spec = pak_specs.get(name)
+        hashes[name] = (cache.input_hash(name, input_path), _spec_hash(pak_spec))
+
+        if not args.force and cache.is_up_to_date(name, *hashes[name], output_path):
+            print(f"{name}: up to date")
+        elif pak_spec:
+            paths_to_patch.append(input_path)
+            specs[input_path] = pak_spec
+        else:
+            start_time = time.perf_counter()
+            shutil.copyfile(input_path, output_path)
+            cache.update(name, input_path, *hashes[name], output_path)
+            print(f"{name}: copied in {time.perf_counter() - start_time:.2f} s")
+
+    try:
+        with run_pipeline(paths_to_patch, apply_patch_spec, args.output_directory, specs, args.workers) as timings:
+            for timing in timings:
+                name = os.path.basename(timing.input_path)
+                cache.update(name, timing.input_path, *hashes[name], timing.output_path)
+                print(f"{name}: patched in {timing.total_time:.2f} s")
+    finally:
+        cache.save()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
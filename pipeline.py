@@ -0,0 +1,113 @@
+import concurrent.futures
+import dataclasses
+import os
+import time
+
+from pak import PAK
+
+__all__ = ("PAKTiming", "patch_PAK_file", "PipelineRun", "run_pipeline")
+
+
+@dataclasses.dataclass(frozen=True)
+class PAKTiming:
+    input_path: str
+    output_path: str
+    read_time: float
+    parse_time: float
+    patch_time: float
+    pack_time: float
+    write_time: float
+
+    @property
+    def total_time(self) -> float:
+        return self.read_time + self.parse_time + self.patch_time + self.pack_time + self.write_time
+
+
+def patch_PAK_file(input_path: str, output_path: str, patch_function, spec=None) -> PAKTiming:
+    start_time = time.perf_counter()
+    with open(input_path, "rb") as input_file:
+        packed = input_file.read()
+
+    read_end_time = time.perf_counter()
+    pak = PAK.from_packed(packed)
+    del packed
+
+    parse_end_time = time.perf_counter()
+    pak = patch_function(pak) if spec is None else patch_function(pak, spec)
+
+    patch_end_time = time.perf_counter()
+    packed = pak.packed()
+    del pak
+
+    pack_end_time = time.perf_counter()
+    temporary_output_path = f"{output_path}.tmp"
+    with open(temporary_output_path, "wb") as output_file:
+        output_file.write(packed)
+    os.replace(temporary_output_path, output_path)
+
+    write_end_time = time.perf_counter()
+    return PAKTiming(
+        input_path,
+        output_path,
+        read_end_time - start_time,
+        parse_end_time - read_end_time,
+        patch_end_time - parse_end_time,
+        pack_end_time - patch_end_time,
+        write_end_time - pack_end_time,
+    )
+
+
+class PipelineRun:
+    # The PAKs of a run that's been started. Iterating gives their timings as they finish. Closing the run, which
+    # leaving a with block or iterating to the end also does, cancels the PAKs that haven't started and waits for
+    # the workers to exit, so callers that stop early or never iterate don't leave the pool running.
+    def __init__(self, executor: concurrent.futures.ProcessPoolExecutor, futures: list):
+        self._executor = executor
+        self._futures = futures
+
+    def __iter__(self):
+        try:
+            for future in concurrent.futures.as_completed(self._futures):
+                yield future.result()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def run_pipeline(input_paths, patch_function, output_directory: str, specs: dict = None, workers: int = None):
+    # Each worker reads, patches and writes its own PAK, so only paths, specs and timings are pickled. The patch
+    # function must be defined at module level so it can be sent to the workers. Every PAK is submitted before this
+    # returns a PipelineRun, which should be closed or used in a with block. Outputs are named after their inputs'
+    # file names, so two inputs with the same name are rejected up front rather than written over each other.
+    jobs = {}
+    for input_path in input_paths:
+        output_path = os.path.join(output_directory, os.path.basename(input_path))
+        other_input_path, _ = jobs.setdefault(os.path.normcase(output_path), (input_path, output_path))
+        if other_input_path != input_path:
+            raise ValueError(f"{other_input_path} and {input_path} would both be written to {output_path}")
+
+    os.makedirs(output_directory, exist_ok=True)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(
+                patch_PAK_file,
+                input_path,
+                output_path,
+                patch_function,
+                None if specs is None else specs[input_path],
+            )
+            for input_path, output_path in jobs.values()
+        ]
+    except BaseException:
+        executor.shutdown(cancel_futures=True)
+        raise
+    return PipelineRun(executor, futures)
@@ -0,0 +1,107 @@
+# Opt-in instrumentation for the decode and pack hot paths. The hooks in pak.py and tree.py only check whether a
+# profiler is active, so nothing is recorded or timed unless one is.
+#
+# Usage:
+#     with Profiler() as profiler, profiler.scope("Metroid1.pak"):
+#         pak = PAK.from_packed(packed)
+#     print(profiler.report())
+
+import collections
+import contextlib
+import dataclasses
+import json
+import os
+import threading
+import time
+
+__all__ = ("ProfileEntry", "Profiler", "active")
+
+active = None
+
+
+@dataclasses.dataclass
+class ProfileEntry:
+    calls: int = 0
+    total_time: float = 0.0
+    bytes_processed: int = 0
+
+
+class Profiler:
+    def __init__(self, trace: bool = True):
+        self.entries = collections.defaultdict(ProfileEntry)
+        self.trace_events = [] if trace else None
+        self._scopes = []
+        self._start_time = time.perf_counter()
+        self._previous = None
+
+    def __enter__(self):
+        global active
+        self._previous, active = active, self
+        return self
+
+    def __exit__(self, *exc_info):
+        global active
+        active = self._previous
+        return False
+
+    @contextlib.contextmanager
+    def scope(self, name: str):
+        self._scopes.append(name)
+        try:
+            yield self
+        finally:
+            self._scopes.pop()
+
+    def call(self, asset_class, operation: str, size: int, function, *args):
+        start_time = time.perf_counter()
+        result = function(*args)
+        end_time = time.perf_counter()
+        if size is None:
+            size = len(result)
+
+        scope = self._scopes[-1] if self._scopes else ""
+        entry = self.entries[scope, asset_class.__name__, operation]
+        entry.calls += 1
+        entry.total_time += end_time - start_time
+        entry.bytes_processed += size
+
+        if self.trace_events is not None:
+            self.trace_events.append({
+                "name": f"{asset_class.__name__}.{operation}",
+                "cat": scope or asset_class.__name__,
+                "ph": "X",
+                "ts": (start_time - self._start_time) * 1e6,
+                "dur": (end_time - start_time) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"bytes": size},
+            })
+
+        return result
+
+    def report(self) -> str:
+        lines = [
+            f"{'Scope':<24} {'Class':<24} {'Operation':<12} {'Calls':>8} {'Time (ms)':>12} {'Bytes':>12} {'MiB/s':>10}"
+        ]
+        for (scope, class_name, operation), entry in sorted(self.entries.items(), key=lambda item: -item[1].total_time):
+            throughput = entry.bytes_processed / entry.total_time / 2**20 if entry.total_time else 0.0
+            lines.append(
+                f"{scope:<24} {class_name:<24} {operation:<12} {entry.calls:>8} {entry.total_time * 1000:>12.3f} "
+                f"{entry.bytes_processed:>12} {throughput:>10.1f}"
+            )
+        return "\n".join(lines)
+
+    def as_dict(self) -> dict:
+        return {
+            "entries": [
+                {"scope": scope, "class": class_name, "operation": operation, **dataclasses.asdict(entry)}
+                for (scope, class_name, operation), entry in self.entries.items()
+            ],
+        }
+
+    def chrome_trace(self) -> dict:
+        return {"traceEvents": self.trace_events or [], "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
@@ -0,0 +1,183 @@
+# An immutable sequence with O(log n) set, insert and delete that shares structure with the vector it was derived
+# from. Items live in tuples of up to 2 * _CHUNK_SIZE at the leaves of an AVL tree.
+
+import collections.abc
+import itertools
+
+__all__ = ("PersistentVector", "persistent")
+
+_CHUNK_SIZE = 32
+
+
+class _Node:
+    __slots__ = ("left", "right", "size", "height")
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.size = _size(left) + _size(right)
+        self.height = 1 + max(_height(left), _height(right))
+
+    def __reduce__(self):
+        return _Node, (self.left, self.right)
+
+
+def _size(node) -> int:
+    return len(node) if type(node) is tuple else node.size
+
+
+def _height(node) -> int:
+    return 0 if type(node) is tuple else node.height
+
+
+def _balanced(left, right):
+    # Heights never differ by more than 2 after a single insert or delete below this node
+    if type(left) is tuple and type(right) is tuple and len(left) + len(right) <= _CHUNK_SIZE:
+        return left + right
+
+    left_height, right_height = _height(left), _height(right)
+    if left_height > right_height + 1:
+        if _height(left.left) >= _height(left.right):
+            return _Node(left.left, _Node(left.right, right))
+        return _Node(_Node(left.left, left.right.left), _Node(left.right.right, right))
+    if right_height > left_height + 1:
+        if _height(right.right) >= _height(right.left):
+            return _Node(_Node(left, right.left), right.right)
+        return _Node(_Node(left, right.left.left), _Node(right.left.right, right.right))
+    return _Node(left, right)
+
+
+def _built(chunks, start: int, end: int):
+    if end - start == 1:
+        return chunks[start]
+    middle = (start + end) // 2
+    return _Node(_built(chunks, start, middle), _built(chunks, middle, end))
+
+
+def _get(node, index: int):
+    while type(node) is not tuple:
+        left_size = _size(node.left)
+        if index < left_size:
+            node = node.left
+        else:
+            node, index = node.right, index - left_size
+    return node[index]
+
+
+def _set(node, index: int, item):
+    if type(node) is tuple:
+        return (*node[:index], item, *node[index+1:])
+    left_size = _size(node.left)
+    if index < left_size:
+        return _Node(_set(node.left, index, item), node.right)
+    return _Node(node.left, _set(node.right, index - left_size, item))
+
+
+def _insert(node, index: int, item):
+    if type(node) is tuple:
+        node = (*node[:index], item, *node[index:])
+        if len(node) > 2 * _CHUNK_SIZE:
+            return _Node(node[:_CHUNK_SIZE], node[_CHUNK_SIZE:])
+        return node
+    left_size = _size(node.left)
+    if index <= left_size:
+        return _balanced(_insert(node.left, index, item), node.right)
+    return _balanced(node.left, _insert(node.right, index - left_size, item))
+
+
+def _delete(node, index: int):
+    if type(node) is tuple:
+        return node[:index] + node[index+1:]
+    left_size = _size(node.left)
+    if index < left_size:
+        left = _delete(node.left, index)
+        return node.right if left == () else _balanced(left, node.right)
+    right = _delete(node.right, index - left_size)
+    return node.left if right == () else _balanced(node.left, right)
+
+
+class PersistentVector(collections.abc.Sequence):
+    __slots__ = ("_root",)
+
+    def __init__(self, items=()):
+        if isinstance(items, PersistentVector):
+            root = items._root
+        else:
+            items = tuple(items)
+            chunks = [items[i:i+_CHUNK_SIZE] for i in range(0, len(items), _CHUNK_SIZE)]
+            root = _built(chunks, 0, len(chunks)) if chunks else ()
+        object.__setattr__(self, "_root", root)
+
+    @classmethod
+    def _from_root(cls, root):
+        vector = cls.__new__(cls)
+        object.__setattr__(vector, "_root", root)
+        return vector
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PersistentVector is immutable")
+
+    def __reduce__(self):
+        return PersistentVector, (tuple(self),)
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def _checked_index(self, index: int, allow_end: bool = False) -> int:
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length + allow_end:
+            raise IndexError("PersistentVector index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(itertools.islice(self, *index.indices(len(self)))) if index.step in (None, 1) \
+                else tuple(self)[index]
+        return _get(self._root, self._checked_index(index))
+
+    def __iter__(self):
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if type(node) is tuple:
+                yield from node
+            else:
+                stack.append(node.right)
+                stack.append(node.left)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (PersistentVector, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __add__(self, other):
+        return PersistentVector(itertools.chain(self, other))
+
+    def __radd__(self, other):
+        return PersistentVector(itertools.chain(other, self))
+
+    def __repr__(self) -> str:
+        return f"PersistentVector({tuple(self)!r})"
+
+    def set(self, index: int, item):
+        return self._from_root(_set(self._root, self._checked_index(index), item))
+
+    def insert(self, index: int, item):
+        return self._from_root(_insert(self._root, self._checked_index(index, allow_end=True), item))
+
+    def append(self, item):
+        return self.insert(len(self), item)
+
+    def delete(self, index: int):
+        return self._from_root(_delete(self._root, self._checked_index(index)))
+
+
+def persistent(items):
+    # For fields that are edited with set, insert and delete. Sequences with their own versions of those, like
+    # PersistentVector, are kept as they are.
+    return items if hasattr(items, "set") else PersistentVector(items)
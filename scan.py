@@ -5,8 +5,7 @@ import struct
 
 from dgrp import DGRP
 from scly_common import Property, PropertyStruct, ScriptObject
-from util import unpack_bool, unpack_bool_from_int, unpack_int, unpack_float, unpack_ascii, \
-    unpack_null_terminated_ascii, pack_ascii
+from util import unpack_ascii, pack_ascii
 
 __all__ = ("AnimationParameters", "ScannableObjectInfo", "ScanInfoSecondaryModel", "SCAN")
 
@@ -41,34 +40,6 @@ class ScannableObjectInfo(ScriptObject):
     logbook_animation_set: AnimationParameters = dataclasses.field(init=False, repr=False)
     secondary_models: tuple = dataclasses.field(init=False, repr=False)
 
-    def __post_init__(self):
-        self._set_fields_from_property_data(
-            ("scan_text_asset_ID",                  0x2F5B6423, unpack_int),
-            ("slow",                                0xC308A322, unpack_bool_from_int),
-            ("important",                           0xC308A322, unpack_bool_from_int),
-            ("use_logbook_model_after_scan",        0x1733B1EC, unpack_bool),
-            ("post_scan_override_texture_asset_ID", 0x53336141, unpack_int),
-            ("logbook_default_x_rotation",          0x3DE0BA64, unpack_float),
-            ("logbook_default_z_rotation",          0x2ADD6628, unpack_float),
-            ("logbook_scale",                       0xD0C15066, unpack_float),
-            ("logbook_model_asset_ID",              0xB7ADC418, unpack_int),
-        )
-
-        object.__setattr__(self, "logbook_animation_set", self.base_property_struct.get_subproperty_by_ID(0x15694EE1))
-
-        secondary_models = []
-        for ID in self._secondary_model_property_IDs:
-            secondary_models.append(self.base_property_struct.get_subproperty_by_ID(ID))
-        object.__setattr__(self, "secondary_models", tuple(secondary_models))
-
-    @classmethod
-    def from_packed(cls, packed: bytes):
-        return super().from_packed(packed, {
-            0x15694EE1: AnimationParameters,
-            0x58F9FE99: AnimationParameters,
-            **{ID: ScanInfoSecondaryModel for ID in cls._secondary_model_property_IDs},
-        })
-
 
 @dataclasses.dataclass(frozen=True)
 class ScanInfoSecondaryModel(PropertyStruct):
@@ -76,22 +47,6 @@ class ScanInfoSecondaryModel(PropertyStruct):
     animation_set: AnimationParameters = dataclasses.field(init=False)
     attach_bone_name: str = dataclasses.field(init=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-
-        self._set_fields_from_subproperty_data(
-            ("model_asset_ID",   0x1F7921BC, unpack_int),
-            ("attach_bone_name", 0x3EA2BED8, unpack_null_terminated_ascii),
-        )
-
-        object.__setattr__(self, "animation_set", self.get_subproperty_by_ID(0xCDD202D1))
-
-    @classmethod
-    def from_packed(cls, packed: bytes):
-        return super().from_packed(packed, {
-            0xCDD202D1: AnimationParameters,
-        })
-
 
 @dataclasses.dataclass(frozen=True)
 class SCAN:
@@ -109,7 +64,8 @@ class SCAN:
     @classmethod
     def from_packed(cls, packed: bytes):
         magic, unknown_1, unknown_2, object_count = cls._struct.unpack(packed[:13])
-        scannable_object_info = ScannableObjectInfo.from_packed(packed[13:])
+        scannable_object_info_size = 6 + int.from_bytes(packed[17:19], "big")
+        scannable_object_info = ScannableObjectInfo.from_packed(packed[13:13+scannable_object_info_size])
 
         return cls(
             unpack_ascii(magic),
@@ -117,7 +73,7 @@ class SCAN:
             unknown_2,
             object_count,
             scannable_object_info,
-            DGRP.from_packed(packed[13+scannable_object_info.packed_size:]),
+            DGRP.from_packed(packed[13+scannable_object_info_size:]),
         )
 
     @property
@@ -2,7 +2,10 @@
 
 import dataclasses
 import struct
+import sys
 
+from scly_schema import PROPERTY_STRUCT_IDS, OPAQUE_PROPERTY_IDS, SCHEMAS, looks_like_property_struct, \
+    compile_field_decoder, compile_field_encoders
 from util import unpack_ascii, pack_ascii
 
 __all__ = ("Connection", "Property", "PropertyStruct", "ScriptObject")
@@ -42,80 +45,139 @@ class Property:
     _struct = struct.Struct(">IH")
 
     ID: int
-    size: int
+    size: int = dataclasses.field(compare=False)
     data: bytes
 
     @classmethod
     def from_packed(cls, packed: bytes):
         ID, size = cls._struct.unpack(packed[:6])
-        return cls(ID, size, packed[6:6+size])
+        data = packed[6:6+size]
+        return cls(ID, len(data), data)
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return 6 + len(self.data)
 
     def packed(self) -> bytes:
-        return b"".join((self._struct.pack(self.ID, self.size), self.data))
+        return b"".join((self._struct.pack(self.ID, len(self.data)), self.data))
+
+
+_schema_classes = {}
+
+
+def _init_schema_class(cls) -> None:
+    # Typed subclasses get their field decoder and encoders compiled from their schema once, when they're created
+    _schema_classes[cls.__name__] = cls
+    schema = SCHEMAS.get(cls.__name__)
+    if schema is not None:
+        cls._schema = schema
+        cls._decode_fields = compile_field_decoder(
+            schema,
+            issubclass(cls, ScriptObject),
+            vars(sys.modules[cls.__module__]),
+        )
+        cls._field_encoders = compile_field_encoders(schema)
+
+
+def _field_property(typed_object, property_struct, name: str, value):
+    # The new property for a field: a leaf is re-encoded from its current data, a typed subproperty is replaced as a
+    # whole, and a dotted name sets a field on that subproperty
+    field_name, _, subfield_name = name.partition(".")
+    if subfield_name:
+        return getattr(typed_object, field_name).with_field(subfield_name, value)
+
+    encoder = typed_object._field_encoders.get(name)
+    if encoder is not None:
+        property_ID, encode = encoder
+        data = encode(value, property_struct.get_subproperty_by_ID(property_ID).data)
+        return Property(property_ID, len(data), data)
+
+    if typed_object._schema is None or typed_object._schema.get_field_by_name(name).type != "property":
+        raise ValueError(f"{type(typed_object).__name__}.{name} can't be set with with_field")
+    return value
+
+
+def _subproperty_struct_classes(cls) -> dict:
+    subproperty_struct_classes = cls.__dict__.get("_resolved_subproperty_struct_classes")
+    if subproperty_struct_classes is None:
+        # Resolved on first use, since a schema can name classes defined after the one using it
+        subproperty_struct_classes = {}
+        if cls._schema is not None:
+            for ID, class_name in cls._schema.struct_class_names.items():
+                subproperty_struct_classes[ID] = _schema_classes[class_name]
+        cls._resolved_subproperty_struct_classes = subproperty_struct_classes
+    return subproperty_struct_classes
 
 
 @dataclasses.dataclass(frozen=True)
 class PropertyStruct:
     _struct = struct.Struct(">IHH")
-    _property_struct_IDs = frozenset({
-        # TODO: Actually use a complete list
-        0xFFFFFFFF, # Base struct
-
-        0x1C5B4A3A, # SCAN: ScanInfoSecondaryModel 1
-        0x8728A0EE, # SCAN: ScanInfoSecondaryModel 2
-        0xF1CD99D3, # SCAN: ScanInfoSecondaryModel 3
-        0x6ABE7307, # SCAN: ScanInfoSecondaryModel 4
-        0x1C07EBA9, # SCAN: ScanInfoSecondaryModel 5
-        0x8774017D, # SCAN: ScanInfoSecondaryModel 6
-        0xF1913840, # SCAN: ScanInfoSecondaryModel 7
-        0x6AE2D294, # SCAN: ScanInfoSecondaryModel 8
-        0x1CE2091C, # SCAN: ScanInfoSecondaryModel 9
-
-        0x255A4580, # TREE: EditorProperties
-        0x2DA1EC33, # TREE: ScannableParameters
-    })
-
+    _property_struct_IDs = PROPERTY_STRUCT_IDS
+    # Properties whose IDs aren't in PROPERTY_STRUCT_IDS are kept opaque, and that list isn't complete. With this set,
+    # unlisted properties whose data is laid out like a list of properties are parsed as structs too, which is a guess
+    # from their bytes.
+    detect_unlisted_structs = False
+    _schema = None
+    _decode_fields = None
+    _field_encoders = {}
+
+    # size and subproperty_count are worked out from the subproperties whenever a struct is made, so they stay
+    # right through edits whatever they were parsed as
     ID: int
-    size: int
-    subproperty_count: int
+    size: int = dataclasses.field(compare=False)
+    subproperty_count: int = dataclasses.field(compare=False)
     subproperties: tuple = dataclasses.field(repr=False)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _init_schema_class(cls)
+
     def __post_init__(self):
         _subproperty_ID_to_index_map = {}
+        size = 2
         for i, subproperty in enumerate(self.subproperties):
             _subproperty_ID_to_index_map[subproperty.ID] = i
+            size += subproperty.packed_size
         object.__setattr__(self, "_subproperty_ID_to_index_map", _subproperty_ID_to_index_map)
+        object.__setattr__(self, "size", size)
+        object.__setattr__(self, "subproperty_count", len(self.subproperties))
+
+        if self._decode_fields is not None:
+            self._decode_fields()
 
     def _set_fields_from_subproperty_data(self, *field_tuples) -> None:
         for field_name, subproperty_ID, conversion in field_tuples:
             object.__setattr__(self, field_name, conversion(self.get_subproperty_by_ID(subproperty_ID).data))
 
     @classmethod
-    def from_packed(cls, packed: bytes, subproperty_struct_classes: dict = {}):
+    def from_packed(cls, packed: bytes, subproperty_struct_classes: dict = None):
+        if subproperty_struct_classes is None:
+            subproperty_struct_classes = _subproperty_struct_classes(cls)
         ID, size, subproperty_count = cls._struct.unpack(packed[:8])
 
         offset = 8
         subproperties = []
         for i in range(subproperty_count):
-            subproperty_ID, subproperty_size = struct.unpack(">IH", packed[offset:offset+6])
-            if subproperty_ID in cls._property_struct_IDs:
+            subproperty_ID, subproperty_size = Property._struct.unpack(packed[offset:offset+6])
+            end = offset + 6 + subproperty_size
+            if end > len(packed):
+                raise ValueError(f"Property 0x{subproperty_ID:08X} runs past the end of the struct it's in")
+            if subproperty_ID in cls._property_struct_IDs or (
+                cls.detect_unlisted_structs
+                and subproperty_ID not in OPAQUE_PROPERTY_IDS
+                and looks_like_property_struct(packed, offset+6, subproperty_size)
+            ):
                 subproperty_class = subproperty_struct_classes.get(subproperty_ID, PropertyStruct)
+                subproperties.append(subproperty_class.from_packed(packed[offset:end]))
             else:
-                subproperty_class = Property
-
-            subproperty = subproperty_class.from_packed(packed[offset:offset+6+subproperty_size])
-            subproperties.append(subproperty)
-            offset += subproperty.packed_size
+                subproperties.append(Property(subproperty_ID, subproperty_size, packed[offset+6:end]))
+            offset = end
 
         return cls(ID, size, subproperty_count, tuple(subproperties))
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return 6 + self.size
 
     def packed(self) -> bytes:
         return b"".join((
@@ -126,20 +188,47 @@ class PropertyStruct:
     def get_subproperty_by_ID(self, subproperty_ID):
         return self.subproperties[self._subproperty_ID_to_index_map[subproperty_ID]]
 
+    def with_subproperty_replaced(self, new_subproperty):
+        index = self._subproperty_ID_to_index_map[new_subproperty.ID]
+        return dataclasses.replace(
+            self,
+            subproperties=(*self.subproperties[:index], new_subproperty, *self.subproperties[index+1:]),
+        )
+
+    def with_field(self, name: str, value):
+        return self.with_subproperty_replaced(_field_property(self, self, name, value))
+
 
 @dataclasses.dataclass(frozen=True)
 class ScriptObject:
     _struct = struct.Struct(">4sHIH")
+    _schema = None
+    _decode_fields = None
+    _field_encoders = {}
 
+    # instance_size and connection_count are worked out from the connections and properties whenever an object is
+    # made
     instance_type: str
-    instance_size: int
+    instance_size: int = dataclasses.field(compare=False)
     instance_ID: int
-    connection_count: int
+    connection_count: int = dataclasses.field(compare=False)
     connections: tuple
     base_property_struct: PropertyStruct = dataclasses.field(repr=False)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _init_schema_class(cls)
+
+    def __post_init__(self):
+        object.__setattr__(self, "instance_size", 6 + 12*len(self.connections) + self.base_property_struct.packed_size)
+        object.__setattr__(self, "connection_count", len(self.connections))
+        if self._decode_fields is not None:
+            self._decode_fields()
+
     @classmethod
-    def from_packed(cls, packed: bytes, subproperty_struct_classes: dict = {}):
+    def from_packed(cls, packed: bytes, subproperty_struct_classes: dict = None):
+        if subproperty_struct_classes is None:
+            subproperty_struct_classes = _subproperty_struct_classes(cls)
         instance_type_bytes, instance_size, instance_ID, connection_count = cls._struct.unpack(packed[:12])
         instance_type = unpack_ascii(instance_type_bytes)
 
@@ -155,7 +244,7 @@ class ScriptObject:
             instance_ID,
             connection_count,
             tuple(connections),
-            PropertyStruct.from_packed(packed[offset:], subproperty_struct_classes),
+            PropertyStruct.from_packed(packed[offset:6+instance_size], subproperty_struct_classes),
         )
 
     def _set_fields_from_property_data(self, *field_tuples) -> None:
@@ -168,7 +257,7 @@ class ScriptObject:
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return 6 + self.instance_size
 
     def packed(self) -> bytes:
         return b"".join((
@@ -176,17 +265,23 @@ class ScriptObject:
                 pack_ascii(self.instance_type),
                 self.instance_size,
                 self.instance_ID,
-                self.connection_count
+                self.connection_count,
             ),
             *(connection.packed() for connection in self.connections),
             self.base_property_struct.packed(),
         ))
 
+    def with_property_replaced(self, new_property):
+        return dataclasses.replace(
+            self,
+            base_property_struct=self.base_property_struct.with_subproperty_replaced(new_property),
+        )
+
+    def with_field(self, name: str, value):
+        return self.with_property_replaced(_field_property(self, self.base_property_struct, name, value))
+
     def with_connections_replaced(self, new_connections):
-        new_connection_count = len(tuple(new_connections))
         return dataclasses.replace(
             self,
-            instance_size=self.instance_size + 12*(new_connection_count - self.connection_count),
-            connection_count=new_connection_count,
             connections=tuple(sorted(new_connections, key=lambda conn: conn.target_instance_ID)),
         )
\ No newline at end of file
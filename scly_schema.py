@@ -0,0 +1,243 @@
+# Declarative schemas for the typed SCLY property structs and script objects. The schemas are loaded from
+# scly_schema.json, and the field decoders and encoders for each class are compiled once, when the class is created.
+
+import dataclasses
+import json
+import os
+import struct
+
+from util import INT_STRUCT, unpack_bool, unpack_bool_from_int, unpack_int, unpack_float, \
+    unpack_null_terminated_ascii, pack_int, pack_null_terminated_ascii, Vector
+
+__all__ = (
+    "PROPERTY_STRUCT_IDS",
+    "OPAQUE_PROPERTY_IDS",
+    "FieldSchema",
+    "Schema",
+    "SCHEMAS",
+    "looks_like_property_struct",
+    "compile_field_decoder",
+    "compile_field_encoders",
+    "reference_field_values",
+)
+
+_PROPERTY_HEADER_STRUCT = struct.Struct(">IH")
+_COUNT_STRUCT = struct.Struct(">H")
+_BOOL_STRUCT = struct.Struct(">?")
+_FLOAT_STRUCT = struct.Struct(">f")
+
+
+@dataclasses.dataclass(frozen=True)
+class FieldSchema:
+    name: str
+    type: str
+    property_IDs: tuple
+    offset: int = 0
+    enum: str = None
+
+    @classmethod
+    def from_json(cls, field_data: dict):
+        if field_data["type"] == "properties":
+            property_IDs = tuple(int(ID, 16) for ID in field_data["properties"])
+        else:
+            property_IDs = (int(field_data["property"], 16),)
+        return cls(field_data["name"], field_data["type"], property_IDs, field_data.get("offset", 0),
+                   field_data.get("enum"))
+
+    @property
+    def property_ID(self) -> int:
+        return self.property_IDs[0]
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.type not in ("property", "properties")
+
+
+@dataclasses.dataclass(frozen=True)
+class Schema:
+    name: str
+    struct_class_names: dict = dataclasses.field(repr=False)
+    fields: tuple = dataclasses.field(repr=False)
+
+    def get_field_by_name(self, name: str) -> FieldSchema:
+        for field in self.fields:
+            if field.name == name:
+                return field
+        raise KeyError(name)
+
+
+def _load_schemas(schema_data: dict) -> dict:
+    schemas = {}
+
+    def load(name):
+        if name not in schemas:
+            class_data = schema_data["schemas"][name]
+            struct_class_names, fields = {}, ()
+            if "base" in class_data:
+                base = load(class_data["base"])
+                struct_class_names, fields = dict(base.struct_class_names), base.fields
+            struct_class_names.update({int(ID, 16): name for ID, name in class_data.get("struct_classes", {}).items()})
+            fields += tuple(FieldSchema.from_json(field_data) for field_data in class_data["fields"])
+            schemas[name] = Schema(name, struct_class_names, fields)
+        return schemas[name]
+
+    for name in schema_data["schemas"]:
+        load(name)
+    return schemas
+
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "scly_schema.json")) as _schema_file:
+    _schema_data = json.load(_schema_file)
+
+SCHEMAS = _load_schemas(_schema_data)
+
+# TODO: List every property struct in the game. This only has the structs listed in scly_schema.json and the ones the
+# schemas decode into classes. Every other property is parsed as an opaque Property holding its data, so it still
+# packs back byte for byte but its contents can't be read or edited, unless PropertyStruct.detect_unlisted_structs is
+# turned on to guess structs from their bytes.
+PROPERTY_STRUCT_IDS = frozenset((
+    *(int(ID, 16) for ID in _schema_data["property_structs"]),
+    *(ID for schema in SCHEMAS.values() for ID in schema.struct_class_names),
+))
+
+# Properties that are known not to be structs, so they skip the structural check when it's turned on
+OPAQUE_PROPERTY_IDS = frozenset((
+    *(int(ID, 16) for ID in _schema_data["opaque_properties"]),
+    *(field.property_ID for schema in SCHEMAS.values() for field in schema.fields if field.is_leaf),
+)) - PROPERTY_STRUCT_IDS
+
+
+def looks_like_property_struct(packed: bytes, start: int, size: int) -> bool:
+    # Only used when PropertyStruct.detect_unlisted_structs is set: a property nobody has described is taken as a
+    # struct if its data is exactly a non-empty list of properties
+    if size < 8:
+        return False
+    subproperty_count, = _COUNT_STRUCT.unpack_from(packed, start)
+    if subproperty_count == 0:
+        return False
+
+    offset, end = start + 2, start + size
+    for i in range(subproperty_count):
+        if offset + 6 > end:
+            return False
+        offset += 6 + _PROPERTY_HEADER_STRUCT.unpack_from(packed, offset)[1]
+    return offset == end
+
+
+# Decoding: each type is an expression template over the property's data. Ints are unpacked with a struct rather
+# than int.from_bytes, so data of the wrong size is rejected just like the reference decoders reject it.
+_DECODE_EXPRESSIONS = {
+    "int":    "_unpack_int_tuple({data})[0]",
+    "bool":   "_unpack_bool({data})",
+    "bool32": "_unpack_int_tuple({data})[0] != 0",
+    "float":  "_unpack_float({data})",
+    "string": "{data}[:-1].decode('ascii')",
+    "vector": "_Vector.from_packed({data}[{offset}:{offset}+12])",
+    "enum":   "_namespace[{enum!r}](_unpack_int_tuple({data})[0])",
+}
+
+_DECODE_NAMESPACE = {
+    "_unpack_int_tuple": INT_STRUCT.unpack,
+    "_unpack_bool": unpack_bool,
+    "_unpack_float": unpack_float,
+    "_Vector": Vector,
+}
+
+
+def compile_field_decoder(schema: Schema, from_base_property_struct: bool, namespace: dict):
+    # namespace is the defining module's globals; enum names are looked up in it when fields are decoded, so the
+    # enums can be defined after the classes that use them
+    lines = [
+        "def _decode_fields(self):",
+        f"    property_struct = self{'.base_property_struct' if from_base_property_struct else ''}",
+        "    subproperties = property_struct.subproperties",
+        "    index_map = property_struct._subproperty_ID_to_index_map",
+        "    fields = self.__dict__",
+    ]
+
+    data_names = {}
+    for field in schema.fields:
+        if field.type == "property":
+            value = f"subproperties[index_map[0x{field.property_ID:08X}]]"
+        elif field.type == "properties":
+            value = "(" + "".join(f"subproperties[index_map[0x{ID:08X}]], " for ID in field.property_IDs) + ")"
+        else:
+            if field.property_ID not in data_names:
+                data_names[field.property_ID] = f"data_{field.property_ID:08X}"
+                lines.append(
+                    f"    {data_names[field.property_ID]} = subproperties[index_map[0x{field.property_ID:08X}]].data"
+                )
+            value = _DECODE_EXPRESSIONS[field.type].format(
+                data=data_names[field.property_ID],
+                offset=field.offset,
+                enum=field.enum,
+            )
+        lines.append(f"    fields[{field.name!r}] = {value}")
+
+    local_namespace = {}
+    exec("\n".join(lines), {**_DECODE_NAMESPACE, "_namespace": namespace}, local_namespace)
+    return local_namespace["_decode_fields"]
+
+
+# Encoding: each leaf field gets a function from the new value and the property's current data to its new data
+def _field_encoder(field: FieldSchema):
+    if field.type == "int":
+        return lambda value, data: pack_int(value)
+    if field.type == "bool":
+        return lambda value, data: _BOOL_STRUCT.pack(value)
+    if field.type == "bool32":
+        return lambda value, data: pack_int(int(value))
+    if field.type == "float":
+        return lambda value, data: _FLOAT_STRUCT.pack(value)
+    if field.type == "string":
+        return lambda value, data: pack_null_terminated_ascii(value)
+    if field.type == "vector":
+        offset = field.offset
+        return lambda value, data: b"".join((data[:offset], value.packed(), data[offset+12:]))
+    if field.type == "enum":
+        return lambda value, data: pack_int(value.value)
+    raise ValueError(f"{field.name} has type {field.type}, which has no encoder")
+
+
+def compile_field_encoders(schema: Schema) -> dict:
+    # Setting a field rewrites its property, so two fields can only share a property if they cover different bytes
+    # of it, like the vectors of a transform
+    encoders = {}
+    field_names = {}
+    for field in schema.fields:
+        if field.is_leaf:
+            key = (field.property_ID, field.offset if field.type == "vector" else None)
+            other_field_name = field_names.setdefault(key, field.name)
+            if other_field_name != field.name:
+                raise ValueError(
+                    f"{schema.name}.{other_field_name} and {schema.name}.{field.name} are both "
+                    f"property 0x{field.property_ID:08X}"
+                )
+            encoders[field.name] = (field.property_ID, _field_encoder(field))
+    return encoders
+
+
+# The reference path decodes through the generic PropertyStruct lookups, for checking the compiled decoders against
+_REFERENCE_CONVERSIONS = {
+    "int":    lambda data, field, namespace: unpack_int(data),
+    "bool":   lambda data, field, namespace: unpack_bool(data),
+    "bool32": lambda data, field, namespace: unpack_bool_from_int(data),
+    "float":  lambda data, field, namespace: unpack_float(data),
+    "string": lambda data, field, namespace: unpack_null_terminated_ascii(data),
+    "vector": lambda data, field, namespace: Vector.from_packed(data[field.offset:field.offset+12]),
+    "enum":   lambda data, field, namespace: namespace[field.enum](unpack_int(data)),
+}
+
+
+def reference_field_values(object_, schema: Schema, namespace: dict) -> dict:
+    property_struct = getattr(object_, "base_property_struct", object_)
+    values = {}
+    for field in schema.fields:
+        if field.type == "property":
+            values[field.name] = property_struct.get_subproperty_by_ID(field.property_ID)
+        elif field.type == "properties":
+            values[field.name] = tuple(property_struct.get_subproperty_by_ID(ID) for ID in field.property_IDs)
+        else:
+            data = property_struct.get_subproperty_by_ID(field.property_ID).data
+            values[field.name] = _REFERENCE_CONVERSIONS[field.type](data, field, namespace)
+    return values
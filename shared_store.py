@@ -0,0 +1,347 @@
+# A store of PAKs in shared memory, for servers whose worker processes all read the same PAKs. One process creates
+# the store, which copies each PAK's bytes into a shared block next to a sorted index of its asset IDs, and the
+# workers attach to it by name. Views built over the store are ordinary PAKs whose tables and resources are read
+# from the shared blocks when they're used, so a worker only holds what it decodes or edits.
+#
+# Usage:
+#     with SharedPAKStore.create({"Metroid1.pak": "paks/Metroid1.pak"}) as store:
+#         # in each worker, with store.name passed to it
+#         with SharedPAKStore.attach(name) as store:
+#             pak = store.get_PAK("Metroid1.pak")
+#
+# Before Python 3.13 an attaching process registers the blocks with its resource tracker, which removes them when
+# it exits, so workers should be started by the creating process, sharing its tracker.
+
+import array
+import bisect
+import collections.abc
+import dataclasses
+import json
+import os
+import sys
+import weakref
+from multiprocessing import shared_memory
+
+from pak import NamedResourceTable, ResourceTable, PAK
+from pvector import PersistentVector
+from util import unpack_int, pack_int
+
+__all__ = ("SharedAssetIndex", "SharedResourceTables", "LazyResources", "SharedPAKStore")
+
+_MANIFEST_VERSION = 1
+
+
+def _attached_block(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    return shared_memory.SharedMemory(name)
+
+
+class SharedAssetIndex(collections.abc.Mapping):
+    # Asset ID -> resource index, over the store's sorted arrays. Like the index PAK builds, the last of a repeated
+    # asset ID wins.
+    def __init__(self, asset_IDs: memoryview, indices: memoryview):
+        self._asset_IDs = asset_IDs
+        self._indices = indices
+
+    def __getitem__(self, asset_ID: int) -> int:
+        position = bisect.bisect_right(self._asset_IDs, asset_ID) - 1
+        if position < 0 or self._asset_IDs[position] != asset_ID:
+            raise KeyError(asset_ID)
+        return self._indices[position]
+
+    def __iter__(self):
+        return iter(dict.fromkeys(self._asset_IDs))
+
+    def __len__(self) -> int:
+        return len(dict.fromkeys(self._asset_IDs))
+
+
+class SharedResourceTables(collections.abc.Sequence):
+    # The resource tables of a stored PAK, each unpacked when it's read. The first edit to a view unpacks them all
+    # into a PersistentVector, which later edits share.
+    def __init__(self, packed: memoryview, tables_offset: int, resource_count: int, asset_ID_to_index_map):
+        self._packed = packed
+        self._tables_offset = tables_offset
+        self._resource_count = resource_count
+        self.asset_ID_to_index_map = asset_ID_to_index_map
+
+    def __len__(self) -> int:
+        return self._resource_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(self._resource_count)))
+        if index < 0:
+            index += self._resource_count
+        if not 0 <= index < self._resource_count:
+            raise IndexError("SharedResourceTables index out of range")
+        offset = self._tables_offset + 20*index
+        return ResourceTable.from_packed(self._packed[offset:offset+20])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, collections.abc.Sequence):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def set(self, index: int, item) -> PersistentVector:
+        return PersistentVector(self).set(index, item)
+
+    def insert(self, index: int, item) -> PersistentVector:
+        return PersistentVector(self).insert(index, item)
+
+    def append(self, item) -> PersistentVector:
+        return PersistentVector(self).append(item)
+
+    def delete(self, index: int) -> PersistentVector:
+        return PersistentVector(self).delete(index)
+
+
+class _StoredResources:
+    # What the lazy resources of every view over one stored PAK share. Decoded resources are cached only while
+    # something else holds them.
+    def __init__(self, packed: memoryview, resource_tables: SharedResourceTables):
+        self.packed = packed
+        self.resource_tables = resource_tables
+        self.decoded = weakref.WeakValueDictionary()
+
+    def packed_resource(self, index: int) -> bytes:
+        resource_table = self.resource_tables[index]
+        return bytes(self.packed[resource_table.offset:resource_table.offset+resource_table.size])
+
+    def resource(self, index: int):
+        resource = self.decoded.get(index)
+        if resource is None:
+            asset_class = PAK._get_asset_class(self.resource_tables[index])
+            resource = asset_class.from_packed(self.packed_resource(index))
+            self.decoded[index] = resource
+        return resource
+
+
+class LazyResources(collections.abc.Sequence):
+    # The resources of a view, decoded on first access. Items are stored resource indices until they're replaced, so
+    # the edits PAK makes through set, insert and delete only hold the resources they add.
+    __slots__ = ("_stored", "_items")
+
+    def __init__(self, stored: _StoredResources, items: PersistentVector = None):
+        self._stored = stored
+        # None until the first edit, for every stored resource in order
+        self._items = items
+
+    def _edited_items(self) -> PersistentVector:
+        if self._items is None:
+            return PersistentVector(range(len(self._stored.resource_tables)))
+        return self._items
+
+    def __len__(self) -> int:
+        return len(self._stored.resource_tables) if self._items is None else len(self._items)
+
+    def _resolved(self, item):
+        return self._stored.resource(item) if type(item) is int else item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        if self._items is None:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("LazyResources index out of range")
+            return self._stored.resource(index)
+        return self._resolved(self._items[index])
+
+    def __iter__(self):
+        if self._items is None:
+            return (self._stored.resource(index) for index in range(len(self)))
+        return (self._resolved(item) for item in self._items)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, collections.abc.Sequence):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def packed_items(self, pack) -> list:
+        # Resources that were never replaced are copied straight from the store; pack is called on the others
+        return [
+            self._stored.packed_resource(item) if type(item) is int else pack(item)
+            for item in (range(len(self)) if self._items is None else self._items)
+        ]
+
+    def set(self, index: int, item):
+        return LazyResources(self._stored, self._edited_items().set(index, item))
+
+    def insert(self, index: int, item):
+        return LazyResources(self._stored, self._edited_items().insert(index, item))
+
+    def append(self, item):
+        return self.insert(len(self), item)
+
+    def delete(self, index: int):
+        return LazyResources(self._stored, self._edited_items().delete(index))
+
+
+@dataclasses.dataclass(frozen=True)
+class _StoreEntry:
+    block_name: str
+    size: int
+    # Where the resource tables start, past the header and the named resource tables
+    tables_offset: int
+    resource_count: int
+    # Where the sorted asset IDs start, followed by the resource index of each
+    index_offset: int
+
+
+class SharedPAKStore:
+    def __init__(self, manifest_block, blocks: dict, entries: dict, owner: bool):
+        self._manifest_block = manifest_block
+        self._blocks = blocks
+        self._entries = entries
+        self._owner = owner
+        self._stored_resources = {}
+        self._named_resource_tables = {}
+        # Views into the blocks, which have to be released before the blocks can be closed
+        self._memoryviews = []
+
+    @classmethod
+    def create(cls, sources: dict):
+        # sources maps each PAK's name to its path or its bytes
+        blocks, entries = {}, {}
+        try:
+            for name, source in sources.items():
+                if isinstance(source, (str, os.PathLike)):
+                    with open(source, "rb") as file:
+                        packed = file.read()
+                else:
+                    packed = bytes(source)
+                blocks[name], entries[name] = cls._created_block(packed)
+
+            manifest = json.dumps({
+                "version": _MANIFEST_VERSION,
+                "paks": {name: dataclasses.asdict(entry) for name, entry in entries.items()},
+            }).encode("utf-8")
+            manifest_block = shared_memory.SharedMemory(create=True, size=4 + len(manifest))
+            manifest_block.buf[:4 + len(manifest)] = pack_int(len(manifest)) + manifest
+        except BaseException:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+            raise
+
+        return cls(manifest_block, blocks, entries, True)
+
+    @staticmethod
+    def _created_block(packed: bytes):
+        header = PAK.read_tables(packed)
+        tables_offset = 12 + sum(12 + table.name_length for table in header.named_resource_tables) + 4
+        sorted_pairs = sorted((table.asset_ID, index) for index, table in enumerate(header.resource_tables))
+        index_offset = (len(packed) + 3) // 4 * 4
+
+        packed_index = b"".join((
+            array.array("I", (asset_ID for asset_ID, index in sorted_pairs)).tobytes(),
+            array.array("I", (index for asset_ID, index in sorted_pairs)).tobytes(),
+        ))
+
+        block = shared_memory.SharedMemory(create=True, size=max(index_offset + len(packed_index), 1))
+        block.buf[:len(packed)] = packed
+        block.buf[index_offset:index_offset+len(packed_index)] = packed_index
+        return block, _StoreEntry(block.name, len(packed), tables_offset, len(sorted_pairs), index_offset)
+
+    @classmethod
+    def attach(cls, name: str):
+        manifest_block = _attached_block(name)
+        manifest_size = unpack_int(bytes(manifest_block.buf[:4]))
+        manifest = json.loads(bytes(manifest_block.buf[4:4+manifest_size]))
+        if manifest["version"] != _MANIFEST_VERSION:
+            manifest_block.close()
+            raise ValueError(f"Shared PAK store {name} has version {manifest['version']}")
+
+        entries = {name: _StoreEntry(**entry) for name, entry in manifest["paks"].items()}
+        blocks = {name: _attached_block(entry.block_name) for name, entry in entries.items()}
+        return cls(manifest_block, blocks, entries, False)
+
+    @property
+    def name(self) -> str:
+        # What workers pass to attach
+        return self._manifest_block.name
+
+    @property
+    def names(self) -> tuple:
+        return tuple(self._entries)
+
+    def packed(self, name: str) -> memoryview:
+        return self._blocks[name].buf[:self._entries[name].size]
+
+    def _get_stored_resources(self, name: str) -> _StoredResources:
+        if name not in self._stored_resources:
+            entry = self._entries[name]
+            buffer = self._blocks[name].buf
+            count = entry.resource_count
+            packed = buffer[:entry.size]
+            asset_IDs = buffer[entry.index_offset:entry.index_offset + 4*count].cast("I")
+            indices = buffer[entry.index_offset + 4*count:entry.index_offset + 8*count].cast("I")
+            self._memoryviews.extend((packed, asset_IDs, indices))
+
+            asset_ID_to_index_map = SharedAssetIndex(asset_IDs, indices)
+            resource_tables = SharedResourceTables(packed, entry.tables_offset, count, asset_ID_to_index_map)
+            self._stored_resources[name] = _StoredResources(packed, resource_tables)
+        return self._stored_resources[name]
+
+    def _get_named_resource_tables(self, name: str) -> tuple:
+        if name not in self._named_resource_tables:
+            packed = self.packed(name)
+            offset = 12
+            named_resource_tables = []
+            for i in range(unpack_int(bytes(packed[8:12]))):
+                name_length = unpack_int(bytes(packed[offset+8:offset+12]))
+                table = NamedResourceTable.from_packed(bytes(packed[offset:offset+12+name_length]))
+                named_resource_tables.append(table)
+                offset += 12 + name_length
+            packed.release()
+            self._named_resource_tables[name] = tuple(named_resource_tables)
+        return self._named_resource_tables[name]
+
+    def get_PAK(self, name: str) -> PAK:
+        # A new view each time; views share the tables, the index and any resources still held by another view
+        stored = self._get_stored_resources(name)
+        major_version, minor_version, unused, named_resource_count = PAK._struct.unpack(bytes(stored.packed[:12]))
+        return PAK(
+            major_version,
+            minor_version,
+            unused,
+            named_resource_count,
+            self._get_named_resource_tables(name),
+            len(stored.resource_tables),
+            stored.resource_tables,
+            LazyResources(stored),
+        )
+
+    def close(self) -> None:
+        # Every view has to be dropped first, since they point into the blocks
+        self._stored_resources.clear()
+        for memoryview_ in self._memoryviews:
+            memoryview_.release()
+        self._memoryviews.clear()
+        for block in self._blocks.values():
+            block.close()
+        self._manifest_block.close()
+
+    def unlink(self) -> None:
+        # Only the creating process removes the blocks, once every worker is done with them
+        for block in self._blocks.values():
+            block.unlink()
+        self._manifest_block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        if self._owner:
+            self.unlink()
+        return False
@@ -1,8 +1,10 @@
 # Source: http://www.metroid2002.com/retromodding/wiki/STRG_(Metroid_Prime)
 
 import dataclasses
+import itertools
 import struct
 
+from pvector import PersistentVector, persistent
 from util import unpack_ascii, unpack_null_terminated_ascii, unpack_null_terminated_utf_16, \
     pack_ascii, pack_null_terminated_ascii, pack_null_terminated_utf_16
 
@@ -14,8 +16,8 @@ class LanguageTable:
     _struct = struct.Struct(">4sII")
 
     language_ID: str
-    strings_offset: int
-    strings_size: int
+    strings_offset: int = dataclasses.field(compare=False)
+    strings_size: int = dataclasses.field(compare=False)
 
     @classmethod
     def from_packed(cls, packed: bytes):
@@ -38,7 +40,7 @@ class LanguageTable:
 class NameEntry:
     _struct = struct.Struct(">II")
 
-    offset: int
+    offset: int = dataclasses.field(compare=False)
     string_index: int
 
     @classmethod
@@ -57,8 +59,9 @@ class NameEntry:
 class NameTable:
     _struct = struct.Struct(">II")
 
-    count: int
-    size: int
+    # count, size and the entry offsets are as parsed; packed() derives them from the names
+    count: int = dataclasses.field(compare=False)
+    size: int = dataclasses.field(compare=False)
     entries: tuple
     names: tuple
 
@@ -82,59 +85,82 @@ class NameTable:
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return 8 + 8*len(self.entries) + sum(len(name) + 1 for name in self.names)
 
     def packed(self) -> bytes:
+        packed_names = [pack_null_terminated_ascii(name) for name in self.names]
+        name_offsets = itertools.accumulate(map(len, packed_names), initial=8*len(self.entries))
+        packed_entries = b"".join(
+            NameEntry._struct.pack(name_offset, entry.string_index)
+            for entry, name_offset in zip(self.entries, name_offsets)
+        )
         return b"".join((
-            self._struct.pack(self.count, self.size),
-            *(entry.packed() for entry in self.entries),
-            *(pack_null_terminated_ascii(name) for name in self.names),
+            self._struct.pack(len(self.entries), len(packed_entries) + sum(map(len, packed_names))),
+            packed_entries,
+            *packed_names,
         ))
 
     def get_string_index_for_name(self, name: str):
         return self.entries[self.names.index(name)].string_index
 
 
+def _utf_16_string_end(packed: bytes, offset: int) -> int:
+    # The terminator is the first null code unit. Two zero bytes straddling a pair of code units, like the end of
+    # U+0100 followed by the start of U+0041, aren't one.
+    end = packed.index(b"\x00\x00", offset)
+    while (end - offset) % 2:
+        end = packed.index(b"\x00\x00", end + 1)
+    return end + 2
+
+
 @dataclasses.dataclass(frozen=True)
 class StringTable:
-    count: int
-    offsets: tuple
+    # count and offsets are as parsed. packed() derives them from the strings, keeping the order the strings were
+    # stored in.
+    count: int = dataclasses.field(compare=False)
+    offsets: tuple = dataclasses.field(compare=False)
     strings: tuple
 
+    def __post_init__(self):
+        object.__setattr__(self, "strings", persistent(self.strings))
+
     @classmethod
     def from_packed(cls, packed: bytes, string_count: int):
         string_offsets = struct.unpack(f">{string_count}I", packed[:4*string_count])
 
         strings = []
         for offset in string_offsets:
-            string_length = packed[offset:].index(b"\x00\x00")
-            strings.append(unpack_null_terminated_utf_16(packed[offset:offset+string_length+2]))
+            end = _utf_16_string_end(packed, offset)
+            strings.append(unpack_null_terminated_utf_16(packed[offset:end]))
+
+        return cls(string_count, string_offsets, PersistentVector(strings))
 
-        return cls(string_count, string_offsets, tuple(strings))
+    def _storage_order(self):
+        if len(self.offsets) != len(self.strings):
+            return range(len(self.strings))
+        return sorted(range(len(self.strings)), key=self.offsets.__getitem__)
 
     @property
     def packed_size(self) -> int:
-        return len(self.packed())
+        return 4*len(self.strings) + sum(len(pack_null_terminated_utf_16(string)) for string in self.strings)
 
     def packed(self) -> bytes:
+        packed_strings = [pack_null_terminated_utf_16(string) for string in self.strings]
+        storage_order = self._storage_order()
+
+        offsets = [0] * len(packed_strings)
+        offset = 4*len(packed_strings)
+        for index in storage_order:
+            offsets[index] = offset
+            offset += len(packed_strings[index])
+
         return b"".join((
-            struct.pack(f">{self.count}I", *self.offsets),
-            *(pack_null_terminated_utf_16(string) for _, string in sorted(zip(self.offsets, self.strings))),
+            struct.pack(f">{len(offsets)}I", *offsets),
+            *(packed_strings[index] for index in storage_order),
         ))
 
     def with_string_replaced(self, index: int, new_string: str):
-        size_diff = \
-            len(pack_null_terminated_utf_16(new_string)) - len(pack_null_terminated_utf_16(self.strings[index]))
-
-        new_offsets = list(self.offsets[:index+1])
-        for offset in self.offsets[index+1:]:
-            new_offsets.append(offset+size_diff)
-
-        return dataclasses.replace(
-            self,
-            offsets=tuple(new_offsets),
-            strings=(*self.strings[:index], new_string, *self.strings[index+1:]),
-        )
+        return dataclasses.replace(self, strings=self.strings.set(index, new_string))
 
 
 @dataclasses.dataclass(frozen=True)
@@ -143,10 +169,11 @@ class STRG:
 
     _struct = struct.Struct(">IIII")
 
+    # language_count, string_count and the language tables' offsets and sizes are as parsed; packed() derives them
     magic_number: int
     version: int
-    language_count: int
-    string_count: int
+    language_count: int = dataclasses.field(compare=False)
+    string_count: int = dataclasses.field(compare=False)
     language_tables: tuple = dataclasses.field(repr=False)
     name_table: NameTable = dataclasses.field(repr=False)
     string_tables: tuple = dataclasses.field(repr=False)
@@ -187,36 +214,31 @@ class STRG:
 
     @property
     def packed_size(self) -> int:
-        language_tables_size = sum(language_table.packed_size for language_table in self.language_tables)
         string_tables_size = sum(string_table.packed_size for string_table in self.string_tables)
-
-        return 4 + 4 + 4 + 4 + language_tables_size + self.name_table.packed_size + string_tables_size
+        return 4 + 4 + 4 + 4 + 12*len(self.language_tables) + self.name_table.packed_size + string_tables_size
 
     def packed(self) -> bytes:
+        packed_string_tables = [string_table.packed() for string_table in self.string_tables]
+        strings_offsets = itertools.accumulate(map(len, packed_string_tables), initial=0)
+        string_count = len(self.string_tables[0].strings) if self.string_tables else self.string_count
+
         return b"".join((
-            self._struct.pack(self.magic_number, self.version, self.language_count, self.string_count),
-            *(language_table.packed() for language_table in self.language_tables),
+            self._struct.pack(self.magic_number, self.version, len(self.language_tables), string_count),
+            *(
+                LanguageTable._struct.pack(pack_ascii(language_table.language_ID), strings_offset, len(packed_strings))
+                for language_table, strings_offset, packed_strings
+                in zip(self.language_tables, strings_offsets, packed_string_tables)
+            ),
             self.name_table.packed(),
-            *(string_table.packed() for string_table in self.string_tables),
+            *packed_string_tables,
         ))
 
     def get_string_table_by_language_ID(self, language_ID: str) -> StringTable:
         return self.string_tables[self._language_ID_to_index_map[language_ID]]
 
     def with_string_table_replaced(self, index: int, new_string_table: StringTable):
-        old_language_table = self.language_tables[index]
-        new_language_table = dataclasses.replace(old_language_table, strings_size=new_string_table.packed_size)
-
-        size_diff = new_language_table.strings_size - old_language_table.strings_size
-        new_language_tables = [*self.language_tables[:index], new_language_table]
-        for language_table in self.language_tables[index+1:]:
-            new_language_tables.append(
-                dataclasses.replace(language_table, strings_offset=language_table.strings_size+size_diff)
-            )
-
         return dataclasses.replace(
             self,
-            language_tables=tuple(new_language_tables),
             string_tables=(*self.string_tables[:index], new_string_table, *self.string_tables[index+1:]),
         )
 
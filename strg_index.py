@@ -0,0 +1,241 @@
+# A persistent inverted index over every string in the STRGs of a set of PAKs, in every language. Each STRG's entry
+# remembers the digest of its packed bytes, so updating the index only decodes STRGs that changed.
+#
+# Usage: python strg_index.py index.json [--update PAK ...] [--search QUERY] [--prefix] [--language ID]
+
+import argparse
+import bisect
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import sys
+
+from pak import PAK
+from strg import STRG
+
+__all__ = ("tokenized", "StringMatch", "IndexedSTRG", "StringIndex", "main")
+
+# Version 1 kept PAKs under their file names only, version 2 under their paths as given
+_INDEX_VERSION = 3
+
+# Formatting tags like "&push;" and "&main-color=#FF6705B3;" aren't part of the text
+_TAG_PATTERN = re.compile(r"&[^;&\s]*;")
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenized(text: str) -> list:
+    return _TOKEN_PATTERN.findall(_TAG_PATTERN.sub(" ", text).casefold())
+
+
+@dataclasses.dataclass(frozen=True, order=True)
+class StringMatch:
+    pak_name: str
+    asset_ID: int
+    language_ID: str
+    string_index: int
+    name: str = None
+
+
+@dataclasses.dataclass(frozen=True)
+class IndexedSTRG:
+    digest: str
+    language_IDs: tuple
+    names: dict = dataclasses.field(repr=False)
+    # Token -> (language index, string index) pairs, flattened
+    postings: dict = dataclasses.field(repr=False)
+
+    @classmethod
+    def from_STRG(cls, strg: STRG, digest: str):
+        names = {entry.string_index: name for entry, name in zip(strg.name_table.entries, strg.name_table.names)}
+
+        postings = {}
+        for language_index, string_table in enumerate(strg.string_tables):
+            for string_index, string in enumerate(string_table.strings):
+                for token in dict.fromkeys(tokenized(string)):
+                    postings.setdefault(token, []).extend((language_index, string_index))
+
+        return cls(
+            digest,
+            tuple(language_table.language_ID for language_table in strg.language_tables),
+            names,
+            postings,
+        )
+
+    @classmethod
+    def from_json(cls, entry_data: dict):
+        return cls(
+            entry_data["digest"],
+            tuple(entry_data["language_IDs"]),
+            {int(string_index): name for string_index, name in entry_data["names"].items()},
+            entry_data["postings"],
+        )
+
+    def as_json(self) -> dict:
+        return {
+            "digest": self.digest,
+            "language_IDs": list(self.language_IDs),
+            "names": {str(string_index): name for string_index, name in self.names.items()},
+            "postings": self.postings,
+        }
+
+
+class StringIndex:
+    def __init__(self, entries: dict = None):
+        # (PAK name, asset ID) -> IndexedSTRG
+        self.entries = {} if entries is None else entries
+        self._token_postings = None
+        self._sorted_tokens = None
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as index_file:
+            index_data = json.load(index_file)
+        if index_data.get("version") != _INDEX_VERSION:
+            return cls()
+        return cls({
+            (pak_name, int(asset_ID, 16)): IndexedSTRG.from_json(entry_data)
+            for pak_name, pak_entries in index_data["paks"].items()
+            for asset_ID, entry_data in pak_entries.items()
+        })
+
+    def save(self, path: str) -> None:
+        paks = {}
+        for (pak_name, asset_ID), entry in sorted(self.entries.items()):
+            paks.setdefault(pak_name, {})[f"{asset_ID:08X}"] = entry.as_json()
+
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as index_file:
+            json.dump({"version": _INDEX_VERSION, "paks": paks}, index_file, separators=(",", ":"))
+        os.replace(temporary_path, path)
+
+    def update_from_PAK(self, source, pak_name: str = None) -> int:
+        # Returns how many STRGs were decoded; the rest were unchanged since the last update. Entries are kept under
+        # pak_name, which defaults to the absolute path for a path source, so PAKs with the same file name in
+        # different directories don't replace each other's entries, and the same PAK is found again from any working
+        # directory. Bytes and file sources have no path to go by.
+        if pak_name is None:
+            if not isinstance(source, (str, os.PathLike)):
+                raise ValueError("pak_name is required when the PAK is given as bytes or a file")
+            pak_name = os.path.abspath(os.fspath(source))
+
+        updated_count = 0
+        asset_IDs = set()
+        for asset_ID, _, packed_strg in PAK.iter_resources(source, types={"STRG"}, decode=False):
+            asset_IDs.add(asset_ID)
+            digest = hashlib.sha1(packed_strg).hexdigest()
+            entry = self.entries.get((pak_name, asset_ID))
+            if entry is None or entry.digest != digest:
+                self._set_entry((pak_name, asset_ID), IndexedSTRG.from_STRG(STRG.from_packed(packed_strg), digest))
+                updated_count += 1
+
+        removed_keys = [key for key in self.entries if key[0] == pak_name and key[1] not in asset_IDs]
+        for key in removed_keys:
+            self._remove_entry(key)
+        return updated_count
+
+    def _set_entry(self, key: tuple, entry: IndexedSTRG) -> None:
+        # Keeps the lookup, if it's been built, in step with the entries, so a search after an update only pays
+        # for the STRGs that changed
+        if self._token_postings is not None:
+            if key in self.entries:
+                self._remove_from_lookup(key, self.entries[key])
+            self._add_to_lookup(key, entry)
+        self.entries[key] = entry
+
+    def _remove_entry(self, key: tuple) -> None:
+        entry = self.entries.pop(key)
+        if self._token_postings is not None:
+            self._remove_from_lookup(key, entry)
+
+    def _add_to_lookup(self, key: tuple, entry: IndexedSTRG) -> None:
+        for token, postings in entry.postings.items():
+            key_postings = self._token_postings.get(token)
+            if key_postings is None:
+                key_postings = self._token_postings[token] = {}
+                bisect.insort(self._sorted_tokens, token)
+            key_postings[key] = postings
+
+    def _remove_from_lookup(self, key: tuple, entry: IndexedSTRG) -> None:
+        for token in entry.postings:
+            key_postings = self._token_postings[token]
+            del key_postings[key]
+            if not key_postings:
+                del self._token_postings[token]
+                del self._sorted_tokens[bisect.bisect_left(self._sorted_tokens, token)]
+
+    def _build_lookup(self) -> None:
+        # Token -> {(PAK name, asset ID): flattened postings} for every STRG containing it
+        token_postings = {}
+        for key, entry in self.entries.items():
+            for token, postings in entry.postings.items():
+                token_postings.setdefault(token, {})[key] = postings
+        self._token_postings = token_postings
+        self._sorted_tokens = sorted(token_postings)
+
+    def _matching_tokens(self, token: str, prefix: bool):
+        if not prefix:
+            return (token,) if token in self._token_postings else ()
+        start = bisect.bisect_left(self._sorted_tokens, token)
+        end = bisect.bisect_left(self._sorted_tokens, token + "\U0010FFFF")
+        return self._sorted_tokens[start:end]
+
+    def _locations_for_token(self, token: str, prefix: bool) -> set:
+        locations = set()
+        for matching_token in self._matching_tokens(token, prefix):
+            for key, postings in self._token_postings[matching_token].items():
+                for i in range(0, len(postings), 2):
+                    locations.add((key, postings[i], postings[i+1]))
+        return locations
+
+    def search(self, query: str, prefix: bool = False, language_IDs=None) -> tuple:
+        # Every token of the query has to appear in a string for it to match. With prefix=True each query token
+        # matches any token it's a prefix of.
+        if self._token_postings is None:
+            self._build_lookup()
+
+        locations = None
+        for token in dict.fromkeys(tokenized(query)):
+            token_locations = self._locations_for_token(token, prefix)
+            locations = token_locations if locations is None else locations & token_locations
+            if not locations:
+                return ()
+        if locations is None:
+            return ()
+
+        matches = []
+        for (pak_name, asset_ID), language_index, string_index in locations:
+            entry = self.entries[pak_name, asset_ID]
+            language_ID = entry.language_IDs[language_index]
+            if language_IDs is None or language_ID in language_IDs:
+                name = entry.names.get(string_index)
+                matches.append(StringMatch(pak_name, asset_ID, language_ID, string_index, name))
+        return tuple(sorted(matches))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build and search an index of every STRG string")
+    parser.add_argument("index", help="index file, created if it doesn't exist")
+    parser.add_argument("--update", nargs="+", default=(), metavar="PAK", help="PAKs to add to or refresh in the index")
+    parser.add_argument("--search", metavar="QUERY", help="print the strings containing every word of the query")
+    parser.add_argument("--prefix", action="store_true", help="match query words as prefixes")
+    parser.add_argument("--language", action="append", dest="language_IDs", help="only match this language ID")
+    args = parser.parse_args(argv)
+
+    index = StringIndex.load(args.index) if os.path.exists(args.index) else StringIndex()
+    if args.update:
+        for path in args.update:
+            print(f"{path}: {index.update_from_PAK(path)} STRGs reindexed")
+        index.save(args.index)
+
+    if args.search is not None:
+        for match in index.search(args.search, args.prefix, args.language_IDs):
+            name = "" if match.name is None else f" {match.name}"
+            print(f"{match.pak_name} 0x{match.asset_ID:08X} {match.language_ID} {match.string_index}{name}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+# Synthetic but format-valid payloads for benchmarking and testing, since real game files can't be shipped.
+# Everything is built from pools of prepacked fragments and bulk struct packing so that large fixtures are cheap.
+
+import dataclasses
+import itertools
+import random
+import struct
+
+from scan import ScannableObjectInfo
+from util import pack_int, pack_ascii, pack_null_terminated_ascii, pack_null_terminated_utf_16
+
+__all__ = (
+    "SCAN_TREE_ASSET_ID",
+    "SyntheticScale",
+    "SCALES",
+    "generate_STRG",
+    "generate_HINT",
+    "generate_DGRP",
+    "generate_SCAN",
+    "generate_ScanTree",
+    "generate_PAK",
+    "generate_world_PAK",
+)
+
+SCAN_TREE_ASSET_ID = 0x95B61279
+
+_WORDS = (
+    "Aether", "Dark", "Light", "Temple", "Grounds", "Agon", "Wastes", "Torvus", "Bog", "Sanctuary", "Fortress",
+    "Ing", "Luminoth", "Energy", "Controller", "Beam", "Missile", "Morph", "Ball", "Scan", "Visor", "Key",
+)
+_LANGUAGE_IDS = ("ENGL", "FREN", "GERM", "SPAN", "ITAL", "DUTC", "JAPN", "KORE", "CHIN", "PORT")
+_DEPENDENCY_TYPES = ("TXTR", "CMDL", "ANCS", "PART", "STRG", "FONT", "AGSC")
+
+_PROPERTY_HEADER_STRUCT = struct.Struct(">IH")
+_SCRIPT_OBJECT_HEADER_STRUCT = struct.Struct(">4sHIH")
+_CONNECTION_STRUCT = struct.Struct(">4s4sI")
+_RESOURCE_TABLE_STRUCT = struct.Struct(">I4sIII")
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticScale:
+    strg_count: int
+    strings_per_STRG: int
+    scan_count: int
+    dgrp_count: int
+    scan_tree_object_count: int
+    hint_count: int
+    raw_resource_count: int
+    raw_resource_size: int
+
+    def scaled(self, factor: int):
+        return dataclasses.replace(self, **{
+            field.name: getattr(self, field.name) * factor
+            for field in dataclasses.fields(self)
+            if field.name not in ("strings_per_STRG", "raw_resource_size")
+        })
+
+
+SCALES = {
+    "tiny":   SyntheticScale(4, 10, 4, 2, 20, 5, 4, 1024),
+    "small":  SyntheticScale(50, 40, 50, 10, 300, 50, 100, 16 * 1024),
+    "retail": SyntheticScale(600, 60, 500, 80, 2000, 150, 1500, 96 * 1024),
+    "huge":   SyntheticScale(3000, 80, 2500, 400, 10000, 600, 6000, 96 * 1024),
+}
+
+
+def _sentence_pool(rng: random.Random, words_per_string: int, size: int = 256) -> list:
+    return [
+        pack_null_terminated_utf_16(" ".join(rng.choice(_WORDS) for j in range(words_per_string)))
+        for i in range(size)
+    ]
+
+
+def _packed_property(ID: int, data: bytes) -> bytes:
+    return _PROPERTY_HEADER_STRUCT.pack(ID, len(data)) + data
+
+
+def _packed_property_struct(ID: int, packed_subproperties) -> bytes:
+    packed_subproperties = tuple(packed_subproperties)
+    body = b"".join((struct.pack(">H", len(packed_subproperties)), *packed_subproperties))
+    return _PROPERTY_HEADER_STRUCT.pack(ID, len(body)) + body
+
+
+def _packed_script_object(object_type: str, instance_ID: int, target_instance_IDs, base_property_struct: bytes):
+    target_instance_IDs = sorted(target_instance_IDs)
+    body = b"".join((
+        *(_CONNECTION_STRUCT.pack(b"ZERO", b"ATTC", target_instance_ID) for target_instance_ID in target_instance_IDs),
+        base_property_struct,
+    ))
+    return _SCRIPT_OBJECT_HEADER_STRUCT.pack(
+        pack_ascii(object_type),
+        4 + 2 + len(body),
+        instance_ID,
+        len(target_instance_IDs),
+    ) + body
+
+
+def _aligned_to_32_bytes(packed: bytes) -> bytes:
+    return packed + ((32 - (len(packed) % 32)) % 32) * b"\xff"
+
+
+def generate_STRG(language_count: int = 6, string_count: int = 100, words_per_string: int = 8, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    language_IDs = [_LANGUAGE_IDS[i % len(_LANGUAGE_IDS)] for i in range(language_count)]
+    sentence_pool = _sentence_pool(rng, words_per_string)
+
+    names = [pack_null_terminated_ascii(f"string_{i}") for i in range(0, string_count, 4)]
+    name_offsets = itertools.accumulate(map(len, names), initial=8 * len(names))
+    name_table_body = b"".join((
+        struct.pack(f">{2 * len(names)}I", *itertools.chain.from_iterable(
+            (name_offset, 4 * i) for i, name_offset in zip(range(len(names)), name_offsets)
+        )),
+        *names,
+    ))
+
+    packed_string_tables = []
+    for language_ID in language_IDs:
+        packed_strings = rng.choices(sentence_pool, k=string_count)
+        offsets = itertools.accumulate(map(len, packed_strings), initial=4 * string_count)
+        packed_string_tables.append(b"".join((
+            struct.pack(f">{string_count}I", *itertools.islice(offsets, string_count)),
+            *packed_strings,
+        )))
+
+    strings_offsets = itertools.accumulate(map(len, packed_string_tables), initial=0)
+    language_tables = b"".join(
+        struct.pack(">4sII", pack_ascii(language_ID), strings_offset, len(packed_string_table))
+        for language_ID, strings_offset, packed_string_table in zip(language_IDs, strings_offsets, packed_string_tables)
+    )
+
+    return b"".join((
+        struct.pack(">IIII", 0x87654321, 1, language_count, string_count),
+        language_tables,
+        struct.pack(">II", len(names), len(name_table_body)),
+        name_table_body,
+        *packed_string_tables,
+    ))
+
+
+def generate_HINT(hint_count: int = 50, locations_per_hint: int = 4, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    locations_struct = struct.Struct(f">{4 * locations_per_hint}I")
+
+    packed_hints = []
+    for i in range(hint_count):
+        packed_hints.append(b"".join((
+            pack_null_terminated_ascii(f"Hint{i}_{rng.choice(_WORDS)}{rng.choice(_WORDS)}"),
+            struct.pack(">ffIII", 30.0, 90.0, rng.getrandbits(32), 1, locations_per_hint),
+            locations_struct.pack(*(
+                rng.randrange(100) if j % 4 == 2 else rng.getrandbits(32) for j in range(4 * locations_per_hint)
+            )),
+        )))
+
+    return b"".join((struct.pack(">III", 0x00BADBAD, 1, hint_count), *packed_hints))
+
+
+def generate_DGRP(dependency_count: int = 20, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    return b"".join((
+        pack_int(dependency_count),
+        struct.pack(f">{'4sI' * dependency_count}", *itertools.chain.from_iterable(
+            (pack_ascii(rng.choice(_DEPENDENCY_TYPES)), rng.getrandbits(32)) for i in range(dependency_count)
+        )),
+    ))
+
+
+def _packed_animation_parameters(ID: int, rng: random.Random) -> bytes:
+    # AnimationParameters aren't detected as a struct, so the parsers keep them as a plain property
+    return _packed_property(ID, struct.pack(">III", rng.getrandbits(32), 0, 0))
+
+
+def generate_SCAN(dependency_count: int = 8, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+
+    secondary_models = tuple(
+        _packed_property_struct(ID, (
+            _packed_property(0x1F7921BC, pack_int(rng.getrandbits(32) if i < 2 else 0xFFFFFFFF)),
+            _packed_animation_parameters(0xCDD202D1, rng),
+            _packed_property(0x3EA2BED8, pack_null_terminated_ascii(f"bone_{i}" if i < 2 else "")),
+        ))
+        for i, ID in enumerate(ScannableObjectInfo._secondary_model_property_IDs)
+    )
+    base_property_struct = _packed_property_struct(0xFFFFFFFF, (
+        _packed_property(0x2F5B6423, pack_int(rng.getrandbits(32))),
+        _packed_property(0xC308A322, pack_int(rng.randrange(2))),
+        _packed_property(0x7B714814, struct.pack(">?", rng.randrange(2))),
+        _packed_property(0x1733B1EC, struct.pack(">?", rng.randrange(2))),
+        _packed_property(0x53336141, pack_int(0xFFFFFFFF)),
+        _packed_property(0x3DE0BA64, struct.pack(">f", rng.uniform(-180, 180))),
+        _packed_property(0x2ADD6628, struct.pack(">f", rng.uniform(-180, 180))),
+        _packed_property(0xD0C15066, struct.pack(">f", rng.uniform(0.5, 2))),
+        _packed_property(0xB7ADC418, pack_int(rng.getrandbits(32))),
+        _packed_animation_parameters(0x15694EE1, rng),
+        _packed_animation_parameters(0x58F9FE99, rng),
+        *secondary_models,
+    ))
+
+    return b"".join((
+        struct.pack(">4sIBI", b"SCAN", 2, 0, 1),
+        _packed_script_object("SNFO", rng.getrandbits(32), (), base_property_struct),
+        generate_DGRP(dependency_count, seed),
+    ))
+
+
+def _packed_scan_tree_object(rng: random.Random, object_type: str, instance_ID: int, child_IDs) -> bytes:
+    editor_properties = _packed_property_struct(0x255A4580, (
+        _packed_property(0x494E414D, pack_null_terminated_ascii(f"{object_type} {instance_ID:08X}")),
+        _packed_property(0x5846524D, struct.pack(">9f", *(rng.uniform(-100, 100) for i in range(6)), 1.0, 1.0, 1.0)),
+        _packed_property(0x41435456, b"\x01"),
+    ))
+
+    properties = [
+        editor_properties,
+        _packed_property(0x46219BAC, pack_int(rng.getrandbits(32))),
+        _packed_property(0x32698BD6, pack_null_terminated_ascii(f"name_{instance_ID}")),
+    ]
+    if object_type in ("SCSN", "SCIN"):
+        properties.append(_packed_property_struct(0x2DA1EC33, (
+            _packed_property(0xB94E9BE7, pack_int(rng.getrandbits(32))),
+        )))
+    if object_type == "SCIN":
+        properties.append(_packed_property(0x3D326F90, pack_int(rng.choice((0, 4, 9, 12, 15, 24, 29, 32)))))
+    elif object_type == "SCSL":
+        properties.append(_packed_property(0x0261A4E0, pack_int(rng.getrandbits(8))))
+    elif object_type == "SCMN":
+        properties.append(_packed_property(0xA6A874E9, pack_int(rng.getrandbits(32))))
+        for ID in (0x30531924, 0x01BB03B9, 0xA7CC080D, 0x626B3683):
+            properties.append(_packed_property(ID, pack_null_terminated_ascii(f"option_{rng.randrange(100)}")))
+
+    return _packed_script_object(object_type, instance_ID, child_IDs, _packed_property_struct(0xFFFFFFFF, properties))
+
+
+def generate_ScanTree(object_count: int = 200, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    object_types = ("SCND", "SCSN", "SCIN", "SCSL", "SCMN")
+
+    # Every object after the root is attached to an earlier one
+    children = [[] for i in range(object_count)]
+    for i in range(1, object_count):
+        children[rng.randrange(i)].append(0x100000 + i)
+
+    packed_objects = []
+    for i in range(object_count):
+        object_type = "SCND" if i == 0 else object_types[rng.randrange(len(object_types))]
+        packed_objects.append(_packed_scan_tree_object(rng, object_type, 0x100000 + i, children[i]))
+
+    return b"".join((struct.pack(">4sIBI", b"SCAN", 0x100000, 0, object_count), *packed_objects))
+
+
+def generate_PAK(resources, named_resources=()) -> bytes:
+    # resources is a sequence of (asset type, asset ID, payload), named_resources of (asset type, asset ID, name)
+    packed_named_resource_tables = [
+        struct.pack(">4sII", pack_ascii(asset_type), asset_ID, len(name)) + pack_ascii(name)
+        for asset_type, asset_ID, name in named_resources
+    ]
+    tables_size = 12 + sum(map(len, packed_named_resource_tables)) + 4 + 20 * len(resources)
+    padding_size = (32 - (tables_size % 32)) % 32
+
+    payloads = [_aligned_to_32_bytes(payload) for asset_type, asset_ID, payload in resources]
+    offsets = itertools.accumulate(map(len, payloads), initial=tables_size + padding_size)
+
+    return b"".join((
+        struct.pack(">HHII", 3, 5, 0, len(named_resources)),
+        *packed_named_resource_tables,
+        pack_int(len(resources)),
+        *(
+            _RESOURCE_TABLE_STRUCT.pack(0, pack_ascii(asset_type), asset_ID, len(payload), offset)
+            for (asset_type, asset_ID, _), payload, offset in zip(resources, payloads, offsets)
+        ),
+        b"\x00" * padding_size,
+        *payloads,
+    ))
+
+
+def generate_world_PAK(scale="small", seed: int = 0) -> bytes:
+    # A PAK with every implemented resource type, sized like a world PAK when scale is "retail"
+    if isinstance(scale, str):
+        scale = SCALES[scale]
+    rng = random.Random(seed)
+
+    # Raw resources share a few random blocks; their contents don't matter, only their size
+    raw_blocks = [rng.randbytes(scale.raw_resource_size) for i in range(8)]
+
+    asset_IDs = iter(rng.sample(range(0x10000000, 0xF0000000), 1 + scale.strg_count + scale.scan_count
+                                + scale.dgrp_count + scale.raw_resource_count))
+    resources = [
+        ("DUMB", SCAN_TREE_ASSET_ID, generate_ScanTree(scale.scan_tree_object_count, seed)),
+        ("HINT", next(asset_IDs), generate_HINT(scale.hint_count, seed=seed)),
+        *(("STRG", next(asset_IDs), generate_STRG(string_count=scale.strings_per_STRG, seed=seed + i))
+          for i in range(scale.strg_count)),
+        *(("SCAN", next(asset_IDs), generate_SCAN(seed=seed + i)) for i in range(scale.scan_count)),
+        *(("DGRP", next(asset_IDs), generate_DGRP(seed=seed + i)) for i in range(scale.dgrp_count)),
+        *(("TXTR", next(asset_IDs), raw_blocks[i % len(raw_blocks)]) for i in range(scale.raw_resource_count)),
+    ]
+    named_resources = [(resources[2][0], resources[2][1], "WorldStrings"), ("HINT", resources[1][1], "Hints")]
+
+    return generate_PAK(resources, named_resources)
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import aio
+
+
+def _open_descriptors() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 64)
+    return path
+
+
+def test_read_ranges(data_path):
+    ranges = [(0, 4), (300, 2), (16383, 10)]
+    assert asyncio.run(aio.read_ranges(data_path, ranges)) == [b"\x00\x01\x02\x03", b"\x2c\x2d", b"\xff"]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to count descriptors")
+def test_failed_read_waits_for_running_reads(data_path, monkeypatch):
+    # One read fails while another is still running; the descriptor mustn't be closed under the running one
+    read_range = aio._read_range
+    release = threading.Event()
+    results = []
+
+    def slow_or_failing_read(file_descriptor, offset, size):
+        if offset < 0:
+            raise OSError("bad offset")
+        release.wait(5)
+        results.append(read_range(file_descriptor, offset, size))
+        return results[-1]
+
+    monkeypatch.setattr(aio, "_read_range", slow_or_failing_read)
+    descriptors = _open_descriptors()
+    with pytest.raises(OSError, match="bad offset"):
+        asyncio.run(aio.read_ranges(data_path, [(0, 4), (-1, 4)]))
+
+    release.set()
+    for i in range(100):
+        if results and _open_descriptors() == descriptors:
+            break
+        time.sleep(0.01)
+    assert results == [b"\x00\x01\x02\x03"]
+    assert _open_descriptors() == descriptors
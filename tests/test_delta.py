@@ -0,0 +1,63 @@
+import pytest
+
+from delta import PAKDelta, ResourceDeltaKind
+from dgrp import DGRP
+from pak import PAK
+from strg import STRG
+from synth import generate_DGRP, generate_PAK, generate_STRG
+
+
+def test_apply_copies_non_canonical_source_spans():
+    # A DGRP ignores what follows its dependencies, so its span doesn't pack back to the same size
+    packed_DGRP = generate_DGRP(4) + b"\x00" * 64
+    source_packed = generate_PAK((
+        ("DGRP", 0x10000001, packed_DGRP),
+        ("STRG", 0x10000002, generate_STRG(string_count=4)),
+        ("TXTR", 0x10000003, b"\x12" * 100),
+    ))
+    source = PAK.from_packed(source_packed)
+    assert source.resource_tables[0].size != len(DGRP.from_packed(packed_DGRP).packed())
+
+    target = source.with_resource_replaced(1, STRG.from_packed(generate_STRG(string_count=2, seed=1)))
+    delta = PAKDelta.from_PAKs(source, target, source_packed)
+    assert delta.unchanged_asset_IDs == (0x10000001, 0x10000003)
+
+    applied = delta.applied(source_packed)
+    assert len(applied) == delta.resource_tables[-1].offset + delta.resource_tables[-1].size
+
+    result = PAK.from_packed(applied)
+    assert result.resources == target.resources
+    offset = result.resource_tables[0].offset
+    assert applied[offset:offset+len(packed_DGRP)] == packed_DGRP
+
+
+def test_round_trip_through_packed_delta():
+    source_packed = generate_PAK((("DGRP", 0x10000001, generate_DGRP(2)), ("TXTR", 0x10000002, b"\x01" * 33)))
+    source = PAK.from_packed(source_packed)
+    target = source.with_resource_removed(1)
+
+    delta = PAKDelta.from_packed(PAKDelta.from_PAKs(source, target, source_packed).packed())
+    assert delta.removed_asset_IDs == (0x10000002,)
+    assert delta.resource_deltas[0].kind == ResourceDeltaKind.UNCHANGED
+    assert delta.applied(source_packed) == target.packed()
+
+
+def test_apply_rejects_a_different_source_with_the_same_layout():
+    source_packed = generate_PAK((("DGRP", 0x10000001, generate_DGRP(2)), ("TXTR", 0x10000002, b"\x01" * 33)))
+    other_packed = generate_PAK((("DGRP", 0x10000001, generate_DGRP(2)), ("TXTR", 0x10000002, b"\x02" * 33)))
+    source = PAK.from_packed(source_packed)
+    delta = PAKDelta.from_PAKs(source, source.with_resource_removed(0), source_packed)
+
+    with pytest.raises(ValueError, match="0x10000002"):
+        delta.applied(other_packed)
+
+
+def test_only_current_deltas_are_read():
+    source_packed = generate_PAK((("TXTR", 0x10000001, b"\x01" * 33),))
+    source = PAK.from_packed(source_packed)
+    packed = PAKDelta.from_PAKs(source, source, source_packed).packed()
+
+    with pytest.raises(ValueError, match="magic"):
+        PAKDelta.from_packed(b"PAKX" + packed[4:])
+    with pytest.raises(ValueError, match="version 1"):
+        PAKDelta.from_packed(packed[:4] + (1).to_bytes(4, "big") + packed[8:])
@@ -0,0 +1,38 @@
+import dataclasses
+
+import pytest
+
+from pak import PAK
+from synth import generate_world_PAK
+
+
+def test_HINT_can_be_put_back_into_a_PAK():
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    hint = pak.get_resource_by_name("Hints")
+    new_hint = dataclasses.replace(hint.hints[0], name="Replaced")
+    asset_ID = pak.get_named_resource_table_by_name("Hints").asset_ID
+    edited = pak.with_resource_replaced_by_asset_ID(asset_ID, hint.with_hint_replaced(0, new_hint))
+    assert PAK.from_packed(edited.packed()).get_resource_by_name("Hints").hints[0] == new_hint
+
+
+def test_hints_are_found_by_name_room_and_world():
+    hint = PAK.from_packed(generate_world_PAK("tiny")).get_resource_by_name("Hints")
+    first, second = hint.hints[0], hint.hints[1]
+    location = first.locations[0]
+    assert hint.get_hint_by_name(second.name) == second
+    assert hint.get_hints_for_room(location.room_MREA_asset_ID) == (first,)
+    assert hint.get_hints_for_world(location.world_MLVL_asset_ID) == (first,)
+    assert hint.get_hints_for_room(0) == ()
+
+    # The second hint now points to the first one's room twice, and is renamed
+    new_second = dataclasses.replace(second, name="Renamed", locations=(location, location, *second.locations))
+    updated = hint.with_hints_updated({second.name: new_second})
+    assert updated.get_hint_by_name("Renamed") == new_second
+    assert updated.get_hints_for_room(location.room_MREA_asset_ID) == (first, new_second)
+    assert updated.get_hints_for_world(location.world_MLVL_asset_ID) == (first, new_second)
+    with pytest.raises(KeyError):
+        updated.get_hint_by_name(second.name)
+
+    # The original is unchanged
+    assert hint.get_hint_by_name(second.name) == second
+    assert hint.get_hints_for_room(location.room_MREA_asset_ID) == (first,)
@@ -0,0 +1,47 @@
+from dgrp import DGRP, Dependency
+from layout import dependency_groups, optimized_layout
+from pak import PAK
+from synth import generate_world_PAK
+
+
+def _PAK_with_group():
+    # The first DGRP lists the last TXTR and the first STRG, which are stored far from it in table order
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    asset_types = [resource_table.asset_type for resource_table in pak.resource_tables]
+    dgrp_index = asset_types.index("DGRP")
+    dependency_indices = (len(asset_types) - 1 - asset_types[::-1].index("TXTR"), asset_types.index("STRG"))
+    dependencies = tuple(
+        Dependency(pak.resource_tables[index].asset_type, pak.resource_tables[index].asset_ID)
+        for index in dependency_indices
+    )
+    pak = pak.with_resource_replaced(dgrp_index, DGRP(len(dependencies), dependencies))
+    return pak, (dgrp_index, *dependency_indices)
+
+
+def test_payloads_are_stored_in_the_given_order():
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    order = tuple(reversed(range(len(pak.resource_tables))))
+    repacked = PAK.from_packed(pak.packed(order=order))
+
+    assert [table.asset_ID for table in repacked.resource_tables] == [table.asset_ID for table in pak.resource_tables]
+    offsets = [repacked.resource_tables[index].offset for index in order]
+    assert offsets == sorted(offsets)
+    assert repacked.resources == pak.resources
+
+
+def test_optimized_layout_stores_load_groups_together():
+    pak, group = _PAK_with_group()
+    assert dependency_groups(pak) == (group,)
+
+    order, report = optimized_layout(pak)
+    assert order[:len(group)] == group
+    assert sorted(order) == list(range(len(pak.resource_tables)))
+    assert report.group_count == 1
+    assert report.seek_distance_before > 0
+    assert report.seek_distance_after == 0
+
+    repacked = PAK.from_packed(pak.packed(order=order))
+    assert repacked.resources == pak.resources
+    resource_tables = [repacked.resource_tables[index] for index in group]
+    for previous, following in zip(resource_tables, resource_tables[1:]):
+        assert following.offset == previous.offset + previous.size
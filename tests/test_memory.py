@@ -0,0 +1,47 @@
+import json
+import sys
+
+from memory import MemoryReport, deep_size, main
+from pak import PAK
+from synth import generate_world_PAK
+
+
+def test_deep_size_counts_shared_objects_once():
+    shared = ["shared"] * 10
+    seen = set()
+    first = deep_size((shared, shared), seen)
+    assert first == sys.getsizeof((shared, shared)) + sys.getsizeof(shared) + sys.getsizeof("shared")
+    assert deep_size(shared, seen) == 0
+
+
+def test_report_covers_every_resource_once():
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    index = next(index for index, table in enumerate(pak.resource_tables) if table.asset_type == "DGRP")
+    pak = pak.with_resource_appended(0x10000001, pak.resources[index], "Copy")
+    report = MemoryReport.from_PAK(pak)
+
+    assert [(resource.asset_ID, resource.packed_size) for resource in report.resources] == [
+        (table.asset_ID, table.size) for table in pak.resource_tables
+    ]
+    assert report.resources[index].memory_size > 0
+    # The copy is the same object, so it was already counted
+    assert report.resources[-1].memory_size == 0
+    assert report.total.count == len(pak.resource_tables) + 1
+    assert report.total.memory_size == sum(resource.memory_size for resource in report.resources) \
+        + report.class_entries["PAK"].memory_size
+    assert report.class_entries["DGRP"].count == 3
+
+
+def test_report_is_compared_with_a_previous_run(tmp_path, capsys):
+    path = tmp_path / "World.pak"
+    path.write_bytes(generate_world_PAK("tiny"))
+    output = tmp_path / "report.json"
+
+    assert main([str(path), "--output", str(output)]) == 0
+    previous = json.loads(output.read_text())
+    assert previous["classes"]["STRG"]["count"] == 4
+    assert "previous" not in capsys.readouterr().out
+
+    assert main([str(path), "--compare", str(output)]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert next(line for line in lines if line.startswith("STRG ")).endswith("x previous")
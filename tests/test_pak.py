@@ -0,0 +1,181 @@
+import dataclasses
+import gc
+import io
+import weakref
+
+import pytest
+
+import pak as pak_module
+from dgrp import DGRP
+from pak import PAK, PAKHeader, RoundTripError, RoundTripMismatch
+from pvector import PersistentVector
+from synth import generate_DGRP, generate_world_PAK
+
+
+def test_PAK_built_from_tuples_can_be_edited():
+    pak = PAK(3, 5, 0, 0, (), 0, (), ())
+    dgrp = DGRP.from_packed(generate_DGRP(3))
+    pak = pak.with_resource_appended(0x10000001, dgrp, "Group")
+    assert isinstance(pak.resource_tables, PersistentVector)
+    assert PAK.from_packed(pak.packed()).get_resource_by_name("Group") == dgrp
+
+
+def test_edits_round_trip():
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    dgrp = DGRP.from_packed(generate_DGRP(2, seed=1))
+    edited = pak.with_resource_removed(3).with_resource_inserted(1, 0x10000001, dgrp, "New")
+    edited = edited.with_resource_replaced_by_asset_ID(0x10000001, DGRP.from_packed(generate_DGRP(5, seed=2)))
+
+    repacked = PAK.from_packed(edited.packed())
+    assert repacked == edited
+    assert repacked.get_resource_by_name("New").packed_size == 4 + 8*5
+    assert len(repacked.resources) == len(pak.resources)
+
+
+def test_parsing_with_workers_matches_serial(monkeypatch):
+    # The workers are capped at the usable CPUs, which would make this serial on a single-CPU machine
+    monkeypatch.setattr(pak_module, "_usable_cpu_count", lambda: 4)
+    decoded_in_parallel = PAK._decoded_resources_in_parallel.__func__
+    worker_counts = []
+
+    def recording_decoded_resources_in_parallel(cls, packed, header, workers):
+        worker_counts.append(workers)
+        return decoded_in_parallel(cls, packed, header, workers)
+
+    monkeypatch.setattr(PAK, "_decoded_resources_in_parallel", classmethod(recording_decoded_resources_in_parallel))
+    packed = generate_world_PAK("tiny")
+    assert PAK.from_packed(packed, workers=2) == PAK.from_packed(packed)
+    assert worker_counts == [2]
+
+
+def _rebuilt_indexes(pak: PAK):
+    rebuilt = PAK(*(getattr(pak, field.name) for field in dataclasses.fields(pak)))
+    return rebuilt._name_to_index_map, rebuilt._asset_to_names_map
+
+
+def test_name_indexes_are_carried_through_edits():
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    asset_IDs = [resource_table.asset_ID for resource_table in pak.resource_tables]
+    dgrp = DGRP.from_packed(generate_DGRP(1))
+
+    edits = (
+        lambda pak: pak.with_resource_named(asset_IDs[3], "Third"),
+        lambda pak: pak.with_resource_named(asset_IDs[4], "Fourth"),
+        lambda pak: pak.with_resource_named(asset_IDs[3], "Also third"),
+        lambda pak: pak.with_resource_named(asset_IDs[5], "Third"),
+        lambda pak: pak.with_name_removed("WorldStrings"),
+        lambda pak: pak.with_resource_replaced_by_asset_ID(asset_IDs[4], dgrp),
+        lambda pak: pak.with_resource_inserted(0, 0x10000001, dgrp, "Inserted"),
+        lambda pak: pak.with_resource_removed_by_asset_ID(asset_IDs[3]),
+    )
+    for edit in edits:
+        pak = edit(pak)
+        assert (pak._name_to_index_map, pak._asset_to_names_map) == _rebuilt_indexes(pak)
+
+    assert pak.get_names_for_asset("DGRP", asset_IDs[4]) == ("Fourth",)
+    assert pak.get_resource_by_name("Third") == pak.get_resource_by_asset_ID(asset_IDs[5])
+
+
+def test_replaced_payloads_are_laid_out_aligned():
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    # 4 + 8*2 and 4 + 8*3 bytes, neither a multiple of 32
+    edited = pak.with_resource_replaced(3, DGRP.from_packed(generate_DGRP(2)))
+    edited = edited.with_resource_replaced(3, DGRP.from_packed(generate_DGRP(3)))
+    assert PAK.from_packed(edited.packed()).resources == edited.resources
+
+
+def test_verify_reports_resources_that_pack_differently(monkeypatch):
+    pak = PAK.from_packed(generate_world_PAK("tiny"), verify=True)
+    assert pak.verify_round_trip() == ()
+    pak.packed(verify=True)
+
+    # SCANs pack their dependencies as a DGRP, so they don't round-trip either
+    expected_mismatches = tuple(
+        RoundTripMismatch(table.asset_ID, table.asset_type)
+        for table in pak.resource_tables if table.asset_type in ("SCAN", "DGRP")
+    )
+    packed_DGRP = DGRP.packed
+    monkeypatch.setattr(DGRP, "packed", lambda self: packed_DGRP(self) + b"\x00")
+    with pytest.raises(RoundTripError) as error:
+        pak.packed(verify=True)
+    assert error.value.mismatches == expected_mismatches
+
+    # Replaced resources aren't checked, and aren't kept alive for checking
+    index = pak.resource_tables.index(next(table for table in pak.resource_tables if table.asset_type == "DGRP"))
+    replaced_resource = weakref.ref(pak.resources[index])
+    edited = pak.with_resource_replaced(index, DGRP.from_packed(generate_DGRP(2)))
+    del pak, error
+    gc.collect()
+    assert replaced_resource() is None
+    assert edited.verify_round_trip() == tuple(
+        mismatch for mismatch in expected_mismatches if mismatch.asset_ID != edited.resource_tables[index].asset_ID
+    )
+
+
+def test_dedupe_stores_identical_payloads_once():
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    index = next(index for index, table in enumerate(pak.resource_tables) if table.asset_type == "DGRP")
+    pak = pak.with_resource_appended(0x10000001, pak.resources[index], "Copy")
+
+    packed = pak.packed()
+    deduped = pak.packed(dedupe=True)
+    assert len(deduped) == len(packed) - pak.laid_out().resource_tables[-1].size
+
+    repacked = PAK.from_packed(deduped)
+    assert repacked.resource_tables[-1].offset == repacked.resource_tables[index].offset
+    assert repacked.resources == pak.resources
+    assert PAK.from_packed(packed).resources == pak.resources
+
+
+def test_tables_can_be_read_without_the_resources(tmp_path):
+    packed = generate_world_PAK("tiny")
+    pak = PAK.from_packed(packed)
+    path = tmp_path / "World.pak"
+    path.write_bytes(packed)
+
+    with open(path, "rb") as file:
+        from_file = PAK.read_tables(file)
+    for header in (PAK.read_tables(path), PAK.read_tables(str(path)), PAK.read_tables(packed), from_file):
+        assert isinstance(header, PAKHeader)
+        assert header.named_resource_tables == tuple(pak.named_resource_tables)
+        assert header.resource_tables == tuple(pak.resource_tables)
+
+    # Offsets are relative to where the file was when reading started
+    prefixed = io.BytesIO(b"\xff" * 7 + packed)
+    prefixed.seek(7)
+    assert PAKHeader.from_file(prefixed) == from_file
+
+
+class _RecordingFile(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append((self.tell(), size))
+        return super().read(size)
+
+
+def test_iter_resources_only_reads_the_requested_types(tmp_path):
+    packed = generate_world_PAK("tiny")
+    pak = PAK.from_packed(packed)
+    path = tmp_path / "World.pak"
+    path.write_bytes(packed)
+    types = {"DGRP", "STRG"}
+    expected = [
+        (table.asset_ID, table.asset_type, resource)
+        for table, resource in zip(pak.resource_tables, pak.resources) if table.asset_type in types
+    ]
+
+    file = _RecordingFile(packed)
+    for source in (path, packed, file):
+        assert list(PAK.iter_resources(source, types)) == expected
+    # Past the tables, only the payloads of the requested types are read
+    header_reads, payload_reads = file.reads[0], file.reads[1:]
+    assert header_reads[0] == 0
+    assert payload_reads == [(table.offset, table.size) for table in pak.resource_tables if table.asset_type in types]
+
+    assert list(PAK.iter_resources(path, {"SCAN"}, decode=False)) == [
+        (table.asset_ID, "SCAN", packed[table.offset:table.offset+table.size])
+        for table in pak.resource_tables if table.asset_type == "SCAN"
+    ]
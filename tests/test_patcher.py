@@ -0,0 +1,58 @@
+import json
+
+from pak import PAK
+from patcher import main
+from synth import SCAN_TREE_ASSET_ID, generate_world_PAK
+
+
+def _spec(pak: PAK) -> dict:
+    scan_asset_ID = next(table.asset_ID for table in pak.resource_tables if table.asset_type == "SCAN")
+    return {"paks": {"World.pak": {
+        "strings": [{"resource": "WorldStrings", "name": "string_4", "language": "ENGL", "text": "Patched"},
+                    {"resource": "WorldStrings", "index": 1, "text": "Everywhere"}],
+        "scans": [{"resource": f"0x{scan_asset_ID:08X}", "set": {"logbook_scale": 2.0, "important": True}}],
+        "scan_tree": [{"instance_ID": "0x00100001", "set": {"editor_properties.name": "Patched object"}}],
+        "hints": [{"resource": "Hints", "hint": "Hint0_LuminothEnergy", "set": {"normal_time": 12.5}}],
+    }}}
+
+
+def _run(tmp_path, capsys, spec: dict) -> str:
+    (tmp_path / "spec.json").write_text(json.dumps(spec))
+    assert main([str(tmp_path / "spec.json"), str(tmp_path / "in"), str(tmp_path / "out"), "--workers", "1"]) == 0
+    return capsys.readouterr().out
+
+
+def test_patcher_applies_every_edit_kind_and_caches_the_result(tmp_path, capsys):
+    (tmp_path / "in").mkdir()
+    pak = PAK.from_packed(generate_world_PAK("tiny"))
+    (tmp_path / "in" / "World.pak").write_bytes(pak.packed())
+    (tmp_path / "in" / "Other.pak").write_bytes(generate_world_PAK("tiny", seed=1))
+    spec = _spec(pak)
+
+    output = _run(tmp_path, capsys, spec)
+    assert "World.pak: patched" in output and "Other.pak: copied" in output
+
+    patched = PAK.from_packed((tmp_path / "out" / "World.pak").read_bytes())
+    strg = patched.get_resource_by_name("WorldStrings")
+    string_index = strg.name_table.get_string_index_for_name("string_4")
+    assert strg.get_string_table_by_language_ID("ENGL").strings[string_index] == "Patched"
+    assert {string_table.strings[1] for string_table in strg.string_tables} == {"Everywhere"}
+    scan_info = patched.get_resource_by_asset_ID(int(spec["paks"]["World.pak"]["scans"][0]["resource"], 16)) \
+        .scannable_object_info
+    assert (scan_info.logbook_scale, scan_info.important) == (2.0, True)
+    scan_tree = patched.get_resource_by_asset_ID(SCAN_TREE_ASSET_ID)
+    assert scan_tree.objects[1].editor_properties.name == "Patched object"
+    assert patched.get_resource_by_name("Hints").get_hint_by_name("Hint0_LuminothEnergy").normal_time == 12.5
+
+    assert _run(tmp_path, capsys, spec) == "Other.pak: up to date\nWorld.pak: up to date\n"
+
+    # A changed spec or a changed input rebuilds only that PAK
+    spec["paks"]["World.pak"]["hints"][0]["set"]["normal_time"] = 20.0
+    assert _run(tmp_path, capsys, spec).startswith("Other.pak: up to date\nWorld.pak: patched")
+    patched = PAK.from_packed((tmp_path / "out" / "World.pak").read_bytes())
+    assert patched.get_resource_by_name("Hints").get_hint_by_name("Hint0_LuminothEnergy").normal_time == 20.0
+
+    (tmp_path / "in" / "World.pak").write_bytes(pak.with_resource_removed(len(pak.resources) - 1).packed())
+    assert _run(tmp_path, capsys, spec).startswith("Other.pak: up to date\nWorld.pak: patched")
+    patched = PAK.from_packed((tmp_path / "out" / "World.pak").read_bytes())
+    assert len(patched.resources) == len(pak.resources) - 1
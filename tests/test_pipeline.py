@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from pak import PAK
+from pipeline import run_pipeline
+from synth import generate_world_PAK
+
+
+def _unchanged(pak: PAK) -> PAK:
+    return pak
+
+
+def _written_PAK(path) -> str:
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(generate_world_PAK("tiny"))
+    return str(path)
+
+
+def test_PAKs_are_submitted_before_the_timings_are_read(tmp_path):
+    input_path = _written_PAK(tmp_path / "in" / "World.pak")
+    output_path = tmp_path / "out" / "World.pak"
+
+    with run_pipeline([input_path], _unchanged, str(tmp_path / "out"), workers=1) as timings:
+        deadline = time.monotonic() + 30
+        while not output_path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert output_path.exists()
+
+        assert [timing.output_path for timing in timings] == [str(output_path)]
+    assert PAK.from_packed(output_path.read_bytes()) == PAK.from_packed(generate_world_PAK("tiny"))
+
+
+def test_inputs_with_the_same_file_name_are_rejected(tmp_path):
+    input_paths = [_written_PAK(tmp_path / "a" / "World.pak"), _written_PAK(tmp_path / "b" / "World.pak")]
+    with pytest.raises(ValueError, match="would both be written to"):
+        run_pipeline(input_paths, _unchanged, str(tmp_path / "out"), workers=1)
+    assert not os.path.exists(tmp_path / "out")
+
+
+def test_closing_a_run_shuts_the_workers_down(tmp_path):
+    input_paths = [_written_PAK(tmp_path / "in" / f"World{i}.pak") for i in range(3)]
+    run = run_pipeline(input_paths, _unchanged, str(tmp_path / "out"), workers=1)
+    assert multiprocessing.active_children()
+    with run:
+        pass
+    assert not multiprocessing.active_children()
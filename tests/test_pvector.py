@@ -0,0 +1,15 @@
+from pvector import PersistentVector
+
+
+def test_edits_leave_the_original_unchanged():
+    vector = PersistentVector(range(200))
+    edited = vector.insert(100, "a").delete(0).set(-1, "b")
+    assert tuple(vector) == tuple(range(200))
+    assert tuple(edited) == (*range(1, 100), "a", *range(100, 199), "b")
+
+
+def test_concatenation_with_tuples():
+    vector = PersistentVector((2, 3))
+    assert vector + (4,) == (2, 3, 4)
+    assert (1,) + vector == (1, 2, 3)
+    assert isinstance((1,) + vector, PersistentVector)
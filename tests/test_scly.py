@@ -0,0 +1,77 @@
+import enum
+import struct
+
+import pytest
+
+from scan import SCAN
+from scly_common import Property, PropertyStruct
+from scly_schema import FieldSchema, Schema, compile_field_decoder, compile_field_encoders
+from synth import generate_SCAN, generate_ScanTree
+from tree import ScanTree
+
+
+def test_with_field_keeps_sizes_right():
+    scan_tree = ScanTree.from_packed(generate_ScanTree(4))
+    object_ = scan_tree.objects[1]
+    edited = object_.with_field("name_string_name", object_.name_string_name + "x" * 20)
+    assert edited.instance_size == object_.instance_size + 20
+    assert edited.packed_size == len(edited.packed())
+
+    editor_properties = edited.editor_properties.with_field("name", "A longer editor name")
+    edited = edited.with_property_replaced(editor_properties)
+    assert edited.base_property_struct.size + 6 == edited.base_property_struct.packed_size
+    assert edited.instance_size + 6 == len(edited.packed())
+    assert type(object_).from_packed(edited.packed()) == edited
+
+
+def _packed_struct(ID: int, packed_subproperties) -> bytes:
+    body = struct.pack(">H", len(packed_subproperties)) + b"".join(packed_subproperties)
+    return struct.pack(">IH", ID, len(body)) + body
+
+
+def test_unlisted_properties_are_opaque():
+    # AnimationParameters-like data happens to read as a list of one property
+    animation_parameters = struct.pack(">IIi", 0x0001ABCD, 4, 0)
+    packed = _packed_struct(0xFFFFFFFF, (struct.pack(">IH", 0x12345678, 12) + animation_parameters,))
+
+    subproperty = PropertyStruct.from_packed(packed).subproperties[0]
+    assert type(subproperty) is Property and subproperty.data == animation_parameters
+
+    PropertyStruct.detect_unlisted_structs = True
+    try:
+        assert type(PropertyStruct.from_packed(packed).subproperties[0]) is PropertyStruct
+    finally:
+        PropertyStruct.detect_unlisted_structs = False
+
+
+def test_enum_names_are_looked_up_when_decoding():
+    schema = Schema("Late", {}, (FieldSchema("slot", "enum", (0x3D326F90,), enum="LateEnum"),))
+    namespace = {}
+    decode_fields = compile_field_decoder(schema, False, namespace)
+
+    class LateEnum(enum.Enum):
+        A = 1
+        B = 2
+
+    namespace["LateEnum"] = LateEnum
+    property_struct = PropertyStruct(0xFFFFFFFF, 0, 0, (Property(0x3D326F90, 4, struct.pack(">I", 2)),))
+    decode_fields(property_struct)
+    assert property_struct.slot is LateEnum.B
+
+
+def test_SCAN_fields_are_set_independently():
+    scan = SCAN.from_packed(generate_SCAN())
+    scan_info = scan.scannable_object_info
+    edited = scan_info.with_field("important", not scan_info.important)
+    assert edited.important is not scan_info.important
+    assert edited.slow == scan_info.slow
+    assert type(scan_info).from_packed(edited.packed()) == edited
+
+
+def test_fields_sharing_a_property_are_rejected():
+    schema = Schema("Aliased", {}, (
+        FieldSchema("first", "int", (0x12345678,)),
+        FieldSchema("second", "bool32", (0x12345678,)),
+    ))
+    with pytest.raises(ValueError, match="Aliased.first and Aliased.second"):
+        compile_field_encoders(schema)
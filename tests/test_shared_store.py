@@ -0,0 +1,18 @@
+from dgrp import DGRP
+from pak import PAK
+from profiling import Profiler
+from shared_store import SharedPAKStore
+from synth import generate_DGRP, generate_world_PAK
+
+
+def test_packing_a_view_profiles_only_the_edited_resources():
+    packed = generate_world_PAK("tiny")
+    with SharedPAKStore.create({"World.pak": packed}) as store:
+        pak = store.get_PAK("World.pak")
+        dgrp = DGRP.from_packed(generate_DGRP(3))
+        edited = pak.with_resource_replaced(3, dgrp)
+        with Profiler(trace=False) as profiler:
+            repacked = edited.packed()
+
+        assert [(key, entry.calls) for key, entry in profiler.entries.items()] == [(("", "DGRP", "packed"), 1)]
+        assert PAK.from_packed(repacked) == PAK.from_packed(packed).with_resource_replaced(3, dgrp)
@@ -0,0 +1,24 @@
+from strg import StringTable, STRG
+from synth import generate_STRG
+
+
+def test_string_table_built_from_tuples_can_be_edited():
+    string_table = StringTable(2, (8, 12), ("a", "b"))
+    assert tuple(string_table.with_string_replaced(0, "x").strings) == ("x", "b")
+    assert string_table.strings == ("a", "b")
+
+
+def test_string_replacement_round_trips():
+    strg = STRG.from_packed(generate_STRG(language_count=2, string_count=5))
+    string_table = strg.string_tables[1].with_string_replaced(3, "Replaced")
+    repacked = STRG.from_packed(strg.with_string_table_replaced(1, string_table).packed())
+    assert repacked.string_tables[1].strings[3] == "Replaced"
+    assert repacked.string_tables[0] == strg.string_tables[0]
+
+
+def test_replacing_a_string_table_keeps_the_later_ones_in_place():
+    strg = STRG.from_packed(generate_STRG(language_count=3, string_count=5))
+    string_table = strg.string_tables[0].with_string_replaced(2, "A replacement longer than the string it replaces")
+    repacked = STRG.from_packed(strg.with_string_table_replaced(0, string_table).packed())
+    assert repacked.string_tables[0].strings[2] == "A replacement longer than the string it replaces"
+    assert repacked.string_tables[1:] == strg.string_tables[1:]
@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+from pak import PAK
+from strg_index import StringIndex
+from synth import generate_world_PAK
+
+
+def test_PAKs_with_the_same_file_name_are_kept_apart(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "out").mkdir()
+    (tmp_path / "in" / "World.pak").write_bytes(generate_world_PAK("tiny", seed=1))
+    (tmp_path / "out" / "World.pak").write_bytes(generate_world_PAK("tiny", seed=2))
+
+    index = StringIndex()
+    index.update_from_PAK(str(tmp_path / "in" / "World.pak"))
+    index.update_from_PAK(tmp_path / "out" / "." / "World.pak")
+    pak_names = {pak_name for pak_name, asset_ID in index.entries}
+    assert pak_names == {str(tmp_path / "in" / "World.pak"), str(tmp_path / "out" / "World.pak")}
+
+
+def test_PAKs_without_a_path_need_a_name():
+    packed = generate_world_PAK("tiny")
+    index = StringIndex()
+    with pytest.raises(ValueError, match="pak_name"):
+        index.update_from_PAK(packed)
+    with pytest.raises(ValueError, match="pak_name"):
+        index.update_from_PAK(io.BytesIO(packed))
+
+    assert index.update_from_PAK(packed, "World.pak") > 0
+    assert {pak_name for pak_name, asset_ID in index.entries} == {"World.pak"}
+
+
+def test_relative_paths_are_kept_under_absolute_paths(tmp_path, monkeypatch):
+    (tmp_path / "World.pak").write_bytes(generate_world_PAK("tiny"))
+    monkeypatch.chdir(tmp_path)
+    index = StringIndex()
+    index.update_from_PAK("World.pak")
+    assert {pak_name for pak_name, asset_ID in index.entries} == {str(tmp_path / "World.pak")}
+
+
+def test_updates_patch_the_search_lookup():
+    index = StringIndex()
+    index.update_from_PAK(generate_world_PAK("tiny", seed=1), "First.pak")
+    index.update_from_PAK(generate_world_PAK("tiny", seed=2), "Second.pak")
+    assert index.search("dark")
+    token_postings = index._token_postings
+
+    # One STRG changes and another is removed
+    pak = PAK.from_packed(generate_world_PAK("tiny", seed=2))
+    strg_indices = [index for index, table in enumerate(pak.resource_tables) if table.asset_type == "STRG"]
+    replacement = pak.resources[strg_indices[1]]
+    pak = pak.with_resource_replaced(strg_indices[0], replacement).with_resource_removed(strg_indices[1])
+    assert index.update_from_PAK(pak.packed(), "Second.pak") == 1
+    assert index._token_postings is token_postings
+
+    rebuilt = StringIndex(dict(index.entries))
+    rebuilt._build_lookup()
+    assert index._token_postings == rebuilt._token_postings
+    assert index._sorted_tokens == rebuilt._sorted_tokens
+    assert index.search("s", prefix=True) == rebuilt.search("s", prefix=True)
@@ -0,0 +1,15 @@
+import array
+
+from util import Vector, VectorArray
+
+
+def test_transforms_match_per_value_arithmetic():
+    vectors = VectorArray(array.array("f", (1.5, -2.25)), array.array("f", (0.1, 1e6)), array.array("f", (3.0, 7.0)))
+    translated = vectors.translated(Vector(0.3, -1.7, 0.0))
+    scaled = vectors.scaled(Vector(2.1, 1.0, -0.5))
+
+    assert translated.x == array.array("f", [value + 0.3 for value in vectors.x])
+    assert translated.y == array.array("f", [value - 1.7 for value in vectors.y])
+    assert scaled.x == array.array("f", [value * 2.1 for value in vectors.x])
+    assert scaled.z == array.array("f", [value * -0.5 for value in vectors.z])
+    assert translated.z is vectors.z and scaled.y is vectors.y
@@ -2,15 +2,19 @@
 # http://www.metroid2002.com/retromodding/wiki/TREE_(File_Format),
 # https://gist.github.com/Antidote/70bd02369598e5ceb1210faf61bf1467
 
+import array
 import dataclasses
 import enum
 import struct
 
-from scly_common import Property, PropertyStruct, ScriptObject
-from util import unpack_bool, unpack_int, unpack_ascii, unpack_null_terminated_ascii, pack_ascii, Vector
+import profiling
+from pvector import PersistentVector, persistent
+from scly_common import PropertyStruct, ScriptObject
+from util import unpack_ascii, unpack_float_array, pack_ascii, pack_float_array, Vector, VectorArray
 
 __all__ = (
     "EditorProperties",
+    "TransformArray",
     "ScannableParameters",
     "InventorySlot",
     "SCND",
@@ -31,27 +35,69 @@ class EditorProperties(PropertyStruct):
     scale: Vector = dataclasses.field(init=False)
     active: bool = dataclasses.field(init=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-
-        self._set_fields_from_subproperty_data(
-            ("name",        0x494E414D, unpack_null_terminated_ascii),
-            ("translation", 0x5846524D, lambda data: Vector.from_packed(data[:12])),
-            ("rotation",    0x5846524D, lambda data: Vector.from_packed(data[12:24])),
-            ("scale",       0x5846524D, lambda data: Vector.from_packed(data[24:])),
-            ("active",      0x41435456, unpack_bool),
+
+@dataclasses.dataclass(frozen=True)
+class TransformArray:
+    # Translation, rotation and scale of many objects at once, read from and written back to the packed 0x5846524D
+    # transform properties in a single pass
+    translations: VectorArray
+    rotations: VectorArray
+    scales: VectorArray
+
+    @classmethod
+    def from_packed(cls, packed: bytes):
+        components = unpack_float_array(packed)
+        return cls(
+            VectorArray.from_components(components, 9, 0),
+            VectorArray.from_components(components, 9, 3),
+            VectorArray.from_components(components, 9, 6),
+        )
+
+    @classmethod
+    def from_objects(cls, objects):
+        return cls.from_packed(b"".join(
+            object_.editor_properties.get_subproperty_by_ID(0x5846524D).data for object_ in objects
+        ))
+
+    def __len__(self) -> int:
+        return len(self.translations)
+
+    def packed(self) -> bytes:
+        components = array.array("f", bytes(36 * len(self)))
+        self.translations.interleaved_into(components, 9, 0)
+        self.rotations.interleaved_into(components, 9, 3)
+        self.scales.interleaved_into(components, 9, 6)
+        return pack_float_array(components)
+
+    def translated(self, offset: Vector):
+        return dataclasses.replace(self, translations=self.translations.translated(offset))
+
+    def scaled(self, factor: Vector):
+        return dataclasses.replace(
+            self,
+            translations=self.translations.scaled(factor),
+            scales=self.scales.scaled(factor),
         )
 
+    def bounding_box(self) -> tuple:
+        return self.translations.bounding_box()
+
+    def objects_with_transforms_applied(self, objects) -> tuple:
+        packed = self.packed()
+        new_objects = []
+        for i, object_ in enumerate(objects):
+            transform_property = object_.editor_properties.get_subproperty_by_ID(0x5846524D)
+            new_transform_property = dataclasses.replace(transform_property, data=packed[36*i:36*(i+1)])
+            new_objects.append(object_.with_property_replaced(
+                object_.editor_properties.with_subproperty_replaced(new_transform_property)
+            ))
+        return tuple(new_objects)
+
 
 @dataclasses.dataclass(frozen=True)
 class ScannableParameters(PropertyStruct):
     SCAN_asset_ID: int = dataclasses.field(init=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-
-        self._set_fields_from_subproperty_data(("SCAN_asset_ID", 0xB94E9BE7, unpack_int))
-
 
 class InventorySlot(enum.Enum):
     POWER_BEAM = 0
@@ -111,20 +157,6 @@ class ScanTreeScriptObject(ScriptObject):
     name_string_STRG_asset_ID: int = dataclasses.field(init=False)
     name_string_name: str = dataclasses.field(init=False)
 
-    def __post_init__(self):
-        object.__setattr__(self, "editor_properties", self.base_property_struct.get_subproperty_by_ID(0x255A4580))
-        self._set_fields_from_property_data(
-            ("name_string_STRG_asset_ID", 0x46219BAC, unpack_int),
-            ("name_string_name",          0x32698BD6, unpack_null_terminated_ascii),
-        )
-
-    @classmethod
-    def from_packed(cls, packed: bytes):
-        return super().from_packed(packed, {
-            0x255A4580: EditorProperties,
-            0x2DA1EC33: ScannableParameters,
-        })
-
 
 @dataclasses.dataclass(frozen=True)
 class SCND(ScanTreeScriptObject):
@@ -135,35 +167,17 @@ class SCND(ScanTreeScriptObject):
 class SCSN(ScanTreeScriptObject):
     scannable_parameters: ScannableParameters = dataclasses.field(init=False, repr=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-
-        object.__setattr__(self, "scannable_parameters", self.base_property_struct.get_subproperty_by_ID(0x2DA1EC33))
-
 
 @dataclasses.dataclass(frozen=True)
 class SCIN(ScanTreeScriptObject):
     inventory_slot: InventorySlot = dataclasses.field(init=False)
     scannable_parameters: ScannableParameters = dataclasses.field(init=False, repr=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-
-        self._set_fields_from_property_data(
-            ("inventory_slot", 0x3D326F90, lambda packed: InventorySlot(unpack_int(packed))),
-        )
-        object.__setattr__(self, "scannable_parameters", self.base_property_struct.get_subproperty_by_ID(0x2DA1EC33))
-
 
 @dataclasses.dataclass(frozen=True)
 class SCSL(ScanTreeScriptObject):
     unknown: int = dataclasses.field(init=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-
-        self._set_fields_from_property_data(("unknown", 0x0261A4E0, unpack_int))
-
 
 @dataclasses.dataclass(frozen=True)
 class SCMN(ScanTreeScriptObject):
@@ -173,17 +187,6 @@ class SCMN(ScanTreeScriptObject):
     option_3_string_name: str = dataclasses.field(init=False)
     option_4_string_name: str = dataclasses.field(init=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-
-        self._set_fields_from_property_data(
-            ("menu_options_STRG_asset_ID", 0xA6A874E9, unpack_int),
-            ("option_1_string_name", 0x30531924, unpack_null_terminated_ascii),
-            ("option_2_string_name", 0x01BB03B9, unpack_null_terminated_ascii),
-            ("option_3_string_name", 0xA7CC080D, unpack_null_terminated_ascii),
-            ("option_4_string_name", 0x626B3683, unpack_null_terminated_ascii),
-        )
-
 
 @dataclasses.dataclass(frozen=True)
 class ScanTree:
@@ -201,23 +204,35 @@ class ScanTree:
     magic: str
     root_node_instance_ID: int
     unknown: int
-    object_count: int
+    object_count: int = dataclasses.field(compare=False)
     objects: tuple = dataclasses.field(repr=False)
 
+    def __post_init__(self):
+        object.__setattr__(self, "objects", persistent(self.objects))
+
     @classmethod
     def from_packed(cls, packed: bytes):
         magic, root_node_instance_ID, unknown, object_count = cls._struct.unpack(packed[:13])
 
+        profiler = profiling.active
         offset = 13
         objects = []
         for i in range(object_count):
             object_type = unpack_ascii(packed[offset:offset+4])
-            object_ = cls._script_object_classes[object_type].from_packed(packed[offset:])
+            object_class = cls._script_object_classes[object_type]
+            object_size = 6 + int.from_bytes(packed[offset+4:offset+6], "big")
+            if profiler is None:
+                object_ = object_class.from_packed(packed[offset:offset+object_size])
+            else:
+                object_ = profiler.call(
+                    object_class, "from_packed", object_size, object_class.from_packed,
+                    packed[offset:offset+object_size],
+                )
 
             objects.append(object_)
-            offset += object_.packed_size
+            offset += object_size
 
-        return cls(unpack_ascii(magic), root_node_instance_ID, unknown, object_count, tuple(objects))
+        return cls(unpack_ascii(magic), root_node_instance_ID, unknown, object_count, PersistentVector(objects))
 
     @property
     def packed_size(self) -> int:
@@ -225,12 +240,22 @@ class ScanTree:
 
     def packed(self) -> bytes:
         return b"".join((
-            self._struct.pack(pack_ascii(self.magic), self.root_node_instance_ID, self.unknown, self.object_count),
+            self._struct.pack(pack_ascii(self.magic), self.root_node_instance_ID, self.unknown, len(self.objects)),
             *(object_.packed() for object_ in self.objects),
         ))
 
     def with_object_replaced(self, index: int, new_object: ScanTreeScriptObject):
-        return dataclasses.replace(self, objects=(*self.objects[:index], new_object, *self.objects[index+1:]))
+        return dataclasses.replace(self, objects=self.objects.set(index, new_object))
+
+    @property
+    def transforms(self) -> TransformArray:
+        return TransformArray.from_objects(self.objects)
+
+    def with_transforms(self, transforms: TransformArray):
+        return dataclasses.replace(
+            self,
+            objects=PersistentVector(transforms.objects_with_transforms_applied(self.objects)),
+        )
 
     def with_object_appended(self, new_object: ScanTreeScriptObject):
-        return dataclasses.replace(self, object_count=self.object_count+1, objects=self.objects+(new_object,))
\ No newline at end of file
+        return dataclasses.replace(self, objects=self.objects.append(new_object))
\ No newline at end of file
@@ -1,6 +1,12 @@
+import array
+import collections.abc
 import dataclasses
 import functools
+import importlib
+import itertools
+import operator
 import struct
+import sys
 
 __all__ = (
     "unpack_bool",
@@ -10,11 +16,15 @@ __all__ = (
     "unpack_ascii",
     "unpack_null_terminated_ascii",
     "unpack_null_terminated_utf_16",
+    "unpack_float_array",
     "pack_int",
     "pack_ascii",
     "pack_null_terminated_ascii",
     "pack_null_terminated_utf_16",
+    "pack_float_array",
     "Vector",
+    "VectorArray",
+    "LazyRegistry",
 )
 
 BOOL_STRUCT  = struct.Struct(">?")
@@ -36,7 +46,7 @@ def unpack_float(packed: bytes) -> float:
     return FLOAT_STRUCT.unpack(packed)[0]
 
 def unpack_ascii(packed: bytes):
-    return packed.decode("ascii")
+    return str(packed, "ascii")
 
 def unpack_null_terminated_ascii(packed: bytes) -> str:
     return packed[:-1].decode("ascii")
@@ -44,6 +54,13 @@ def unpack_null_terminated_ascii(packed: bytes) -> str:
 def unpack_null_terminated_utf_16(packed: bytes) -> str:
     return packed[:-2].decode("utf-16-be")
 
+def unpack_float_array(packed: bytes) -> array.array:
+    floats = array.array("f")
+    floats.frombytes(packed)
+    if sys.byteorder == "little":
+        floats.byteswap()
+    return floats
+
 
 # Packing
 def pack_int(integer: int) -> bytes:
@@ -58,6 +75,12 @@ def pack_null_terminated_ascii(string: str) -> bytes:
 def pack_null_terminated_utf_16(string: str) -> bytes:
     return string.encode("utf-16-be") + b"\x00\x00"
 
+def pack_float_array(floats: array.array) -> bytes:
+    if sys.byteorder == "little":
+        floats = array.array("f", floats)
+        floats.byteswap()
+    return floats.tobytes()
+
 
 # Data types
 @dataclasses.dataclass(frozen=True)
@@ -77,4 +100,127 @@ class Vector:
         return len(self.packed())
 
     def packed(self) -> bytes:
-        return self._struct.pack(self.x, self.y, self.z)
\ No newline at end of file
+        return self._struct.pack(self.x, self.y, self.z)
+
+
+@functools.cache
+def _numpy():
+    # numpy is optional, and only imported the first time a whole array is transformed
+    try:
+        return importlib.import_module("numpy")
+    except ImportError:
+        return None
+
+
+def _applied_to_floats(operation, values: array.array, operand: float) -> array.array:
+    # With numpy the operation runs over the whole buffer at once. It's worked out in double precision and rounded
+    # back to single, like the Python fallback, so both give the same floats.
+    numpy = _numpy()
+    if numpy is None or not values:
+        return array.array("f", list(map(operation, values, itertools.repeat(operand))))
+    result = operation(numpy.frombuffer(values, numpy.float32).astype(numpy.float64), operand)
+    return array.array("f", result.astype(numpy.float32).tobytes())
+
+
+@dataclasses.dataclass(frozen=True)
+class VectorArray:
+    # One array("f") per axis, so bulk operations run over contiguous floats. Each array exposes the buffer
+    # protocol, so numpy.frombuffer can wrap it without copying.
+    x: array.array = dataclasses.field(repr=False)
+    y: array.array = dataclasses.field(repr=False)
+    z: array.array = dataclasses.field(repr=False)
+
+    @classmethod
+    def from_components(cls, components: array.array, stride: int = 3, start: int = 0):
+        return cls(components[start::stride], components[start+1::stride], components[start+2::stride])
+
+    @classmethod
+    def from_packed(cls, packed: bytes):
+        return cls.from_components(unpack_float_array(packed))
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        vectors = tuple(vectors)
+        return cls(
+            array.array("f", (vector.x for vector in vectors)),
+            array.array("f", (vector.y for vector in vectors)),
+            array.array("f", (vector.z for vector in vectors)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, index: int) -> Vector:
+        return Vector(self.x[index], self.y[index], self.z[index])
+
+    def __iter__(self):
+        return map(Vector, self.x, self.y, self.z)
+
+    def interleaved_into(self, components: array.array, stride: int = 3, start: int = 0) -> None:
+        components[start::stride] = self.x
+        components[start+1::stride] = self.y
+        components[start+2::stride] = self.z
+
+    def packed(self) -> bytes:
+        components = array.array("f", bytes(12 * len(self)))
+        self.interleaved_into(components)
+        return pack_float_array(components)
+
+    def translated(self, offset: Vector):
+        return VectorArray(
+            _applied_to_floats(operator.add, self.x, offset.x) if offset.x else self.x,
+            _applied_to_floats(operator.add, self.y, offset.y) if offset.y else self.y,
+            _applied_to_floats(operator.add, self.z, offset.z) if offset.z else self.z,
+        )
+
+    def scaled(self, factor: Vector):
+        return VectorArray(
+            _applied_to_floats(operator.mul, self.x, factor.x) if factor.x != 1 else self.x,
+            _applied_to_floats(operator.mul, self.y, factor.y) if factor.y != 1 else self.y,
+            _applied_to_floats(operator.mul, self.z, factor.z) if factor.z != 1 else self.z,
+        )
+
+    def bounding_box(self) -> tuple:
+        return Vector(min(self.x), min(self.y), min(self.z)), Vector(max(self.x), max(self.y), max(self.z))
+
+
+# Registries
+class LazyRegistry(collections.abc.MutableMapping):
+    # Maps keys to "module:attribute" paths, importing each module only when one of its keys is first looked up.
+    # Values can also be registered directly.
+    def __init__(self, paths: dict = ()):
+        self._paths = dict(paths)
+        self._loaded = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            pass
+        module_name, _, attribute_name = self._paths[key].partition(":")
+        value = self._loaded[key] = getattr(importlib.import_module(module_name), attribute_name)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        self._loaded.pop(key, None)
+        if isinstance(value, str):
+            self._paths[key] = value
+        else:
+            self._paths[key] = f"{value.__module__}:{value.__qualname__}"
+            self._loaded[key] = value
+
+    def __delitem__(self, key) -> None:
+        del self._paths[key]
+        self._loaded.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __repr__(self) -> str:
+        return f"LazyRegistry({self._paths!r})"
+
+    def is_loaded(self, key) -> bool:
+        return key in self._loaded